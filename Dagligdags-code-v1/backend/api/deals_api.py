@@ -0,0 +1,236 @@
+# backend/api/deals_api.py
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Add project root to path when run as a script
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.exceptions import HTTPException
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from config.paths import USER_PROFILES_DIR
+from utilities.logger import log_user_action, setup_logger
+
+RESPONSE_CACHE_SIZE = 4096  # Cached JSON bodies per worker process
+
+
+class ResponseCache:
+    """LRU of serialized responses, keyed by everything that can change them."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def create_app(matcher: DealMatcher, log_actions: bool = True) -> Flask:
+    """Read-only deal API over a warm DealMatcher.
+
+    Responses are cached per (endpoint, user, arguments, day, snapshot
+    version, profile version) and carry an ETag, so a client that polls gets
+    a 304 until a new scrape lands, the day turns or the user edits their
+    profile. Requests are logged as user actions, which is what
+    ``traffic_replay`` plays back; it turns that off for its own requests.
+    """
+    app = Flask("dagligdags_api")
+    cache = ResponseCache()
+    logger = setup_logger("deals_api")
+
+    def cached_json(endpoint: str, user_id: str, args: tuple, compute):
+        profile_version = matcher.profile_version(user_id)
+        if profile_version is None:
+            return jsonify({'error': f"unknown user {user_id}"}), 404
+
+        # The day comes first: a new day prunes expired deals, bumping the version
+        day = matcher.current_day()
+        key = (endpoint, user_id, args, day, matcher.snapshot.version, profile_version)
+        entry = cache.get(key)
+        if entry is None:
+            body = json.dumps(compute(), ensure_ascii=False, default=_json_default).encode('utf-8')
+            etag = hashlib.sha1(repr(key).encode('utf-8') + body).hexdigest()[:20]
+            cache.put(key, etag, body)
+        else:
+            etag, body = entry
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @app.get('/health')
+    def health():
+        return jsonify({
+            'snapshot_version': matcher.snapshot.version,
+            'deals': len(matcher.snapshot),
+            'pid': os.getpid(),
+            'cache_hits': cache.hits,
+            'cache_misses': cache.misses,
+        })
+
+    @app.get('/users/<user_id>/deals')
+    def personalized_deals(user_id):
+        location = _location_arg()
+        if log_actions:
+            log_user_action(user_id, 'deals_viewed', {'location': location})
+        return cached_json('deals', user_id, (location,),
+                           lambda: matcher.find_current_deals(user_id, location))
+
+    @app.get('/users/<user_id>/basket')
+    def shopping_basket(user_id):
+        items = tuple(item.strip() for item in request.args.get('items', '').split(',') if item.strip())
+        if not items:
+            return jsonify({'error': "query parameter 'items' is required, e.g. ?items=melk,egg"}), 400
+        if log_actions:
+            log_user_action(user_id, 'basket_requested', {'items': items})
+        return cached_json('basket', user_id, items,
+                           lambda: matcher.optimize_shopping_basket(user_id, list(items), matcher.deals_for_user(user_id)))
+
+    @app.get('/users/<user_id>/similar')
+    def similar_deals(user_id):
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': "query parameter 'q' is required, e.g. ?q=havremelk"}), 400
+        if log_actions:
+            log_user_action(user_id, 'similar_searched', {'query': query})
+        return cached_json('similar', user_id, (query,), lambda: matcher.find_similar_deals(user_id, query))
+
+    @app.errorhandler(Exception)
+    def internal_error(e):
+        if isinstance(e, HTTPException):
+            return e  # 404, 405, ...: not a server error
+        logger.error(f"API error on {request.path}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'internal error'}), 500
+
+    return app
+
+
+def _location_arg() -> Optional[Tuple[float, float]]:
+    try:
+        return float(request.args['lat']), float(request.args['lon'])
+    except (KeyError, ValueError):
+        return None
+
+
+def _json_default(value):
+    if isinstance(value, Deal):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serve(host: str = '127.0.0.1', port: int = 8080, workers: int = 2,
+          snapshot_file: Optional[Path] = None, profiles_dir: Path = USER_PROFILES_DIR) -> None:
+    """Serve the API from ``workers`` pre-forked processes.
+
+    The snapshot is loaded once in the parent and then frozen out of the
+    garbage collector before forking, so the workers share its pages
+    copy-on-write instead of each holding a private copy. SIGHUP reloads the
+    snapshot and replaces the workers.
+    """
+    from werkzeug.serving import make_server
+
+    logger = setup_logger("deals_api")
+    listener = socket.create_server((host, port), reuse_port=False)
+    listener.set_inheritable(True)
+
+    def load_matcher() -> DealMatcher:
+        snapshot = DealSnapshot.load(snapshot_file) if snapshot_file else DealSnapshot.load_latest()
+        logger.info(f"Loaded snapshot with {len(snapshot)} deals")
+        return DealMatcher(snapshot, profiles_dir=profiles_dir)
+
+    def run_worker(matcher: DealMatcher) -> None:
+        server = make_server(host, port, create_app(matcher), threaded=True, fd=listener.fileno())
+        signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        server.serve_forever()
+
+    if workers <= 1 or not hasattr(os, 'fork'):
+        run_worker(load_matcher())
+        return
+
+    def spawn_workers(matcher: DealMatcher) -> List[int]:
+        gc.collect()
+        gc.freeze()
+        pids = []
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    run_worker(matcher)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        gc.unfreeze()
+        return pids
+
+    def stop_workers(pids: List[int]) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    state = {'pids': spawn_workers(load_matcher()), 'reload': False, 'stop': False}
+    logger.info(f"🌐 Serving on http://{host}:{port} with {workers} workers")
+
+    signal.signal(signal.SIGHUP, lambda *_: state.update(reload=True))
+    signal.signal(signal.SIGTERM, lambda *_: state.update(stop=True))
+    signal.signal(signal.SIGINT, lambda *_: state.update(stop=True))
+    try:
+        while not state['stop']:
+            signal.pause()
+            if state['reload']:
+                state['reload'] = False
+                old_pids = state['pids']
+                state['pids'] = spawn_workers(load_matcher())
+                stop_workers(old_pids)
+    finally:
+        stop_workers(state['pids'])
+        listener.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dagligdags read-only deal API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--snapshot-file', type=Path, help="parsed deals JSON (default: newest scrape)")
+    parser.add_argument('--profiles-dir', type=Path, default=USER_PROFILES_DIR)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.snapshot_file, args.profiles_dir)
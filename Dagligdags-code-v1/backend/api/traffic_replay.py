@@ -0,0 +1,284 @@
+# backend/api/traffic_replay.py
+
+import argparse
+import contextlib
+import glob
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Add project root to path when run as a script
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from config.paths import LOG_DIR, USER_PROFILES_DIR
+from utilities.logger import setup_logger
+
+# Logged user actions that correspond to a request against the matcher
+REPLAYED_ACTIONS = ('deals_viewed', 'basket_requested', 'similar_searched')
+
+
+@dataclass
+class ReplayEvent:
+    """One logged user action, ``offset`` seconds after the first event of the log."""
+    offset: float
+    user_id: str
+    action: str
+    details: Dict = field(default_factory=dict)
+
+
+def read_events(paths: Iterable[Path]) -> Tuple[List[ReplayEvent], int]:
+    """Replayable events from ``user_analytics_*.log`` files, oldest first.
+
+    Returns the events and how many logged actions were skipped because
+    they are not requests (onboarding, settings) or could not be parsed.
+    """
+    logged, skipped = [], 0
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # "<asctime> - user_analytics - INFO - {json}"
+                _, _, payload = line.partition(' - INFO - ')
+                try:
+                    entry = json.loads(payload)
+                    timestamp = datetime.fromisoformat(entry['timestamp']).timestamp()
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+                    continue
+                if entry.get('action') not in REPLAYED_ACTIONS:
+                    skipped += 1
+                    continue
+                logged.append((timestamp, str(entry.get('user_id')), entry['action'], entry.get('details') or {}))
+    logged.sort(key=lambda item: item[0])
+    start = logged[0][0] if logged else 0.0
+    return [ReplayEvent(ts - start, user_id, action, details) for ts, user_id, action, details in logged], skipped
+
+
+def amplify(events: List[ReplayEvent], copies: int, seed: int = 1) -> List[ReplayEvent]:
+    """``copies`` concurrent versions of the logged traffic.
+
+    Each extra copy replays every user's session with its own random phase
+    within the log's time span, so load grows without all copies of a
+    request arriving at the same instant.
+    """
+    if copies <= 1 or not events:
+        return list(events)
+    rng = random.Random(seed)
+    span = events[-1].offset or 1.0
+    result = list(events)
+    for _ in range(copies - 1):
+        phases: Dict[str, float] = {}
+        for event in events:
+            phase = phases.setdefault(event.user_id, rng.uniform(0, span))
+            result.append(ReplayEvent((event.offset + phase) % span, event.user_id, event.action, event.details))
+    result.sort(key=lambda event: event.offset)
+    return result
+
+
+class InProcessTarget:
+    """Sends replayed requests straight to a DealMatcher, as the API endpoints would."""
+
+    def __init__(self, matcher: DealMatcher):
+        self.matcher = matcher
+
+    def __call__(self, event: ReplayEvent) -> bool:
+        details = event.details
+        if event.action == 'deals_viewed':
+            location = details.get('location')
+            self.matcher.find_current_deals(event.user_id, tuple(location) if location else None)
+        elif event.action == 'basket_requested':
+            self.matcher.optimize_shopping_basket(event.user_id, list(details.get('items', [])),
+                                                  self.matcher.deals_for_user(event.user_id))
+        else:
+            self.matcher.find_similar_deals(event.user_id, details.get('query', ''))
+        return True
+
+
+class HttpTarget:
+    """Sends replayed requests to the deal API at ``base_url``."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def path(self, event: ReplayEvent) -> str:
+        user = urllib.parse.quote(event.user_id, safe='')
+        details = event.details
+        if event.action == 'deals_viewed':
+            location = details.get('location')
+            query = f"?lat={location[0]}&lon={location[1]}" if location else ''
+            return f"/users/{user}/deals{query}"
+        if event.action == 'basket_requested':
+            return f"/users/{user}/basket?items={urllib.parse.quote(','.join(details.get('items', [])))}"
+        return f"/users/{user}/similar?q={urllib.parse.quote(details.get('query', ''))}"
+
+    def __call__(self, event: ReplayEvent) -> bool:
+        try:
+            with urllib.request.urlopen(self.base_url + self.path(event), timeout=self.timeout) as response:
+                response.read()
+                return response.status < 400
+        except urllib.error.HTTPError as e:
+            return e.code == 304
+
+
+@contextlib.contextmanager
+def local_api(matcher: DealMatcher) -> Iterator[str]:
+    """The deal API over ``matcher`` on a free localhost port, for the duration of the block."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from backend.api.deals_api import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    # Replayed requests are not user actions, so they are not logged as such
+    server = make_server('127.0.0.1', 0, create_app(matcher, log_actions=False), threaded=True,
+                         request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+class ReplayReport:
+    """Latency percentiles and throughput of one replay."""
+
+    def __init__(self, wall_seconds: float, latencies: Dict[str, List[float]], errors: int, max_lag: float):
+        self.wall_seconds = wall_seconds
+        self.latencies = {action: sorted(values) for action, values in latencies.items()}
+        self.errors = errors
+        # Longest a request waited past its scheduled time for a free worker
+        self.max_lag = max_lag
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.wall_seconds if self.wall_seconds else 0.0
+
+    def percentiles(self, action: Optional[str] = None) -> Dict[str, float]:
+        """p50/p95/p99 latency in milliseconds, overall or for one action."""
+        if action is None:
+            values = sorted(v for values in self.latencies.values() for v in values)
+        else:
+            values = self.latencies.get(action, [])
+        return {f"p{p}": round(_percentile(values, p) * 1000, 2) for p in (50, 95, 99)}
+
+    def to_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'seconds': round(self.wall_seconds, 3),
+            'throughput': round(self.throughput, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 2),
+            'latency_ms': self.percentiles(),
+            'by_action': {action: dict(self.percentiles(action), requests=len(values))
+                          for action, values in self.latencies.items()},
+        }
+
+    def __str__(self) -> str:
+        lines = [f"{self.requests} requests in {self.wall_seconds:.2f}s = {self.throughput:.0f} req/s, "
+                 f"{self.errors} errors, max lag {self.max_lag * 1000:.0f} ms"]
+        for action in [None] + sorted(self.latencies):
+            p = self.percentiles(action)
+            lines.append(f"  {action or 'all':<18} p50 {p['p50']:.1f} ms, p95 {p['p95']:.1f} ms, p99 {p['p99']:.1f} ms")
+        return "\n".join(lines)
+
+
+def replay(events: List[ReplayEvent], target: Callable[[ReplayEvent], bool], speedup: float = 1.0,
+           concurrency: int = 8) -> ReplayReport:
+    """Replay ``events`` against ``target`` and measure each request.
+
+    Requests are sent at their logged offsets divided by ``speedup``
+    (open loop: a slow target does not slow the arrivals, it builds a
+    queue, which shows up as lag). ``speedup=0`` sends everything as fast
+    as ``concurrency`` workers allow.
+    """
+    logger = setup_logger("traffic_replay")
+    latencies: Dict[str, List[float]] = {}
+    lock = threading.Lock()
+    state = {'errors': 0, 'max_lag': 0.0}
+
+    def send(event: ReplayEvent, due: float) -> None:
+        started = time.perf_counter()
+        try:
+            ok = target(event)
+        except Exception as e:
+            logger.debug(f"Replayed {event.action} for {event.user_id} failed: {str(e)}")
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.setdefault(event.action, []).append(elapsed)
+            state['max_lag'] = max(state['max_lag'], started - due)
+            if not ok:
+                state['errors'] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for event in events:
+            due = started + (event.offset / speedup if speedup > 0 else 0.0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, event, due)
+    report = ReplayReport(time.perf_counter() - started, latencies, state['errors'], state['max_lag'])
+    p = report.percentiles()
+    logger.info(f"🔁 Replayed {report.requests} requests at {speedup or 'max'}x: {report.throughput:.0f} req/s, "
+                f"p50 {p['p50']} ms, p95 {p['p95']} ms, p99 {p['p99']} ms, {report.errors} errors")
+    return report
+
+
+def _percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay logged user traffic against the deal matcher")
+    parser.add_argument('logs', nargs='*', help="analytics logs (default: logs/user_analytics_*.log)")
+    parser.add_argument('--speedup', type=float, default=60.0, help="time compression; 0 = as fast as possible")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--copies', type=int, default=1, help="concurrent copies of the logged traffic")
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess',
+                        help="call DealMatcher directly, or through the API on a local port")
+    parser.add_argument('--url', help="replay against an API that is already running instead")
+    parser.add_argument('--snapshot-file', type=Path, help="parsed deals JSON (default: newest scrape)")
+    parser.add_argument('--profiles-dir', type=Path, default=USER_PROFILES_DIR)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    paths = args.logs or sorted(glob.glob(str(LOG_DIR / "user_analytics_*.log")))
+    events, skipped = read_events(Path(p) for p in paths)
+    events = amplify(events, args.copies)
+    print(f"{len(events)} requests from {len(paths)} logs ({skipped} other actions skipped)")
+
+    if args.url:
+        report = replay(events, HttpTarget(args.url), args.speedup, args.concurrency)
+    else:
+        snapshot = DealSnapshot.load(args.snapshot_file) if args.snapshot_file else DealSnapshot.load_latest()
+        matcher = DealMatcher(snapshot, profiles_dir=args.profiles_dir)
+        if args.mode == 'http':
+            with local_api(matcher) as url:
+                report = replay(events, HttpTarget(url), args.speedup, args.concurrency)
+        else:
+            report = replay(events, InProcessTarget(matcher), args.speedup, args.concurrency)
+    print(json.dumps(report.to_dict(), indent=2) if args.json else report)
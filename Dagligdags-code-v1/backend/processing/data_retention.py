@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import shutil
+from fnmatch import fnmatch
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from config.constants import Constants
+from config.paths import (LOG_DIR, NORMALIZED_DATA_DIR, PARSED_DATA_DIR, PDF_STORAGE_DIR,
+                          USER_PROFILES_DIR)
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import PLANS_DIR
+from backend.processing.price_history import PriceHistory
+from backend.processing.profile_store import ProfileFeatureStore
+from backend.scraping.database_scraper import load_food_db
+from utilities.compression import ARCHIVE_SUFFIX, open_compressed
+from utilities.logger import setup_logger
+
+# deals_20250526_194825.json, food_db_20250526_195220.json, main_app_20250526.log, ...
+_FILE_DATE_RE = re.compile(r"_(\d{8})(?:_\d{6})?\.")
+# deals_20250526.ndjson.zst, food_db_2025w21.ndjson.gz
+_ARCHIVE_DATE_RE = re.compile(r"_(\d{8}|\d{4}w\d{2})\.ndjson")
+_FOOD_DB_PATTERNS = ("database_data_*.json", "food_db_*.json", "food_db_*.ndjson*")
+_DEALS_PATTERNS = ("deals_*.json", "deals_*.ndjson*")
+
+
+def file_date(path: Path) -> date:
+    """Date a data or log file belongs to, from its name or else its mtime."""
+    match = _FILE_DATE_RE.search(path.name)
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d').date()
+    return datetime.fromtimestamp(path.stat().st_mtime).date()
+
+
+def _archive_end_date(path: Path) -> Optional[date]:
+    """Last day covered by a daily or weekly archive."""
+    match = _ARCHIVE_DATE_RE.search(path.name)
+    if not match:
+        return None
+    key = match.group(1)
+    if 'w' in key:
+        year, week = key.split('w')
+        return date.fromisocalendar(int(year), int(week), 7)
+    return datetime.strptime(key, '%Y%m%d').date()
+
+
+def _scan(directory: Path, *patterns: str) -> Iterator[Path]:
+    # scandir without building a sorted list; dot-prefixed temp files are skipped
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if (entry.is_file() and not entry.name.startswith('.')
+                        and any(fnmatch(entry.name, pattern) for pattern in patterns)):
+                    yield Path(entry.path)
+    except FileNotFoundError:
+        return
+
+
+class RetentionJob:
+    """Enforces ``Constants.DATA_RETENTION`` on scraped data, logs and profiles.
+
+    Per-run deal snapshots from earlier days are appended to one compressed
+    NDJSON archive per day and folded into the price history; food-database
+    snapshots go into weekly archives. Archives, PDFs and logs past their
+    retention are deleted, and a profile whose user has not been seen for
+    longer than its retention is removed. Files are processed one at a time,
+    so memory use does not grow with the amount of history on disk.
+    """
+
+    def __init__(self, retention: Dict[str, timedelta] = None, price_history: Optional[PriceHistory] = None,
+                 parsed_dir: Path = PARSED_DATA_DIR, normalized_dir: Path = NORMALIZED_DATA_DIR,
+                 pdf_dir: Path = PDF_STORAGE_DIR, log_dir: Path = LOG_DIR,
+                 profiles_dir: Path = USER_PROFILES_DIR):
+        self.logger = setup_logger("data_retention")
+        self.retention = retention or Constants.DATA_RETENTION
+        self.price_history = price_history or PriceHistory()
+        self.parsed_dir = parsed_dir
+        self.normalized_dir = normalized_dir
+        self.pdf_dir = pdf_dir
+        self.log_dir = log_dir
+        self.profiles_dir = profiles_dir
+
+    def run(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Run every retention step and return how many files each one touched."""
+        today = today or date.today()
+        stats = {}
+        for name, step in [
+            ('deal_snapshots_compacted', self.compact_deal_snapshots),
+            ('food_db_snapshots_compacted', self.compact_food_db_snapshots),
+            ('archives_expired', self.expire_archives),
+            ('pdfs_expired', self.expire_pdfs),
+            # Before rotation, while earlier days' analytics logs are still plain text
+            ('profiles_seen', self.record_activity),
+            ('logs_rotated', self.rotate_logs),
+            ('profiles_expired', self.expire_profiles),
+        ]:
+            try:
+                stats[name] = step(today)
+            except Exception as e:
+                self.logger.error(f"❌ Retention step {name} failed: {str(e)}")
+                stats[name] = 0
+        self.logger.info(f"🧹 Retention finished: {stats}")
+        return stats
+
+    def compact_deal_snapshots(self, today: date) -> int:
+        """Move earlier days' deal snapshots into daily archives and the price history."""
+        newest = max(_scan(self.parsed_dir, *_DEALS_PATTERNS), key=lambda p: p.name, default=None)
+        compacted = 0
+        for path in self._files_before(self.parsed_dir, _DEALS_PATTERNS, today):
+            if path == newest:
+                continue  # The matcher loads the newest snapshot at startup
+            run_id = path.name[len("deals_"):].split('.')[0]
+            day = file_date(path)
+            snapshot = DealSnapshot.load(path)
+            if not self.price_history.is_recorded(path.name):
+                archive = self.parsed_dir / 'archive' / f"deals_{day:%Y%m%d}.ndjson{ARCHIVE_SUFFIX}"
+                self._append_records(archive, ({'run': run_id, **deal.to_dict()} for deal in snapshot.values()))
+                self.price_history.record(path.name, day.isoformat(), snapshot.values())
+            path.unlink()
+            compacted += 1
+        return compacted
+
+    def compact_food_db_snapshots(self, today: date) -> int:
+        """Move all but the newest food-database snapshot into weekly archives."""
+        files = list(_scan(self.normalized_dir, *_FOOD_DB_PATTERNS))
+        newest = max(files, key=lambda p: p.stat().st_mtime, default=None)
+        compacted = 0
+        for path in files:
+            day = file_date(path)
+            if path == newest or day >= today:
+                continue
+            year, week, _ = day.isocalendar()
+            archive = self.normalized_dir / 'archive' / f"food_db_{year}w{week:02d}.ndjson{ARCHIVE_SUFFIX}"
+            self._append_records(archive, [{'file': path.name, 'data': load_food_db(path)}])
+            path.unlink()
+            compacted += 1
+        return compacted
+
+    def expire_archives(self, today: date) -> int:
+        cutoff = today - self.retention['scraped_data']
+        expired = 0
+        for directory in (self.parsed_dir / 'archive', self.normalized_dir / 'archive'):
+            for path in _scan(directory, "*.ndjson*"):
+                end = _archive_end_date(path)
+                if end is not None and end < cutoff:
+                    path.unlink()
+                    expired += 1
+        return expired
+
+    def expire_pdfs(self, today: date) -> int:
+        """Delete old PDFs, and deals cached for PDFs not seen within the retention."""
+        cutoff = today - self.retention['scraped_data']
+        expired = 0
+        for path in (self._files_before(self.pdf_dir, ("*.pdf",), cutoff)
+                     + self._files_before(self.pdf_dir / 'parsed_cache', ("*.ndjson*",), cutoff)):
+            path.unlink()
+            expired += 1
+        return expired
+
+    def rotate_logs(self, today: date) -> int:
+        """Gzip earlier days' logs and delete archives older than the log retention."""
+        archive_dir = self.log_dir / 'archive'
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        rotated = 0
+        for path in self._files_before(self.log_dir, ("*.log",), today):
+            with open(path, 'rb') as src, open_compressed(archive_dir / f"{path.name}.gz", 'ab') as dst:
+                shutil.copyfileobj(src, dst)
+            path.unlink()
+            rotated += 1
+
+        cutoff = today - self.retention['logs']
+        for path in self._files_before(archive_dir, ("*.log.gz",), cutoff):
+            path.unlink()
+        return rotated
+
+    def record_activity(self, today: date) -> int:
+        """Write each user's latest logged action into their profile as ``last_seen``.
+
+        Analytics logs are kept far shorter than profiles, so the date has to
+        be carried over into the profile before the logs are rotated away.
+        Returns how many profiles were updated.
+        """
+        latest: Dict[str, str] = {}
+        for path in _scan(self.log_dir, "user_analytics_*.log"):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # "<asctime> - user_analytics - INFO - {json}"
+                    _, _, payload = line.partition(' - INFO - ')
+                    try:
+                        entry = json.loads(payload)
+                        user_id, seen = str(entry['user_id']), entry['timestamp'][:10]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if seen > latest.get(user_id, ''):
+                        latest[user_id] = seen
+
+        store = ProfileFeatureStore(self.profiles_dir)
+        updated = 0
+        for user_id, seen in latest.items():
+            path = store.profile_path(user_id)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue  # API users without a profile, or one being written
+            if seen <= profile.get('last_seen', ''):
+                continue
+            profile['last_seen'] = seen
+            tmp_file = path.with_name(f".{path.name}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, indent=4)
+            tmp_file.replace(path)
+            updated += 1
+        return updated
+
+    def expire_profiles(self, today: date) -> int:
+        """Remove profiles whose user has not been active for longer than the profile retention.
+
+        Activity is the profile's ``last_seen`` date, or its creation for a
+        user who never came back; the file's mtime only stands in for
+        profiles that record neither. The feature store is compacted
+        afterwards, dropping the records of removed profiles along with
+        superseded ones; a removed profile's stored scoring plan goes with it.
+        """
+        cutoff = (today - self.retention['user_profiles']).isoformat()
+        expired = 0
+        for path in _scan(self.profiles_dir, "*.json"):
+            if self._last_activity(path) < cutoff:
+                self.logger.info(f"Removing expired profile {path.name}")
+                path.unlink()
+                (self.profiles_dir / PLANS_DIR / path.name).unlink(missing_ok=True)
+                expired += 1
+        store = ProfileFeatureStore(self.profiles_dir)
+        store.compact()
+        store.close()
+        return expired
+
+    @staticmethod
+    def _last_activity(path: Path) -> str:
+        """ISO date the profile's user was last active."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except ValueError:
+            profile = {}
+        if isinstance(profile, dict):
+            seen = max(str(profile.get('last_seen') or ''), str(profile.get('createdat') or '')[:10])
+            if seen:
+                return seen
+        return datetime.fromtimestamp(path.stat().st_mtime).date().isoformat()
+
+    def _files_before(self, directory: Path, patterns: Tuple[str, ...], cutoff: date) -> List[Path]:
+        return [path for path in _scan(directory, *patterns) if file_date(path) < cutoff]
+
+    @staticmethod
+    def _append_records(archive: Path, records) -> None:
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        with open_compressed(archive, 'at') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+
+
+if __name__ == "__main__":
+    RetentionJob().run()
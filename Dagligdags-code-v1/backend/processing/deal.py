@@ -0,0 +1,115 @@
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Categorical fields repeated across many deals; interned so each distinct
+# value (store name, category, batch timestamp, ...) is stored once per process
+_INTERNED_FIELDS = ('store', 'region', 'product_category', 'cuisine_type', 'package_size', 'price_unit',
+                   'source', 'scraped_at', 'valid_from', 'valid_to')
+
+# Written to JSON even when they hold their default value
+_ALWAYS_WRITTEN = ('deal_id', 'store', 'product', 'price', 'source', 'scraped_at')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
+class Deal:
+    """One scraped offer.
+
+    A slotted record instead of a free-form dict: no per-instance ``__dict__``
+    and interned categorical strings. Optional numeric fields use ``None`` for
+    "not given by the store", matching a missing key in the JSON shape. Keys
+    this class does not know about are kept in ``extras``.
+    """
+    deal_id: str = ''
+    store: str = ''
+    # Offer region of a regional avis variant; '' for the chain's national avis
+    region: str = ''
+    product: str = ''
+    price: Optional[float] = None
+    discount_percentage: Optional[float] = None
+    # Pack size in price_unit ('kg', 'l' or 'stk') and NOK per unit, from unit_pricing
+    quantity: Optional[float] = None
+    price_unit: str = ''
+    unit_price: Optional[float] = None
+    product_category: str = ''
+    organic: bool = False
+    local: bool = False
+    allergens: Tuple[str, ...] = ()
+    cuisine_type: str = ''
+    protein_content: float = 0
+    package_size: str = 'regular'
+    # 0-10 from the food database; None when no food record gave one
+    sustainability_score: Optional[float] = None
+    store_location: Optional[Tuple[float, float]] = None
+    source: str = ''
+    scraped_at: str = ''
+    # First and last day (ISO dates) the offer is valid, from the avis; '' when not stated
+    valid_from: str = ''
+    valid_to: str = ''
+    canonical_id: str = ''
+    extras: Optional[Dict[str, Any]] = None
+
+    def __post_init__(self):
+        for name in _INTERNED_FIELDS:
+            setattr(self, name, _intern(getattr(self, name)))
+        if self.allergens:
+            self.allergens = tuple(_intern(a) for a in self.allergens)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Deal':
+        """Build a Deal from the JSON shape the scrapers have always written."""
+        known = {}
+        extras = None
+        for key, value in data.items():
+            if key in _FIELD_NAMES:
+                known[key] = value
+            else:
+                if extras is None:
+                    extras = {}
+                extras[key] = value
+        if known.get('allergens'):
+            known['allergens'] = tuple(known['allergens'])
+        if known.get('store_location'):
+            known['store_location'] = tuple(known['store_location'])
+        return cls(**known, extras=extras)
+
+    def to_dict(self) -> Dict:
+        """The JSON shape: core fields always, other fields only when set."""
+        data = {}
+        for name, default in _FIELD_DEFAULTS:
+            value = getattr(self, name)
+            if name in _ALWAYS_WRITTEN or value != default:
+                data[name] = list(value) if isinstance(value, tuple) else value
+        if self.extras:
+            data.update(self.extras)
+        return data
+
+    def valid_on(self, day: str) -> bool:
+        """Whether the offer holds on ``day`` (an ISO date); open-ended sides always do."""
+        return (not self.valid_from or self.valid_from <= day) and (not self.valid_to or day <= self.valid_to)
+
+    def same_offer(self, other: 'Deal') -> bool:
+        """True if both describe the same offer, ignoring when they were scraped."""
+        return self.extras == other.extras and all(
+            getattr(self, name) == getattr(other, name) for name in _FIELD_NAMES if name != 'scraped_at')
+
+
+_FIELD_DEFAULTS = [(f.name, f.default) for f in fields(Deal) if f.name != 'extras']
+_FIELD_NAMES = frozenset(name for name, _ in _FIELD_DEFAULTS)
+
+
+def as_deal(deal) -> Deal:
+    """Accept either a Deal or a deal dict from older callers."""
+    return deal if isinstance(deal, Deal) else Deal.from_dict(deal)
+
+
+def deals_from_dicts(records: Iterable[Dict]) -> List[Deal]:
+    return [Deal.from_dict(record) for record in records]
+
+
+def deals_to_dicts(deals: Iterable[Deal]) -> List[Dict]:
+    return [deal.to_dict() for deal in deals]
@@ -0,0 +1,178 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.paths import PARSED_DATA_DIR
+from backend.processing.deal import Deal, deals_from_dicts
+from backend.processing.validity_index import ValidityIndex
+from backend.scraping.pipeline import normalize_store_deals
+from utilities.record_stream import is_record_file, read_records
+
+
+class SnapshotDelta:
+    """What changed between two versions of the deal snapshot."""
+
+    def __init__(self, from_version: int, to_version: int,
+                 added: List[Deal], removed: List[Deal], changed: List[Deal]):
+        self.from_version = from_version
+        self.to_version = to_version
+        self.added = added
+        self.removed = removed
+        # New versions of deals whose id already existed
+        self.changed = changed
+
+    @property
+    def size(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __repr__(self) -> str:
+        return (f"SnapshotDelta(v{self.from_version}->v{self.to_version}, +{len(self.added)} "
+                f"-{len(self.removed)} ~{len(self.changed)})")
+
+
+class DealSnapshot:
+    """The current deal catalog, national and regional avis variants, keyed by ``deal_id``.
+
+    Every update bumps ``version`` and returns the ``SnapshotDelta`` that
+    produced it, so result caches can be moved forward instead of rebuilt.
+    A chain's regional variant replaces its national avis for users in that
+    region; ``deals_for_region`` gives the deals such a user sees. Deals are
+    also indexed by validity window, so ``expire`` drops offers that have
+    ended and ``valid_on`` answers "what holds on Saturday" without a scan.
+    """
+
+    def __init__(self, deals: Iterable[Deal] = (), version: int = 0):
+        self.version = version
+        self.deals: Dict[str, Deal] = {}
+        # (store, region) -> deal ids; region '' is the national avis
+        self._store_ids: Dict[Tuple[str, str], set] = {}
+        # region -> stores with a regional variant there
+        self._regional_stores: Dict[str, set] = {}
+        self._validity = ValidityIndex()
+        self._lock = threading.Lock()
+        for deal in deals:
+            self._put(deal)
+
+    def __len__(self) -> int:
+        return len(self.deals)
+
+    def values(self) -> List[Deal]:
+        return list(self.deals.values())
+
+    def regional_stores(self, region: str) -> frozenset:
+        """Stores whose national avis is replaced by a regional variant in ``region``."""
+        return frozenset(self._regional_stores.get(region, ()))
+
+    def visible_in(self, deal: Deal, region: str) -> bool:
+        """Whether a user in ``region`` sees ``deal``."""
+        if deal.region:
+            return deal.region == region
+        return deal.store not in self._regional_stores.get(region, ())
+
+    def deals_for_region(self, region: str) -> List[Deal]:
+        """National deals plus ``region``'s variants, which override their chain's national avis."""
+        with self._lock:
+            overridden = self._regional_stores.get(region, ())
+            return [self.deals[deal_id]
+                    for (store, deal_region), deal_ids in self._store_ids.items()
+                    if deal_region == region or (not deal_region and store not in overridden)
+                    for deal_id in deal_ids]
+
+    def valid_on(self, day: str, region: Optional[str] = None) -> List[Deal]:
+        """Deals whose validity window contains ``day`` (ISO date), optionally as seen in ``region``."""
+        with self._lock:
+            deals = [self.deals[deal_id] for deal_id in self._validity.valid_on(day)]
+        return deals if region is None else [deal for deal in deals if self.visible_in(deal, region)]
+
+    def expire(self, day: str) -> SnapshotDelta:
+        """Remove every deal whose validity ended before ``day``."""
+        with self._lock:
+            removed = [self.deals.pop(deal_id) for deal_id in self._validity.pop_expired(day)]
+            for deal in removed:
+                key = (deal.store, deal.region)
+                self._store_ids[key].discard(deal.deal_id)
+                if deal.region and not self._store_ids[key]:
+                    # The regional avis is over; its chain's national avis applies again
+                    self._regional_stores[deal.region].discard(deal.store)
+            delta = SnapshotDelta(self.version, self.version + 1 if removed else self.version, [], removed, [])
+            self.version = delta.to_version
+            return delta
+
+    def replace_store(self, store: str, deals: List[Deal], region: str = '') -> SnapshotDelta:
+        """Swap in a freshly scraped deal list for one store's national or regional avis."""
+        with self._lock:
+            old_ids = self._store_ids.get((store, region), set())
+            new_by_id = {deal.deal_id: deal for deal in deals}
+            added, changed = [], []
+            for deal_id, deal in new_by_id.items():
+                if deal_id not in old_ids:
+                    added.append(deal)
+                elif not self.deals[deal_id].same_offer(deal):
+                    changed.append(deal)
+            removed = [self.deals[deal_id] for deal_id in old_ids - new_by_id.keys()]
+
+            for deal in removed + changed:
+                old = self.deals.pop(deal.deal_id)
+                self._validity.discard(old.deal_id, _window(old))
+            for deal in added + changed:
+                self.deals[deal.deal_id] = deal
+                self._validity.add(deal.deal_id, _window(deal))
+            self._store_ids[(store, region)] = set(new_by_id)
+            if region:
+                regional = self._regional_stores.setdefault(region, set())
+                if new_by_id:
+                    regional.add(store)
+                else:
+                    regional.discard(store)
+
+            delta = SnapshotDelta(self.version, self.version + 1, added, removed, changed)
+            self.version += 1
+            return delta
+
+    def _put(self, deal: Deal) -> None:
+        old = self.deals.get(deal.deal_id)
+        if old is not None:
+            self._validity.discard(old.deal_id, _window(old))
+        self.deals[deal.deal_id] = deal
+        self._validity.add(deal.deal_id, _window(deal))
+        self._store_ids.setdefault((deal.store, deal.region), set()).add(deal.deal_id)
+        if deal.region:
+            self._regional_stores.setdefault(deal.region, set()).add(deal.store)
+
+    @classmethod
+    def load_latest(cls) -> 'DealSnapshot':
+        """Build a snapshot from the newest parsed newsletter file."""
+        latest = _latest_deals_file()
+        if latest is None:
+            return cls()
+        return cls.load(latest)
+
+    @classmethod
+    def load(cls, path: Path) -> 'DealSnapshot':
+        """Build a snapshot from one parsed newsletter file.
+
+        Reads NDJSON (one deal per line, possibly compressed) as well as the
+        older ``{store: [deals]}`` JSON files.
+        """
+        if is_record_file(path):
+            return cls(Deal.from_dict(record) for record in read_records(path))
+        with open(path, 'r', encoding='utf-8') as f:
+            by_store = json.load(f)
+        deals = []
+        for store, records in by_store.items():
+            store_deals = deals_from_dicts(records)
+            # Files written before deals carried ids are normalized here
+            if store_deals and not store_deals[0].deal_id:
+                store_deals = normalize_store_deals(store, store_deals)
+            deals.extend(store_deals)
+        return cls(deals)
+
+
+def _window(deal: Deal) -> Tuple[str, str]:
+    return deal.valid_from, deal.valid_to
+
+
+def _latest_deals_file() -> Optional[Path]:
+    # Names start with the run timestamp, so they sort by age whatever the suffix
+    files = sorted(PARSED_DATA_DIR.glob('deals_*'))
+    return files[-1] if files else None
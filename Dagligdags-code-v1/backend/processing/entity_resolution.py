@@ -0,0 +1,204 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config.paths import NORMALIZED_DATA_DIR
+from backend.processing.deal import Deal
+from backend.processing.unit_pricing import parse_quantity
+from utilities.logger import setup_logger
+
+ENTITY_MAP_FILE = NORMALIZED_DATA_DIR / "product_entities.json"
+
+# MinHash/LSH parameters: 8 bands x 4 rows finds pairs with Jaccard ~0.6+
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+MATCH_THRESHOLD = 0.6
+_PRIME = (1 << 61) - 1
+
+# Brands and chain private labels that precede the product name
+BRANDS = {
+    'first price', 'rema 1000', 'coop', 'xtra', 'änglamark', 'eldorado', 'jacobs utvalgte',
+    'meny', 'kiwi', 'gilde', 'tine', 'q-meieriene', 'q', 'synnøve', 'nora', 'prior', 'kavli',
+    'freia', 'stabburet', 'idun', 'mills', 'toro', 'hatting', 'bakers', 'norgården', 'fjordland',
+    'grandiosa', 'jarlsberg', 'ringnes', 'solo', 'lerum', 'hval', 'eldhus', 'staur gård',
+}
+
+# Words that say nothing about which product it is
+STOPWORDS = {
+    'pr', 'per', 'stk', 'pk', 'pakke', 'ca', 'kun', 'tilbud', 'nå', 'fra', 'av', 'med', 'og', 'i',
+    'norsk', 'ny', 'nyhet', 'kr', 'for', 'kg', 'g', 'l', 'dl', 'cl', 'ml', 'gram', 'liter',
+}
+
+# Entity keys keep pack sizes in grams/millilitres so they read like the avis
+_KEY_UNITS = {'kg': ('g', 1000), 'l': ('ml', 1000), 'stk': ('stk', 1)}
+
+_rng_seeds = [(zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode())) for i in range(NUM_PERMUTATIONS)]
+
+
+def normalize_product_name(name: str) -> Tuple[str, Optional[str], str]:
+    """Split a Norwegian product name into (core words, brand, quantity key).
+
+    "TINE Lettmelk 1,0% 1 l" -> ("lettmelk 1 0", "tine", "1000ml").
+    """
+    text = unicodedata.normalize('NFKC', name).lower()
+    quantity = ''
+    parsed = parse_quantity(text)
+    if parsed:
+        if not parsed.per_unit:
+            key_unit, scale = _KEY_UNITS[parsed.unit]
+            quantity = f"{round(parsed.amount * scale, 3):g}{key_unit}"
+        start, end = parsed.span
+        text = text[:start] + ' ' + text[end:]
+
+    text = re.sub(r"[^\wæøå\- ]+", ' ', text)
+    brand = None
+    for candidate in sorted(BRANDS, key=len, reverse=True):
+        if text.startswith(candidate + ' ') or f" {candidate} " in f" {text} ":
+            brand = candidate
+            text = re.sub(rf"(^|\s){re.escape(candidate)}(\s|$)", ' ', text, count=1)
+            break
+
+    words = [_stem(word) for word in re.split(r"[\s\-]+", text) if word and word not in STOPWORDS]
+    return ' '.join(words), brand, quantity
+
+
+def _stem(word: str) -> str:
+    """Strip common Norwegian plural/definite endings from longer words."""
+    if len(word) > 5:
+        for suffix in ('ene', 'ane', 'er', 'en', 'et'):
+            if word.endswith(suffix):
+                return word[:-len(suffix)]
+    return word
+
+
+def _shingles(core: str) -> Set[str]:
+    padded = f" {core} "
+    return {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+
+def minhash(shingles: Set[str]) -> List[int]:
+    """MinHash signature with stable (process-independent) hashing."""
+    hashed = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    return [min((a * h + b) % _PRIME for h in hashed) for a, b in _rng_seeds]
+
+
+def _band_keys(signature: List[int], quantity: str) -> List[Tuple]:
+    # Products of different sizes are different products, so size is part of the block
+    return [(band, quantity, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))
+            for band in range(BANDS)]
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class EntityResolver:
+    """Assigns a canonical product id to deals across Coop, Rema, Kiwi, Meny and Oda.
+
+    Names are normalized (brand and pack size split off, Norwegian endings
+    stripped) and blocked with MinHash LSH, so only deals sharing a band
+    bucket and pack size are compared. The mapping is persisted and extended
+    incrementally: a name seen before is a dictionary hit, a new name is
+    compared only against the entities in its buckets.
+    """
+
+    def __init__(self, map_file=ENTITY_MAP_FILE):
+        self.logger = setup_logger("entity_resolution")
+        self.map_file = map_file
+        self.entities: Dict[str, Dict] = {}
+        self.name_index: Dict[str, str] = {}
+        self._buckets: Dict[Tuple, List[str]] = {}
+        self._shingle_cache: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def resolve(self, deals: Iterable[Deal]) -> List[Deal]:
+        """Set ``canonical_id`` on each deal, creating entities for unseen products."""
+        deals = list(deals)
+        with self._lock:
+            new_entities = 0
+            for deal in deals:
+                key = ' '.join(deal.product.lower().split())
+                canonical_id = self.name_index.get(key)
+                if canonical_id is None:
+                    canonical_id, created = self._match_or_create(deal.product)
+                    new_entities += created
+                    self.name_index[key] = canonical_id
+                    self._dirty = True
+                deal.canonical_id = canonical_id
+        if new_entities:
+            self.logger.info(f"Resolved {len(deals)} deals, {new_entities} new products")
+        return deals
+
+    def __call__(self, deals: List[Deal]) -> List[Deal]:
+        return self.resolve(deals)
+
+    def save(self) -> None:
+        """Persist the mapping if it changed since it was loaded."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_file = self.map_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'entities': self.entities, 'names': self.name_index}, f, ensure_ascii=False)
+            tmp_file.replace(self.map_file)
+            self._dirty = False
+
+    def _match_or_create(self, product: str) -> Tuple[str, bool]:
+        core, brand, quantity = normalize_product_name(product)
+        shingles = _shingles(core)
+        signature = minhash(shingles)
+
+        best_id, best_similarity = None, MATCH_THRESHOLD
+        candidates = set()
+        for band_key in _band_keys(signature, quantity):
+            candidates.update(self._buckets.get(band_key, ()))
+        for candidate_id in candidates:
+            entity = self.entities[candidate_id]
+            # Different brands are different products, unless one side has none
+            if brand and entity['brand'] and brand != entity['brand']:
+                continue
+            similarity = _jaccard(shingles, self._entity_shingles(candidate_id))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+        if best_id is not None:
+            return best_id, False
+
+        canonical_id = 'p' + hashlib.sha1(f"{brand}|{core}|{quantity}".encode('utf-8')).hexdigest()[:12]
+        if canonical_id in self.entities:
+            return canonical_id, False  # Same normalized product that blocking did not surface
+        self.entities[canonical_id] = {'name': product, 'core': core, 'brand': brand,
+                                       'quantity': quantity, 'signature': signature}
+        self._index(canonical_id)
+        return canonical_id, True
+
+    def _entity_shingles(self, canonical_id: str) -> Set[str]:
+        shingles = self._shingle_cache.get(canonical_id)
+        if shingles is None:
+            shingles = self._shingle_cache[canonical_id] = _shingles(self.entities[canonical_id]['core'])
+        return shingles
+
+    def _index(self, canonical_id: str) -> None:
+        entity = self.entities[canonical_id]
+        for band_key in _band_keys(entity['signature'], entity['quantity']):
+            self._buckets.setdefault(band_key, []).append(canonical_id)
+
+    def _load(self) -> None:
+        try:
+            with open(self.map_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.logger.error(f"Could not read entity map, starting empty: {str(e)}")
+            return
+        self.entities = stored.get('entities', {})
+        self.name_index = stored.get('names', {})
+        for canonical_id in self.entities:
+            self._index(canonical_id)
@@ -0,0 +1,18 @@
+import math
+from typing import Tuple
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_km(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    """Great-circle distance between two (lat, lon) points in km."""
+    lat1, lon1 = origin
+    lat2, lon2 = destination
+
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
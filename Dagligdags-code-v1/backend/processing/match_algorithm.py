@@ -1,16 +1,251 @@
+import bisect
+import heapq
+import itertools
 import json
 import math
-from datetime import datetime
-from typing import Dict, List, Tuple
-from config.constants import PREFERENCE_WEIGHTS, DISTANCE_PENALTIES
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from config.paths import USER_PROFILES_DIR
+from backend.processing.deal import Deal, as_deal
+from backend.processing.deal_snapshot import DealSnapshot, SnapshotDelta
+from backend.processing.profile_store import ProfileFeatureStore, profile_preferences
+from backend.processing.regions import NATIONAL, RegionRegistry, profile_region
+from backend.processing.similarity_index import SimilarityIndex
+from backend.processing.scoring_plan import ScoringPlan, deal_score_bound, profile_fingerprint, render_reasons
 from utilities.logger import setup_logger, log_deal_match
 
-class DealMatcher:
+TOP_K = 50  # Deals returned per user
+CACHE_DEPTH = 2 * TOP_K  # Ranked deals kept per user so removals rarely force a rescore
+PLAN_CACHE_SIZE = 10000  # Compiled scoring plans kept in memory
+COHORT_CACHE_SIZE = 1000  # Shared (signature, region) rankings kept in memory
+SIMILAR_K = 10  # Alternatives returned for a product query
+PLANS_DIR = "scoring_plans"  # Compiled plans of profiles that need their JSON, under the profiles directory
+
+
+class _TopKCache:
+    """Exact top-N of one user's ranking for one snapshot version.
+
+    Invariant: every deal in the snapshot that is not in ``scores`` scores at
+    most ``floor``. ``truncated`` is False when nothing positive was left out.
+    """
+
+    def __init__(self, plan: ScoringPlan, location, region: str, version: int, ranked: List[Tuple[float, str]]):
+        self.plan = plan
+        self.location = location
+        self.region = region
+        self.version = version
+        self.truncated = len(ranked) > CACHE_DEPTH
+        self.scores = {deal_id: score for score, deal_id in ranked[:CACHE_DEPTH]}
+        self.floor = ranked[CACHE_DEPTH - 1][0] if self.truncated else 0.0
+
+    def ranked(self) -> List[Tuple[float, str]]:
+        return sorted(((score, deal_id) for deal_id, score in self.scores.items()),
+                      key=lambda item: (-item[0], item[1]))
+
+
+class _InterestIndex:
+    """(store, category) -> cached users, sorted by the bound a deal must reach to enter their top-K.
+
+    A deal can only enter a user's top-K if its best possible score for
+    that user, ``bound + store bonus - diet penalty``, reaches the user's
+    floor. Users with an untruncated cache take every positive deal. Entries
+    are moved as caches are created, re-truncated or evicted, so a delta
+    only looks up its keys; a key is sorted from scratch once, the first
+    time a deal with it shows up.
+    """
+
     def __init__(self):
+        self._keys: Dict[Tuple[str, str], List[Tuple[float, str]]] = {}
+        # user -> (plan, truncated, floor) as indexed, since caches change in place
+        self._indexed: Dict[str, Tuple[ScoringPlan, bool, float]] = {}
+
+    def put(self, user_id: str, cache: _TopKCache) -> None:
+        self.discard(user_id)
+        state = self._indexed[user_id] = (cache.plan, cache.truncated, cache.floor)
+        for key, entries in self._keys.items():
+            bisect.insort(entries, (_threshold(state, key), user_id))
+
+    def discard(self, user_id: str) -> None:
+        state = self._indexed.pop(user_id, None)
+        if state is None:
+            return
+        for key, entries in self._keys.items():
+            del entries[bisect.bisect_left(entries, (_threshold(state, key), user_id))]
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._indexed.clear()
+
+    def users(self, key: Tuple[str, str], bound: float) -> List[str]:
+        """Users a deal with this (store, category) and score bound could enter the top-K of."""
+        entries = self._keys.get(key)
+        if entries is None:
+            entries = self._keys[key] = sorted((_threshold(state, key), user_id)
+                                               for user_id, state in self._indexed.items())
+        return [user_id for _, user_id in entries[:bisect.bisect_right(entries, bound, key=lambda e: e[0])]]
+
+
+def _threshold(state: Tuple[ScoringPlan, bool, float], key: Tuple[str, str]) -> float:
+    plan, truncated, floor = state
+    if not truncated:
+        return -math.inf
+    store, category = key
+    return floor - plan.store_bonus(store) + plan.diet_penalty(category)
+
+
+class _RegionView:
+    """The currently valid deals users in one region see, for one snapshot version.
+
+    Shared by every user in the region. Deals are ordered by
+    ``deal_score_bound``, best first (ties by deal id), so a top-K rebuild
+    can stop as soon as no remaining deal can make the cut. A snapshot delta
+    is applied in place, touching only the deals it names; cohort rankings
+    built on the previous version see the version change and are rebuilt.
+    """
+
+    def __init__(self, region: str, version: int, deals: List[Deal]):
+        self.region = region
+        self.version = version
+        self._order = sorted((-deal_score_bound(deal), deal.deal_id) for deal in deals)
+        self.by_id = {deal.deal_id: deal for deal in deals}
+        self.bounds = [-neg_bound for neg_bound, _ in self._order]
+        self.deals = [self.by_id[deal_id] for _, deal_id in self._order]
+        # Counted, so a store or location leaves the view with its last deal
+        self._stores = Counter(deal.store for deal in self.deals)
+        self._locations = Counter(deal.store_location for deal in self.deals)
+
+    @property
+    def stores(self) -> Iterable[str]:
+        return self._stores.keys()
+
+    @property
+    def locations(self) -> Iterable:
+        return self._locations.keys()
+
+    def apply_delta(self, delta: SnapshotDelta, visible: Callable[[Deal], bool]) -> None:
+        """Move the view to ``delta.to_version``; ``visible`` says whether a new deal belongs in it."""
+        for deal in delta.removed + delta.changed:
+            self._remove(deal.deal_id)
+        for deal in delta.added + delta.changed:
+            if visible(deal):
+                self._insert(deal)
+        self.version = delta.to_version
+
+    def _insert(self, deal: Deal) -> None:
+        key = (-deal_score_bound(deal), deal.deal_id)
+        i = bisect.bisect_left(self._order, key)
+        self._order.insert(i, key)
+        self.bounds.insert(i, -key[0])
+        self.deals.insert(i, deal)
+        self.by_id[deal.deal_id] = deal
+        self._stores[deal.store] += 1
+        self._locations[deal.store_location] += 1
+
+    def _remove(self, deal_id: str) -> None:
+        deal = self.by_id.pop(deal_id, None)
+        if deal is None:
+            return
+        i = bisect.bisect_left(self._order, (-deal_score_bound(deal), deal_id))
+        del self._order[i], self.bounds[i], self.deals[i]
+        for counts, value in ((self._stores, deal.store), (self._locations, deal.store_location)):
+            counts[value] -= 1
+            if not counts[value]:
+                del counts[value]
+
+
+class _CohortRanking:
+    """Location-independent ranking of one region view for one plan signature.
+
+    Shared by every user whose profile compiles to the same rules. Deals are
+    scored lazily in bound order: ``ranked`` holds every deal scored so far,
+    best first, and no unscored deal can beat ``frontier``, so entries at or
+    above it are in their final order. Users read it as deep as their
+    distance penalties require and it grows on demand.
+    """
+
+    def __init__(self, plan: ScoringPlan, view: _RegionView):
+        self.plan = plan
+        self.view = view
+        self.version = view.version
+        self.max_bonus = max((plan.store_bonus(store) for store in view.stores), default=0.0)
+        self.ranked: List[Tuple[float, Deal, int]] = []
+        self.scored = 0  # Deals evaluated so far, across all users of the cohort
+        self._pos = 0
+        self.frontier = self._reach(0)
+
+    def settled(self, i: int) -> bool:
+        """Whether ``ranked[i]`` exists and is in its final position."""
+        return i < len(self.ranked) and self.ranked[i][0] >= self.frontier
+
+    def extend(self, need: int) -> None:
+        """Score more deals until ``need`` entries are settled or no positive deal is left."""
+        evaluate_base = self.plan.evaluate_base
+        view = self.view
+        best = heapq.nlargest(need, (score for score, _, _ in self.ranked))
+        best.reverse()
+        heapq.heapify(best)
+        added = []
+        while self.frontier > 0 and not (len(best) >= need and self.frontier < best[0]):
+            deal = view.deals[self._pos]
+            score, mask = evaluate_base(deal)
+            self._pos += 1
+            self.scored += 1
+            self.frontier = self._reach(self._pos)
+            if score > 0:
+                added.append((score, deal, mask))
+                if len(best) >= need:
+                    heapq.heappushpop(best, score)
+                else:
+                    heapq.heappush(best, score)
+        if added:
+            self.ranked.extend(added)
+            self.ranked.sort(key=lambda item: item[0], reverse=True)
+
+    def scan_depth(self, threshold: float) -> int:
+        """How many deals, in bound order, can reach ``threshold``: a lone user's scan."""
+        return bisect.bisect_left(self.view.bounds, self.max_bonus - threshold, key=lambda bound: -bound)
+
+    def _reach(self, pos: int) -> float:
+        # Best base score any deal from ``pos`` on can have; -inf when none is left
+        if pos >= len(self.view.deals):
+            return -math.inf
+        return self.view.bounds[pos] + self.max_bonus
+
+
+class DealMatcher:
+    def __init__(self, snapshot: Optional[DealSnapshot] = None, profiles_dir: Path = USER_PROFILES_DIR,
+                 region_registry: Optional[RegionRegistry] = None, clock: Callable[[], date] = date.today):
         self.logger = setup_logger("deal_matcher")
+        self.profiles_dir = Path(profiles_dir)
+        # Compiled preferences, read with one seek instead of parsing profile JSON
+        self.features = ProfileFeatureStore(self.profiles_dir)
+        self._snapshot = snapshot
+        # Regions with users; new ones are registered as their first user shows up
+        self.regions = region_registry or RegionRegistry()
+        self._topk: Dict[str, _TopKCache] = {}
+        self._interest = _InterestIndex()
+        self._plans: Dict[str, ScoringPlan] = {}
+        self._views: Dict[str, _RegionView] = {}
+        self._cohorts: Dict[Tuple[str, str], _CohortRanking] = {}
+        self._similar: Optional[SimilarityIndex] = None
+        # Deals evaluated by top-K rebuilds, and what scoring each user alone would have cost
+        self.cohort_stats = {'rebuilds': 0, 'deals_scored': 0, 'deals_scored_unshared': 0}
+        self.clock = clock
+        self._today = ''  # Day the caches were built for; only deals valid then are ranked
+        self._lock = threading.RLock()
+
+    @property
+    def snapshot(self) -> DealSnapshot:
+        """Current deal snapshot, loaded from the newest scrape on first use."""
+        if self._snapshot is None:
+            self._snapshot = DealSnapshot.load_latest()
+        return self._snapshot
     
-    def find_personalized_deals(self, user_id: str, available_deals: List[Dict], user_location: Tuple[float, float] = None) -> List[Dict]:
+    def find_personalized_deals(self, user_id: str, available_deals: List[Deal], user_location: Tuple[float, float] = None) -> List[Dict]:
         """Find deals personalized for specific user"""
         
         # Load user profile
@@ -18,194 +253,430 @@ class DealMatcher:
         if not user_profile:
             self.logger.warning(f"No profile found for user {user_id}")
             return []
+        plan = self._get_scoring_plan(user_id, user_profile)
         
-        # Score all deals
-        scored_deals = []
-        for deal in available_deals:
-            score = self._calculate_match_score(deal, user_profile, user_location)
-            if score > 0:  # Only include deals with positive scores
-                deal_copy = deal.copy()
-                deal_copy['match_score'] = score
-                deal_copy['recommendation_reason'] = self._get_recommendation_reason(deal, user_profile)
-                scored_deals.append(deal_copy)
-        
-        # Sort by score (highest first)
-        scored_deals.sort(key=lambda x: x['match_score'], reverse=True)
+        # Score all currently valid deals; only the returned top deals are turned into dicts
+        today = self.current_day()
+        deals = (deal for deal in map(as_deal, available_deals) if deal.valid_on(today))
+        ranked = self._score_deals(plan, deals, user_location)
+        scored_deals = [_match_result(deal, score, reasons) for score, deal, reasons in ranked[:TOP_K]]
         
         # Log matching results
-        avg_score = sum(d['match_score'] for d in scored_deals) / len(scored_deals) if scored_deals else 0
-        log_deal_match(user_id, len(scored_deals), avg_score)
+        avg_score = sum(item[0] for item in ranked) / len(ranked) if ranked else 0
+        log_deal_match(user_id, len(ranked), avg_score)
         
-        return scored_deals[:50]  # Return top 50 deals
+        return scored_deals  # Top 50 deals
     
-    def _calculate_match_score(self, deal: Dict, user_profile: Dict, user_location: Tuple[float, float] = None) -> float:
-        """Calculate how well a deal matches user preferences"""
-        
-        score = 0.0
-        
-        # Base price score (higher discount = higher score)
-        if 'discount_percentage' in deal:
-            score += deal['discount_percentage'] * 0.1
-        elif 'price' in deal:
-            # Lower price gets higher score
-            price_score = max(0, 100 - deal['price']) * 0.01
-            score += price_score
-        
-        # Organic preference
-        if user_profile.get('organic_preference', 3) >= 4 and deal.get('organic', False):
-            score += PREFERENCE_WEIGHTS['organic']
-        
-        # Local preference
-        if user_profile.get('local_preference', 3) >= 4 and deal.get('local', False):
-            score += PREFERENCE_WEIGHTS['local']
-        
-        # Price sensitivity
-        if user_profile.get('price_sensitivity', 3) >= 4:
-            score += PREFERENCE_WEIGHTS['price_sensitive']
-        
-        # Dietary restrictions
-        user_allergies = user_profile.get('allergies', [])
-        deal_allergens = deal.get('allergens', [])
-        if any(allergen in deal_allergens for allergen in user_allergies):
-            score -= 5.0  # Heavy penalty for allergens
-        
-        # Diet compatibility
-        user_diet = user_profile.get('diet', [])
-        if 'vegetarian' in user_diet and deal.get('product_category') == 'meat':
-            score -= 3.0
-        if 'vegan' in user_diet and deal.get('product_category') in ['meat', 'dairy']:
-            score -= 3.0
-        
-        # Cuisine preferences
-        user_cuisines = user_profile.get('cuisine_preferences', [])
-        deal_cuisine = deal.get('cuisine_type', '')
-        if deal_cuisine and deal_cuisine.lower() in [c.lower() for c in user_cuisines]:
-            score += 1.5
-        
-        # Pantry type matching
-        user_pantry = user_profile.get('pantry_type', '')
-        if user_pantry == 'high_protein' and deal.get('protein_content', 0) > 20:
-            score += 2.0
-        
-        # Package size preference
-        user_package_pref = user_profile.get('package_preference', 'regular')
-        deal_package = deal.get('package_size', 'regular')
-        if user_package_pref == deal_package:
-            score += 1.0
-        
-        # Store preference
-        user_stores = user_profile.get('preferred_stores', [])
-        if deal.get('store') in user_stores:
-            score += 1.5
-        
-        # Membership discount
-        user_memberships = user_profile.get('loyalty_memberships', [])
-        deal_store = deal.get('store', '')
-        if self._has_membership_discount(deal_store, user_memberships):
-            score += 2.0
-        
-        # Distance penalty
-        if user_location and 'store_location' in deal:
-            distance = self._calculate_distance(user_location, deal['store_location'])
-            transport_mode = user_profile.get('transport_mode', 'walking')
-            distance_penalty = distance * DISTANCE_PENALTIES.get(transport_mode, 0.5)
-            score -= distance_penalty
-        
-        # Sustainability score
-        if user_profile.get('sustainability_importance', 3) >= 4:
-            sustainability_score = deal.get('sustainability_score', 5)
-            score += (sustainability_score - 5) * 0.3  # Bonus/penalty based on sustainability
-        
-        return max(0, score)  # Never negative
+    def find_current_deals(self, user_id: str, user_location: Tuple[float, float] = None) -> List[Dict]:
+        """Personalized top deals from the live snapshot, served from the top-K cache.
+
+        The ranking is rebuilt from scratch only when the user's profile,
+        location or region changed, or when the cache missed a snapshot delta.
+        """
+        return list(itertools.islice(self.iter_current_deals(user_id, user_location), TOP_K))
     
-    def _get_recommendation_reason(self, deal: Dict, user_profile: Dict) -> str:
-        """Generate human-readable reason for recommendation"""
-        reasons = []
-        
-        if deal.get('organic') and user_profile.get('organic_preference', 3) >= 4:
-            reasons.append("matches your organic preference")
-        
-        if deal.get('local') and user_profile.get('local_preference', 3) >= 4:
-            reasons.append("is locally produced")
-        
-        if user_profile.get('price_sensitivity', 3) >= 4 and deal.get('discount_percentage', 0) > 20:
-            reasons.append(f"{deal.get('discount_percentage', 0):.0f}% discount")
-        
-        user_cuisines = user_profile.get('cuisine_preferences', [])
-        deal_cuisine = deal.get('cuisine_type', '')
-        if deal_cuisine and deal_cuisine.lower() in [c.lower() for c in user_cuisines]:
-            reasons.append(f"perfect for {deal_cuisine} cooking")
-        
-        if user_profile.get('pantry_type') == 'high_protein' and deal.get('protein_content', 0) > 20:
-            reasons.append("high in protein")
-        
-        if not reasons:
-            reasons.append("good value")
-        
-        return ", ".join(reasons)
+    def iter_current_deals(self, user_id: str, user_location: Tuple[float, float] = None) -> Iterator[Dict]:
+        """Yield the user's deals from the live snapshot, best first, as they are consumed.
+
+        The cached top-K comes first. Only if the caller keeps reading past it
+        are the remaining deals scored, into a heap that is popped lazily, and
+        each result dict is built only when it is yielded. Deals come from the
+        user's region view: the national catalog with that region's variants.
+        """
+        user_profile = self._load_user_profile(user_id)
+        if not user_profile:
+            self.logger.warning(f"No profile found for user {user_id}")
+            return
+        plan = self._get_scoring_plan(user_id, user_profile)
+        region = profile_region(user_profile)
+        self.regions.add(region)
+        self.current_day()
+        
+        with self._lock:
+            cache = self._topk.get(user_id)
+            if (cache is None or cache.plan.fingerprint != plan.fingerprint or cache.location != user_location
+                    or cache.region != region or cache.version != self.snapshot.version):
+                cache = self._rebuild_topk(user_id, plan, user_location, region)
+            ranked = cache.ranked()
+            truncated = cache.truncated
+            deals = self._region_view(region).by_id
+        
+        for score, deal_id in ranked:
+            deal = deals.get(deal_id)
+            if deal is not None:
+                yield _match_result(deal, score, plan.evaluate(deal, user_location)[1])
+        if not truncated:
+            return
+        
+        # Past the cached top-K: rank the rest on demand
+        cached_ids = {deal_id for _, deal_id in ranked}
+        with self._lock:
+            rest = list(deals.values())  # The view is patched in place by later deltas
+        heap = [(-score, deal.deal_id, deal, reasons)
+                for score, deal, reasons in self._score_deals(plan, rest, user_location, presort=False)
+                if deal.deal_id not in cached_ids]
+        heapq.heapify(heap)
+        while heap:
+            neg_score, _, deal, reasons = heapq.heappop(heap)
+            yield _match_result(deal, -neg_score, reasons)
     
-    def _has_membership_discount(self, store: str, memberships: List[str]) -> bool:
-        """Check if user has membership for store discount"""
-        membership_map = {
-            'coop': 'coop_medlem',
-            'rema': 'ae_rema',
-            'ica': 'ica_kort'
-        }
-        
-        required_membership = membership_map.get(store.lower())
-        return required_membership in [m.lower() for m in memberships]
+    def find_current_deals_batch(self, user_ids: Iterable[str],
+                                 user_locations: Dict[str, Tuple[float, float]] = None) -> Tuple[Dict[str, List[Dict]], Dict]:
+        """Top deals for many users, e.g. every alert recipient after a scrape.
+
+        Returns the deals per user and a run summary: how many users shared
+        each cohort (same plan signature and region), and how many deal
+        evaluations the shared rankings took against scoring each user alone.
+        """
+        user_locations = user_locations or {}
+        before = dict(self.cohort_stats)
+        started = time.perf_counter()
+        results = {}
+        cohorts = Counter()
+        for user_id in user_ids:
+            results[user_id] = self.find_current_deals(user_id, user_locations.get(user_id))
+            cache = self._topk.get(user_id)
+            if cache is not None:
+                cohorts[(cache.plan.signature, cache.region)] += 1
+        
+        summary = {key: self.cohort_stats[key] - before[key] for key in before}
+        summary['users'] = len(results)
+        summary['cohorts'] = len(cohorts)
+        summary['cohort_sizes'] = dict(sorted(Counter(cohorts.values()).items()))  # size -> number of cohorts
+        unshared = summary['deals_scored_unshared']
+        summary['compute_saved'] = 1 - summary['deals_scored'] / unshared if unshared else 0.0
+        summary['seconds'] = time.perf_counter() - started
+        self.logger.info(f"👥 Batch of {summary['users']} users in {summary['cohorts']} cohorts "
+                         f"(largest {max(cohorts.values(), default=0)}): {summary['deals_scored']} deals scored "
+                         f"instead of {unshared}, {summary['compute_saved']:.0%} saved, {summary['seconds']:.2f} s")
+        return results, summary
     
-    def _calculate_distance(self, user_location: Tuple[float, float], store_location: Tuple[float, float]) -> float:
-        """Calculate distance between user and store in km"""
-        lat1, lon1 = user_location
-        lat2, lon2 = store_location
-        
-        # Haversine formula
-        R = 6371  # Earth's radius in km
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        
-        a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+    def deals_for_user(self, user_id: str) -> List[Deal]:
+        """The live deals a user can shop: their region's view of the snapshot."""
+        region = profile_region(self._load_user_profile(user_id))
+        with self._lock:
+            return list(self._region_view(region).deals)
+    
+    def find_similar_deals(self, user_id: str, query: str, k: int = SIMILAR_K) -> List[Dict]:
+        """Deals in the user's region whose product text is nearest ``query``, most similar first."""
+        view = self._region_view(profile_region(self._load_user_profile(user_id)))
+        results = []
+        for similarity, deal in self.similarity_index().similar(query, k, allowed=view.by_id):
+            result = deal.to_dict()
+            result['similarity'] = similarity
+            results.append(result)
+        return results
+    
+    def similarity_index(self) -> SimilarityIndex:
+        """Product-text index over the whole snapshot, built once and then kept up to date by deltas."""
+        with self._lock:
+            snapshot = self.snapshot
+            if self._similar is None or self._similar.version != snapshot.version:
+                started = time.perf_counter()
+                self._similar = SimilarityIndex(snapshot.values(), snapshot.version)
+                self.logger.info(f"🔎 Indexed {len(self._similar)} deals for similarity search "
+                                 f"in {time.perf_counter() - started:.2f}s")
+            return self._similar
+    
+    def _advance_similarity_index(self, delta: SnapshotDelta) -> None:
+        if self._similar is not None and not self._similar.apply_delta(delta):
+            self._similar = None  # Missed a delta; rebuilt on next use
+    
+    def current_day(self) -> str:
+        """Today as an ISO date. The first call on a new day prunes expired deals.
+
+        Deals that start or end with the day change the deals every user can
+        see, so all rankings are rebuilt once per day rather than patched.
+        """
+        today = self.clock().isoformat()
+        if today != self._today:
+            with self._lock:
+                if today != self._today:
+                    delta = self.snapshot.expire(today)
+                    self._advance_similarity_index(delta)
+                    self._topk.clear()
+                    self._interest.clear()
+                    self._views.clear()
+                    self._cohorts.clear()
+                    self._today = today
+                    if delta.removed:
+                        self.logger.info(f"🗓️ {today}: pruned {len(delta.removed)} expired deals")
+        return today
+    
+    def on_store_deals(self, store: str, deals: List[Deal], region: str = NATIONAL) -> SnapshotDelta:
+        """Rescore listener for ScrapingManager: fold one store's fresh national or regional deals in."""
+        with self._lock:
+            self.current_day()
+            snapshot = self.snapshot
+            overridden = store in snapshot.regional_stores(region)
+            delta = snapshot.replace_store(store, deals, region)
+            self.apply_snapshot_delta(delta)
+            if region and (store in snapshot.regional_stores(region)) != overridden:
+                # The chain's national avis stopped (or started) applying in this region
+                self._views.pop(region, None)
+                for user_id in [u for u, cache in self._topk.items() if cache.region == region]:
+                    self._evict(user_id)
+        self.logger.info(f"Applied {delta} for {store}{'@' + region if region else ''} "
+                         f"to {len(self._topk)} cached users")
+        return delta
+    
+    def apply_snapshot_delta(self, delta: SnapshotDelta) -> None:
+        """Move every cached top-K list forward by one snapshot delta.
+
+        Only cached entries of removed/changed deals are touched, and new or
+        changed deals are scored only for users whose cached floor they could
+        possibly beat, found through a (store, category) index of thresholds.
+        """
+        with self._lock:
+            self._advance_similarity_index(delta)
+            self._advance_region_views(delta)
+            stale = []
+            touched = delta.removed + delta.changed
+            for user_id, cache in self._topk.items():
+                if cache.version != delta.from_version:
+                    stale.append(user_id)
+                    continue
+                for deal in touched:
+                    cache.scores.pop(deal.deal_id, None)
+            for user_id in stale:
+                self._evict(user_id)
+            
+            candidates = delta.added + delta.changed
+            visible_in = self.snapshot.visible_in
+            for deal in candidates:
+                if not deal.valid_on(self._today):
+                    continue  # Already over, or next week's avis published early
+                for user_id in self._interest.users(_interest_key(deal), deal_score_bound(deal)):
+                    cache = self._topk[user_id]
+                    if not visible_in(deal, cache.region):
+                        continue
+                    score = cache.plan.score(deal, cache.location)
+                    if score > 0 and (not cache.truncated or score >= cache.floor):
+                        cache.scores[deal.deal_id] = score
+            
+            for user_id, cache in list(self._topk.items()):
+                cache.version = delta.to_version
+                if cache.truncated and len(cache.scores) < TOP_K:
+                    # Too many cached deals disappeared to trust the cache
+                    self._rebuild_topk(user_id, cache.plan, cache.location, cache.region)
+                elif len(cache.scores) > CACHE_DEPTH:
+                    ranked = cache.ranked()
+                    cache.scores = dict((deal_id, score) for score, deal_id in ranked[:CACHE_DEPTH])
+                    cache.floor = ranked[CACHE_DEPTH - 1][0]
+                    cache.truncated = True
+                    self._interest.put(user_id, cache)
+    
+    def _advance_region_views(self, delta: SnapshotDelta) -> None:
+        visible_in = self.snapshot.visible_in
+        for region, view in list(self._views.items()):
+            if view.version != delta.from_version:
+                del self._views[region]  # Missed a delta; rebuilt on next use
+                continue
+            view.apply_delta(delta, lambda deal: visible_in(deal, region) and deal.valid_on(self._today))
+    
+    def _evict(self, user_id: str) -> None:
+        del self._topk[user_id]
+        self._interest.discard(user_id)
+    
+    def _rebuild_topk(self, user_id: str, plan: ScoringPlan, user_location, region: str) -> _TopKCache:
+        """Rank the user's region view from their cohort's shared ranking.
+
+        The cohort ranking is best first before the distance penalty, and
+        every deal costs at least the trip to the nearest store, so once an
+        entry's shared score minus that trip is below the best
+        ``CACHE_DEPTH + 1`` scores found for this user, the rest are skipped.
+        """
+        cohort = self._cohort(plan, region)
+        scored_before = cohort.scored
+        penalties = {}  # By store location: all deals in a store share one trip
+        if user_location:
+            penalties = {location: plan.distance_penalty(location, user_location)
+                         for location in cohort.view.locations if location}
+        nearest = min(penalties.values(), default=0.0) if None not in cohort.view.locations else 0.0
+        ranked = []
+        best = []  # Min-heap of the best CACHE_DEPTH + 1 scores so far
+        i = 0
+        while True:
+            floor = best[0] if len(best) > CACHE_DEPTH else 0.0
+            if not cohort.settled(i) and cohort.frontier - nearest > floor:
+                cohort.extend(max(2 * (i + 1), CACHE_DEPTH + 1))
+                continue
+            if i == len(cohort.ranked):
+                break
+            base, deal, _ = cohort.ranked[i]
+            if base - nearest < floor or base - nearest <= 0:
+                break
+            i += 1
+            score = base - penalties[deal.store_location] if user_location and deal.store_location else base
+            if score > 0:
+                ranked.append((score, deal.deal_id))
+                if len(best) > CACHE_DEPTH:
+                    heapq.heappushpop(best, score)
+                else:
+                    heapq.heappush(best, score)
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        
+        stats = self.cohort_stats
+        stats['rebuilds'] += 1
+        stats['deals_scored'] += cohort.scored - scored_before
+        stats['deals_scored_unshared'] += cohort.scan_depth((best[0] if len(best) > CACHE_DEPTH else 0.0) + nearest)
+        cache = _TopKCache(plan, user_location, region, cohort.version, ranked)
+        self._topk[user_id] = cache
+        self._interest.put(user_id, cache)
+        return cache
+    
+    def _cohort(self, plan: ScoringPlan, region: str) -> _CohortRanking:
+        """The shared ranking for a plan signature in a region, rebuilt once per view version."""
+        view = self._region_view(region)
+        key = (plan.signature, region)
+        cohort = self._cohorts.get(key)
+        if cohort is None or cohort.view is not view or cohort.version != view.version:
+            if cohort is None and len(self._cohorts) >= COHORT_CACHE_SIZE:
+                self._cohorts.pop(next(iter(self._cohorts)))
+            cohort = self._cohorts[key] = _CohortRanking(plan, view)
+        return cohort
+    
+    def _region_view(self, region: str) -> _RegionView:
+        """The shared view of a region's currently valid deals, built once and then kept up to date by deltas."""
+        with self._lock:
+            today = self.current_day()
+            snapshot = self.snapshot
+            view = self._views.get(region)
+            if view is None or view.version != snapshot.version:
+                deals = [deal for deal in snapshot.deals_for_region(region) if deal.valid_on(today)]
+                view = self._views[region] = _RegionView(region, snapshot.version, deals)
+            return view
+    
+    def _score_deals(self, plan: ScoringPlan, deals, user_location=None,
+                     presort: bool = True) -> List[Tuple[float, Deal, int]]:
+        """Score deals with a compiled plan, keeping positive ones sorted best first."""
+        scored = []
+        evaluate = plan.evaluate
+        for deal in deals:
+            score, reasons = evaluate(deal, user_location)
+            if score > 0:  # Only include deals with positive scores
+                scored.append((score, deal, reasons))
+        if presort:
+            scored.sort(key=lambda x: x[0], reverse=True)
+        return scored
+    
+    def _get_scoring_plan(self, user_id: str, user_profile: Dict) -> ScoringPlan:
+        """Compiled plan for a profile: memory cache, then the stored plan file, then compile."""
+        fingerprint = profile_fingerprint(user_profile)
+        plan = self._plans.get(fingerprint)
+        if plan is not None:
+            return plan
+        
+        # Profiles written before plans moved out of them may still carry one
+        stored = user_profile.get('scoring_plan') or self._load_scoring_plan(user_id)
+        if stored and stored.get('fingerprint') == fingerprint:
+            plan = ScoringPlan.from_dict(stored)
+        if plan is None:
+            plan = ScoringPlan.compile(user_profile)
+            if 'feature_version' not in user_profile:
+                # Plans compiled from a feature record are cheap; never stored
+                self._save_scoring_plan(user_id, plan)
+        
+        if len(self._plans) >= PLAN_CACHE_SIZE:
+            self._plans.pop(next(iter(self._plans)))
+        self._plans[fingerprint] = plan
+        return plan
+    
+    def _plan_path(self, user_id: str) -> Path:
+        return self.profiles_dir / PLANS_DIR / f"user_{user_id}.json"
+    
+    def _load_scoring_plan(self, user_id: str) -> Optional[Dict]:
+        try:
+            with open(self._plan_path(user_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Error loading scoring plan for user {user_id}: {str(e)}")
+            return None
+    
+    def _save_scoring_plan(self, user_id: str, plan: ScoringPlan) -> None:
+        """Store a freshly compiled plan beside the user's profile, which is left untouched.
+
+        The plan carries the fingerprint of the profile it was compiled from,
+        so an edited profile never reuses it.
+        """
+        if not self._profile_path(user_id).exists():
+            return
+        plan_file = self._plan_path(user_id)
+        try:
+            plan_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = plan_file.with_name(f".{plan_file.name}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(plan.to_dict(), f, ensure_ascii=False)
+            tmp_file.replace(plan_file)
+        except Exception as e:
+            self.logger.error(f"Error saving scoring plan for user {user_id}: {str(e)}")
+    
+    def profile_version(self, user_id: str) -> Optional[int]:
+        """Modification time of the user's profile file, or None if there is none."""
+        try:
+            return self._profile_path(user_id).stat().st_mtime_ns
+        except OSError:
+            return None
+    
+    def _profile_path(self, user_id: str) -> Path:
+        return self.features.profile_path(user_id)
     
     def _load_user_profile(self, user_id: str) -> Dict:
-        """Load user profile from file"""
-        profile_file = USER_PROFILES_DIR / f"user_{user_id}.json"
+        """User preferences: the feature record if it is current, else the profile file.
+
+        A profile read from JSON (written before the feature store, or edited
+        by hand) is compiled into a record on the way, so the next request
+        for the user skips the JSON.
+        """
+        version = self.profile_version(user_id)
+        if version is None:
+            return {}
+        preferences = self.features.get(user_id, version)
+        if preferences is not None:
+            return preferences
         
         try:
-            with open(profile_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self._profile_path(user_id), 'r', encoding='utf-8') as f:
+                preferences = profile_preferences(json.load(f))
         except FileNotFoundError:
             return {}
         except Exception as e:
             self.logger.error(f"Error loading profile for user {user_id}: {str(e)}")
             return {}
+        self.features.put(user_id, preferences, version)
+        return preferences
     
-    def optimize_shopping_basket(self, user_id: str, shopping_list: List[str], available_deals: List[Dict]) -> Dict:
+    def optimize_shopping_basket(self, user_id: str, shopping_list: List[str], available_deals: List[Deal]) -> Dict:
         """Optimize shopping across multiple stores"""
         
         user_profile = self._load_user_profile(user_id)
         max_distance = user_profile.get('max_distance', 5.0)  # km
+        today = self.current_day()
         
-        # Group deals by store
+        # Group currently valid deals by store, keeping the best value deal per list item
         stores_with_items = {}
-        for deal in available_deals:
-            store = deal.get('store')
-            product = deal.get('product', '').lower()
+        for deal in map(as_deal, available_deals):
+            if not deal.valid_on(today):
+                continue
+            product = deal.product.lower()
             
             # Check if deal matches shopping list
             for list_item in shopping_list:
                 if list_item.lower() in product:
-                    if store not in stores_with_items:
-                        stores_with_items[store] = []
-                    stores_with_items[store].append({
-                        'item': list_item,
-                        'deal': deal,
-                        'price': deal.get('price', 0)
-                    })
+                    items = stores_with_items.setdefault(deal.store, {})
+                    best = items.get(list_item)
+                    if best is None or _value_key(deal) < _value_key(best['deal']):
+                        items[list_item] = {
+                            'item': list_item,
+                            'deal': deal,
+                            'price': deal.price or 0,
+                            'unit_price': deal.unit_price,
+                            'price_unit': deal.price_unit,
+                        }
+        self._add_substitutes(stores_with_items, shopping_list, available_deals, today)
+        stores_with_items = {store: list(items.values()) for store, items in stores_with_items.items()}
         
         # Calculate optimal combination
         combinations = self._generate_store_combinations(stores_with_items, shopping_list)
@@ -213,6 +684,31 @@ class DealMatcher:
         
         return best_combination
     
+    def _add_substitutes(self, stores_with_items: Dict, shopping_list: List[str], available_deals: List[Deal],
+                         today: str) -> None:
+        """For list items no store has, offer each store's most similar deal instead."""
+        found = {item for items in stores_with_items.values() for item in items}
+        missing = [item for item in shopping_list if item not in found]
+        if not missing:
+            return
+        valid = [deal for deal in map(as_deal, available_deals) if deal.valid_on(today)]
+        index = self.similarity_index()
+        if not all(deal in index for deal in valid):
+            index = SimilarityIndex(valid)  # Deals from outside the snapshot
+        allowed = {deal.deal_id for deal in valid}
+        for list_item in missing:
+            for similarity, deal in index.similar(list_item, len(allowed), allowed=allowed):
+                items = stores_with_items.setdefault(deal.store, {})
+                if list_item not in items:  # Best first, so the first hit per store is its closest
+                    items[list_item] = {
+                        'item': list_item,
+                        'deal': deal,
+                        'price': deal.price or 0,
+                        'unit_price': deal.unit_price,
+                        'price_unit': deal.price_unit,
+                        'similarity': similarity,
+                    }
+    
     def _generate_store_combinations(self, stores_with_items: Dict, shopping_list: List[str]) -> List[Dict]:
         """Generate possible store combinations for shopping list"""
         # Simplified: just return single-store and two-store combinations
@@ -263,6 +759,27 @@ class DealMatcher:
         
         return best_combination or {'stores': [], 'items': [], 'coverage': 0, 'total_price': 0}
 
+def _interest_key(deal: Deal) -> Tuple[str, str]:
+    return deal.store, deal.product_category
+
+
+def _value_key(deal: Deal) -> Tuple:
+    """Orders deals for one list item: unit-priced deals by NOK per unit, then by price."""
+    if deal.unit_price is not None:
+        return (0, deal.price_unit, deal.unit_price)
+    return (1, '', deal.price if deal.price is not None else float('inf'))
+
+
+def _match_result(deal: Deal, score: float, reasons: int) -> Dict:
+    """A returned match in the JSON deal shape plus score and reason.
+
+    The only place a reason mask is rendered, so batch scoring never builds text.
+    """
+    result = deal.to_dict()
+    result['match_score'] = score
+    result['recommendation_reason'] = render_reasons(reasons, deal)
+    return result
+
 # Test the matcher
 if __name__ == "__main__":
     matcher = DealMatcher()
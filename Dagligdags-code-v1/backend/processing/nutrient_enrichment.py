@@ -0,0 +1,208 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from config.paths import NORMALIZED_DATA_DIR
+from backend.processing.deal import Deal
+from backend.processing.entity_resolution import normalize_product_name
+from backend.scraping.database_scraper import load_food_db
+from utilities.logger import setup_logger
+
+LOOKUP_CACHE_FILE = NORMALIZED_DATA_DIR / "nutrient_lookup_cache.json"
+FUZZY_THRESHOLD = 0.5
+MIN_COMPOUND_LENGTH = 3  # Shortest food name matched inside a compound word ("ost" in "hvitost")
+
+
+class FoodRecord(NamedTuple):
+    name: str
+    category: str
+    protein_per_100g: float
+    sustainability_score: Optional[float]
+    local_availability: bool
+
+
+def latest_food_db_file(directory: Path = NORMALIZED_DATA_DIR) -> Optional[Path]:
+    """Newest DatabaseScraper output, old (database_data_*) or new (food_db_*) naming."""
+    files = list(directory.glob("database_data_*.json")) + list(directory.glob("food_db_*"))
+    return max(files, key=lambda f: f.stat().st_mtime) if files else None
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodIndex:
+    """Exact and trigram lookup over the foods in one food-database file."""
+
+    def __init__(self, records: Iterable[FoodRecord]):
+        self.by_name: Dict[str, FoodRecord] = {}
+        self._trigram_index: Dict[str, List[str]] = {}
+        self._name_trigrams: Dict[str, set] = {}
+        for record in records:
+            if record.name in self.by_name:
+                continue
+            self.by_name[record.name] = record
+            grams = self._name_trigrams[record.name] = _trigrams(record.name)
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(record.name)
+        # Longest names first, so "svinekjøtt" wins over "kjøtt"
+        self._compound_names = sorted((n for n in self.by_name if len(n) >= MIN_COMPOUND_LENGTH),
+                                      key=len, reverse=True)
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'FoodIndex':
+        return cls(_food_records(load_food_db(path)))
+
+    def lookup(self, core: str) -> Optional[str]:
+        """Name of the food a normalized product name refers to, if any."""
+        if core in self.by_name:
+            return core
+        words = core.split()
+        for word in words:
+            if word in self.by_name:
+                return word
+        for word in words:
+            for name in self._compound_names:
+                if word.startswith(name) or word.endswith(name):
+                    return name
+        return self._fuzzy(core)
+
+    def _fuzzy(self, core: str) -> Optional[str]:
+        grams = _trigrams(core)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for name in self._trigram_index.get(gram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        best, best_score = None, FUZZY_THRESHOLD
+        for name, count in shared.items():
+            score = count / len(grams | self._name_trigrams[name])
+            if score >= best_score:
+                best, best_score = name, score
+        return best
+
+
+def _food_records(data: Dict) -> List[FoodRecord]:
+    """Flatten the food-database sections into records keyed by lower-case name."""
+    nutrition = {name.lower(): facts for name, facts in data.get('nutrition_data', {}).items()}
+    records = []
+    for item in data.get('norwegian_foods', []) + data.get('international_foods', []):
+        for key in ('norwegian_name', 'english_name', 'name'):
+            name = (item.get(key) or '').strip().lower()
+            if not name:
+                continue
+            protein = (item.get('protein_per_100g')
+                       or item.get('nutrients', {}).get('protein_g')
+                       or nutrition.get(name, {}).get('protein_g', 0))
+            records.append(FoodRecord(
+                name=name,
+                category=item.get('category', ''),
+                protein_per_100g=float(protein or 0),
+                sustainability_score=_optional_float(item.get('sustainability_score')),
+                local_availability=bool(item.get('local_availability', False)),
+            ))
+    return records
+
+
+def _optional_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+class NutrientEnricher:
+    """Fills protein, sustainability and category on deals from the food database.
+
+    ``local_availability`` in the database means the food can be bought in
+    Norway, not that this product is locally produced, so it does not set
+    ``Deal.local``.
+
+    Product names are resolved to a food once; the resolution is cached by
+    normalized name and persisted, keyed to the food-database file it was made
+    against, so a daily scrape mostly hits the cache.
+    """
+
+    def __init__(self, food_db_file: Optional[Path] = None, cache_file: Path = LOOKUP_CACHE_FILE):
+        self.logger = setup_logger("nutrient_enrichment")
+        self.food_db_file = food_db_file or latest_food_db_file()
+        self.cache_file = cache_file
+        self.index = FoodIndex.from_file(self.food_db_file) if self.food_db_file else FoodIndex([])
+        self._cache: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load_cache()
+
+    def enrich(self, deals: Iterable[Deal]) -> List[Deal]:
+        """Annotate a batch of deals in place; values the store gave are kept."""
+        deals = list(deals)
+        matched = 0
+        with self._lock:
+            for deal in deals:
+                record = self._resolve(deal.product)
+                if record is None:
+                    continue
+                matched += 1
+                if not deal.protein_content:
+                    deal.protein_content = record.protein_per_100g
+                if deal.sustainability_score is None:
+                    deal.sustainability_score = record.sustainability_score
+                if not deal.product_category and record.category:
+                    deal.product_category = record.category
+        self.logger.info(f"Enriched {matched}/{len(deals)} deals with nutrient data")
+        return deals
+
+    def __call__(self, deals: List[Deal]) -> List[Deal]:
+        return self.enrich(deals)
+
+    def refresh(self) -> bool:
+        """Switch to the newest food database if a later scrape wrote one; True if it did.
+
+        Lookups made against the old database are saved under its key and
+        the cache kept for the new one, if any, is loaded in their place.
+        """
+        latest = latest_food_db_file(self.food_db_file.parent) if self.food_db_file else latest_food_db_file()
+        if latest is None or latest == self.food_db_file:
+            return False
+        index = FoodIndex.from_file(latest)
+        self.save()
+        with self._lock:
+            self.food_db_file = latest
+            self.index = index
+            self._cache = {}
+            self._dirty = False
+            self._load_cache()
+        self.logger.info(f"🥦 Nutrient lookups now use {latest.name}")
+        return True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'food_db': self._db_key(), 'lookups': self._cache}, f, ensure_ascii=False)
+            tmp_file.replace(self.cache_file)
+            self._dirty = False
+
+    def _resolve(self, product: str) -> Optional[FoodRecord]:
+        core = normalize_product_name(product)[0]
+        if core in self._cache:
+            name = self._cache[core]
+        else:
+            name = self._cache[core] = self.index.lookup(core)
+            self._dirty = True
+        return self.index.by_name.get(name) if name else None
+
+    def _db_key(self) -> str:
+        return self.food_db_file.name if self.food_db_file else ''
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.logger.error(f"Could not read nutrient lookup cache: {str(e)}")
+            return
+        # Lookups made against another food database are stale
+        if stored.get('food_db') == self._db_key():
+            self._cache = stored.get('lookups', {})
@@ -0,0 +1,76 @@
+import statistics
+from typing import Dict, Iterable, List, Optional
+from config.constants import Constants
+from backend.processing.deal import Deal
+from utilities.logger import setup_logger
+
+class PriceAnalyzer:
+    """Price statistics over scraped deals, per category and per store."""
+
+    def __init__(self):
+        self.logger = setup_logger("price_analyzer")
+
+    def price_level(self, deal: Deal) -> Optional[str]:
+        """Classify a deal's price against the Norwegian NOK thresholds."""
+        if deal.price is None:
+            return None
+        for level, threshold in sorted(Constants.PRICE_THRESHOLDS_NOK.items(), key=lambda item: item[1]):
+            if deal.price <= threshold:
+                return level
+        return 'premium'
+
+    def category_stats(self, deals: Iterable[Deal]) -> Dict[str, Dict]:
+        """Count, min, max, mean and median price for each product category."""
+        prices = self._group_prices(deals, key=lambda deal: deal.product_category or 'ukjent')
+        return {category: _summarize(values) for category, values in prices.items()}
+
+    def store_stats(self, deals: Iterable[Deal]) -> Dict[str, Dict]:
+        """The same summary per store, for comparing chains."""
+        prices = self._group_prices(deals, key=lambda deal: deal.store)
+        return {store: _summarize(values) for store, values in prices.items()}
+
+    def cheapest_by_store(self, deals: Iterable[Deal], query: str) -> Dict[str, Deal]:
+        """Cheapest deal per store whose product name contains ``query``."""
+        query = query.lower()
+        cheapest = {}
+        for deal in deals:
+            if deal.price is None or query not in deal.product.lower():
+                continue
+            best = cheapest.get(deal.store)
+            if best is None or deal.price < best.price:
+                cheapest[deal.store] = deal
+        return cheapest
+
+    def compare_across_stores(self, deals: Iterable[Deal]) -> Dict[str, Dict[str, Deal]]:
+        """Cheapest deal per store for every product sold by more than one chain.
+
+        Products are matched on ``canonical_id`` from entity resolution, so
+        "Tine Lettmelk 1 l" at Rema and "TINE lettmelk 1,0% 1L" at Kiwi compare.
+        """
+        by_product = {}
+        for deal in deals:
+            if deal.price is None or not deal.canonical_id:
+                continue
+            stores = by_product.setdefault(deal.canonical_id, {})
+            best = stores.get(deal.store)
+            if best is None or deal.price < best.price:
+                stores[deal.store] = deal
+        return {product: stores for product, stores in by_product.items() if len(stores) > 1}
+
+    @staticmethod
+    def _group_prices(deals: Iterable[Deal], key) -> Dict[str, List[float]]:
+        grouped = {}
+        for deal in deals:
+            if deal.price is not None:
+                grouped.setdefault(key(deal), []).append(deal.price)
+        return grouped
+
+
+def _summarize(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'min': min(values),
+        'max': max(values),
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+    }
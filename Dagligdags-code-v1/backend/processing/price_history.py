@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.paths import PRICE_HISTORY_DB
+from backend.processing.deal import Deal
+
+
+class PriceHistory:
+    """Daily price aggregates per store and product, kept after raw snapshots expire.
+
+    Products are keyed by ``canonical_id`` when entity resolution has run and
+    by ``deal_id`` otherwise. Each compacted snapshot file is recorded so that
+    compacting it twice does not count its prices twice.
+    """
+
+    def __init__(self, db_path=PRICE_HISTORY_DB):
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS price_history ("
+                " day TEXT, store TEXT, product_key TEXT, product TEXT,"
+                " min_price REAL, max_price REAL, total_price REAL, observations INTEGER,"
+                " min_unit_price REAL, price_unit TEXT,"
+                " PRIMARY KEY (day, store, product_key))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS compacted_files (name TEXT PRIMARY KEY, day TEXT)")
+
+    def is_recorded(self, file_name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM compacted_files WHERE name = ?", (file_name,)).fetchone()
+        return row is not None
+
+    def record(self, file_name: str, day: str, deals: Iterable[Deal]) -> int:
+        """Fold one snapshot's prices into the aggregates for ``day`` (YYYY-MM-DD)."""
+        rows = [(day, deal.store, deal.canonical_id or deal.deal_id, deal.product,
+                 deal.price, deal.price, deal.price, deal.unit_price, deal.price_unit)
+                for deal in deals if deal.price is not None]
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM compacted_files WHERE name = ?", (file_name,)).fetchone():
+                return 0
+            self._conn.executemany(
+                "INSERT INTO price_history VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT (day, store, product_key) DO UPDATE SET"
+                " min_price = min(min_price, excluded.min_price),"
+                " max_price = max(max_price, excluded.max_price),"
+                " total_price = total_price + excluded.total_price,"
+                " observations = observations + 1,"
+                " min_unit_price = coalesce(min(min_unit_price, excluded.min_unit_price),"
+                "                           min_unit_price, excluded.min_unit_price)",
+                rows,
+            )
+            self._conn.execute("INSERT INTO compacted_files VALUES (?, ?)", (file_name, day))
+        return len(rows)
+
+    def history(self, product_key: str, store: Optional[str] = None) -> List[Dict]:
+        """Daily aggregates for one product, oldest first."""
+        query = ("SELECT day, store, product, min_price, max_price, total_price / observations,"
+                 " observations, min_unit_price, price_unit FROM price_history WHERE product_key = ?")
+        params = [product_key]
+        if store is not None:
+            query += " AND store = ?"
+            params.append(store)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY day, store", params).fetchall()
+        columns = ('day', 'store', 'product', 'min_price', 'max_price', 'mean_price',
+                   'observations', 'min_unit_price', 'price_unit')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def prices_since(self, day: str) -> List[Tuple[str, str, str, float]]:
+        """(day, store, product, min_price) of every aggregate from ``day`` on, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT day, store, product, min_price FROM price_history WHERE day >= ? ORDER BY day",
+                (day,)).fetchall()
+
+    def close(self) -> None:
+        self._conn.close()
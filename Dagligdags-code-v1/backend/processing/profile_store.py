@@ -0,0 +1,274 @@
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from config.paths import USER_PROFILES_DIR
+from backend.processing.regions import NATIONAL, REGIONS, profile_region
+from backend.processing.scoring_plan import ScoringPlan
+from utilities.logger import setup_logger
+
+# Bump when the record layout or a vocabulary's order changes; records of
+# other versions are ignored and recompiled from the profile JSON
+FEATURE_VERSION = 1
+FEATURES_FILE = "profile_features.bin"
+
+# Vocabularies behind the bitmask and code fields. Append only: a value's
+# position is its bit in every record already written.
+STORES = ('coop', 'rema', 'kiwi', 'meny', 'oda', 'bunnpris', 'spar', 'joker', 'extra', 'obs', 'ica', 'europris')
+MEMBERSHIPS = ('coop_medlem', 'ae_rema', 'ica_kort', 'trumf')
+DIETS = ('none', 'vegetarian', 'vegan', 'pescetarian', 'flexitarian', 'halal', 'kosher')
+ALLERGENS = ('gluten', 'lactose', 'milk', 'eggs', 'nuts', 'peanuts', 'fish', 'shellfish', 'molluscs', 'soy',
+             'sesame', 'celery', 'mustard', 'lupin', 'sulphites', 'wheat')
+CUISINES = ('norwegian', 'nordic', 'italian', 'thai', 'indian', 'mexican', 'chinese', 'japanese', 'korean',
+            'vietnamese', 'french', 'spanish', 'greek', 'mediterranean', 'middle_eastern', 'american')
+TRANSPORT_MODES = ('', 'walking', 'cycling', 'public_transport', 'driving', 'delivery')
+PACKAGE_SIZES = ('regular', 'small', 'bulk')
+PANTRY_TYPES = ('', 'high_protein')
+REGION_CODES = (NATIONAL,) + tuple(sorted(REGIONS))
+LEVELS = ('organic_preference', 'local_preference', 'price_sensitivity', 'sustainability_importance')
+NO_LEVEL = 255  # Level byte of a preference the profile does not set
+
+# Onboarding (Norwegian) answers and the profile keys they map to
+ONBOARDING_STORES = {'Coop': 'coop', 'Rema 1000': 'rema', 'Kiwi': 'kiwi', 'Oda': 'oda'}
+ONBOARDING_DIETS = {'Vegetar': 'vegetarian', 'Vegan': 'vegan'}
+ONBOARDING_ALLERGIES = {'Glutenfri': 'gluten', 'Laktosefri': 'lactose'}
+ONBOARDING_TRANSPORT = {'Går': 'walking', 'Bil': 'driving', 'Sykkel': 'cycling', 'Levering': 'delivery'}
+
+# user id, version, source version (profile mtime), levels, transport,
+# package, pantry, region, store/membership/diet masks, allergen and
+# cuisine masks, max distance (NaN when unset)
+_RECORD = struct.Struct('<32sHq4BBBBBHHHIId')
+RECORD_SIZE = _RECORD.size
+
+
+def profile_preferences(user_profile: Dict) -> Dict:
+    """The English-keyed preferences the matcher reads, from any saved profile shape.
+
+    Onboarding nests Norwegian answers under ``answers`` and older profiles
+    nest English keys there; both are lifted to the top level, where keys
+    already present win.
+    """
+    answers = user_profile.get('answers') or {}
+    preferences = {k: v for k, v in answers.items()
+                   if k not in ('prisfokus', 'butikker', 'matrestriksjoner', 'transport', 'epost')}
+    if 'prisfokus' in answers and answers['prisfokus'] is not None:
+        preferences['price_sensitivity'] = answers['prisfokus']
+    if answers.get('butikker'):
+        preferences['preferred_stores'] = [ONBOARDING_STORES.get(s, s.lower()) for s in answers['butikker']]
+    restrictions = answers.get('matrestriksjoner') or []
+    if any(r in ONBOARDING_DIETS for r in restrictions):
+        preferences['diet'] = [ONBOARDING_DIETS[r] for r in restrictions if r in ONBOARDING_DIETS]
+    if any(r in ONBOARDING_ALLERGIES for r in restrictions):
+        preferences['allergies'] = [ONBOARDING_ALLERGIES[r] for r in restrictions if r in ONBOARDING_ALLERGIES]
+    if answers.get('transport'):
+        preferences['transport_mode'] = ONBOARDING_TRANSPORT.get(answers['transport'], answers['transport'])
+    if answers.get('epost'):
+        # Giving an address during onboarding is the opt-in to deal alerts
+        preferences['email'] = answers['epost']
+        preferences['deal_notifications'] = True
+    preferences.update((k, v) for k, v in user_profile.items() if k != 'answers')
+    return preferences
+
+
+def encode_profile(user_id: str, preferences: Dict, source_version: int) -> Optional[bytes]:
+    """Pack preferences into one fixed-width record, or None if they do not fit.
+
+    A profile fits only if the decoded record compiles to exactly the same
+    scoring plan, region and max distance, so reading the record can never
+    change a user's results.
+    """
+    key = user_id.encode('utf-8')
+    if len(key) > 32:
+        return None
+    try:
+        levels = [_level(preferences.get(name)) for name in LEVELS]
+        record = _RECORD.pack(
+            key, FEATURE_VERSION, source_version, *levels,
+            TRANSPORT_MODES.index(preferences.get('transport_mode', '')),
+            PACKAGE_SIZES.index(preferences.get('package_preference', 'regular')),
+            1 if preferences.get('pantry_type', '') == 'high_protein' else 0,
+            REGION_CODES.index(profile_region(preferences)),
+            _mask(STORES, preferences.get('preferred_stores', [])),
+            _mask(MEMBERSHIPS, (m.lower() for m in preferences.get('loyalty_memberships', []))),
+            _mask(DIETS, preferences.get('diet', [])),
+            _mask(ALLERGENS, preferences.get('allergies', [])),
+            _mask(CUISINES, (c.lower() for c in preferences.get('cuisine_preferences', []))),
+            float(preferences['max_distance']) if preferences.get('max_distance') is not None else math.nan,
+        )
+    except (ValueError, TypeError, AttributeError, struct.error):
+        return None  # A value outside the vocabularies or the field ranges
+
+    decoded = decode_record(record)[1]
+    if (_plan_inputs(decoded) != _plan_inputs(preferences)
+            or decoded.get('max_distance') != preferences.get('max_distance')):
+        return None
+    return record
+
+
+def decode_record(record: bytes) -> Tuple[int, Dict]:
+    """(source version, preferences) of a record, in the shape ``ScoringPlan.compile`` reads."""
+    (_, _, source_version, *levels, transport, package, pantry, region,
+     stores, memberships, diets, allergens, cuisines, max_distance) = _RECORD.unpack(record)
+    preferences = {'feature_version': FEATURE_VERSION}
+    preferences.update((name, level) for name, level in zip(LEVELS, levels) if level != NO_LEVEL)
+    if transport:
+        preferences['transport_mode'] = TRANSPORT_MODES[transport]
+    preferences['package_preference'] = PACKAGE_SIZES[package]
+    if pantry:
+        preferences['pantry_type'] = PANTRY_TYPES[pantry]
+    if region:
+        preferences['region'] = REGION_CODES[region]
+    for key, vocabulary, mask in (('preferred_stores', STORES, stores), ('loyalty_memberships', MEMBERSHIPS, memberships),
+                                  ('diet', DIETS, diets), ('allergies', ALLERGENS, allergens),
+                                  ('cuisine_preferences', CUISINES, cuisines)):
+        if mask:
+            preferences[key] = [value for bit, value in enumerate(vocabulary) if mask >> bit & 1]
+    if not math.isnan(max_distance):
+        preferences['max_distance'] = max_distance
+    return source_version, preferences
+
+
+class ProfileFeatureStore:
+    """Compiled profile records in one append-only array file, indexed by user id.
+
+    Every record is ``RECORD_SIZE`` bytes, so a lookup is one ``pread`` at the
+    offset the in-memory index holds, with no JSON to parse. A record carries
+    the modification time of the profile file it was compiled from; one that
+    no longer matches is ignored. Writes are single appends, so several
+    processes can share the file; ``compact`` drops superseded records.
+    """
+
+    def __init__(self, profiles_dir: Path = USER_PROFILES_DIR):
+        self.logger = setup_logger("profile_store")
+        self.profiles_dir = Path(profiles_dir)
+        self.path = self.profiles_dir / FEATURES_FILE
+        self._index: Dict[str, int] = {}
+        self._scanned = 0
+        self._fd: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def profile_path(self, user_id: str) -> Path:
+        return self.profiles_dir / f"user_{user_id}.json"
+
+    def get(self, user_id: str, source_version: int) -> Optional[Dict]:
+        """The user's preferences if a record compiled from this profile version exists."""
+        with self._lock:
+            offset = self._index.get(user_id)
+            if offset is None or self._fd is None:
+                self._refresh()
+                offset = self._index.get(user_id)
+                if offset is None:
+                    return None
+            record = os.pread(self._fd, RECORD_SIZE, offset)
+        if len(record) != RECORD_SIZE or _RECORD.unpack_from(record)[1] != FEATURE_VERSION:
+            return None
+        version, preferences = decode_record(record)
+        if version != source_version:
+            # Possibly rewritten by another process since we indexed it
+            with self._lock:
+                self._refresh()
+                if self._index.get(user_id, offset) != offset:
+                    return self.get(user_id, source_version)
+            return None
+        return preferences
+
+    def put(self, user_id: str, preferences: Dict, source_version: int) -> bool:
+        """Append the user's compiled record; False if the profile needs its JSON."""
+        if not preferences:
+            # A record would decode to default preferences, and an empty profile must read as none
+            return False
+        record = encode_profile(user_id, preferences, source_version)
+        if record is None:
+            self.logger.debug(f"Profile {user_id} does not fit a feature record, keeping JSON")
+            return False
+        try:
+            with self._lock:
+                self._refresh()
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    size = os.fstat(fd).st_size
+                    if size % RECORD_SIZE:
+                        os.ftruncate(fd, size - size % RECORD_SIZE)  # Torn by a crash mid-append
+                    os.write(fd, record)
+                finally:
+                    os.close(fd)
+                self._refresh()
+            return True
+        except OSError as e:
+            self.logger.error(f"Could not store profile features for {user_id}: {str(e)}")
+            return False
+
+    def compact(self) -> int:
+        """Rewrite the file with each user's latest record, dropping users whose profile is gone.
+
+        Returns the number of records dropped.
+        """
+        with self._lock:
+            self._refresh()
+            if self._fd is None:
+                return 0
+            total = self._scanned // RECORD_SIZE
+            kept = [(user_id, offset) for user_id, offset in self._index.items()
+                    if self.profile_path(user_id).exists()]
+            tmp = self.path.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                for _, offset in sorted(kept, key=lambda item: item[1]):
+                    f.write(os.pread(self._fd, RECORD_SIZE, offset))
+            os.replace(tmp, self.path)
+            self._close()
+            self._refresh()
+        self.logger.info(f"🗜️ Compacted profile features: {len(kept)} kept, {total - len(kept)} dropped")
+        return total - len(kept)
+
+    def _refresh(self) -> None:
+        """Index records appended since the last scan, reopening if the file was replaced."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._close()
+            return
+        if self._fd is not None and os.fstat(self._fd).st_ino != stat.st_ino:
+            self._close()
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        end = stat.st_size - stat.st_size % RECORD_SIZE
+        if end <= self._scanned:
+            return
+        data = os.pread(self._fd, end - self._scanned, self._scanned)
+        for offset in range(0, len(data), RECORD_SIZE):
+            user_id = data[offset:offset + 32].rstrip(b'\0').decode('utf-8')
+            self._index[user_id] = self._scanned + offset
+        self._scanned += len(data)
+
+    def _close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._index = {}
+        self._scanned = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+def _level(value) -> int:
+    if value is None:
+        return NO_LEVEL
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < NO_LEVEL:
+        raise ValueError(f"Unsupported preference level {value!r}")
+    return value
+
+
+def _mask(vocabulary: Tuple[str, ...], values: Iterable[str]) -> int:
+    mask = 0
+    for value in values:
+        mask |= 1 << vocabulary.index(value)
+    return mask
+
+
+def _plan_inputs(preferences: Dict) -> Tuple:
+    plan = ScoringPlan.compile(preferences)
+    return plan.specs, plan.transport_penalty, profile_region(preferences)
@@ -0,0 +1,98 @@
+import bisect
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+from config.constants import POSTCODE_REGIONS
+from config.paths import ACTIVE_REGIONS_FILE
+from utilities.logger import setup_logger
+
+NATIONAL = ''  # Region of the national avis, and of users without a usable postnummer
+REGIONS = frozenset(region for _, _, region in POSTCODE_REGIONS)
+
+_RANGE_STARTS = [first for first, _, _ in POSTCODE_REGIONS]
+
+
+def region_for_postcode(postcode) -> str:
+    """Offer region of a Norwegian postnummer ("5003" -> 'vestlandet')."""
+    code = str(postcode or '').strip()
+    if len(code) != 4 or not code.isdigit():
+        return NATIONAL
+    number = int(code)
+    i = bisect.bisect_right(_RANGE_STARTS, number) - 1
+    if i >= 0 and number <= POSTCODE_REGIONS[i][1]:
+        return POSTCODE_REGIONS[i][2]
+    return NATIONAL
+
+
+def profile_region(user_profile: Dict) -> str:
+    """Region a profile shops in, from its postnummer (top level or onboarding answers)."""
+    if user_profile.get('region') in REGIONS:
+        return user_profile['region']
+    answers = user_profile.get('answers') or {}
+    for key in ('postnummer', 'postal_code'):
+        postcode = user_profile.get(key) or answers.get(key)
+        if postcode:
+            return region_for_postcode(postcode)
+    return NATIONAL
+
+
+class RegionRegistry:
+    """Regions that have users, so the scrape knows which regional avis variants to fetch.
+
+    A region is added the first time a user from it asks for deals, and
+    listeners hear about it at once, so its variants can be fetched without
+    waiting for the next daily scrape.
+    """
+
+    def __init__(self, path: Path = ACTIVE_REGIONS_FILE):
+        self.logger = setup_logger("regions")
+        self.path = Path(path)
+        self._regions = set()
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def __contains__(self, region: str) -> bool:
+        return region in self._regions
+
+    def regions(self) -> List[str]:
+        return sorted(self._regions)
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        self._listeners.append(listener)
+
+    def add(self, region: str) -> bool:
+        """Register a region; True (and listeners called) only if it is new."""
+        if region not in REGIONS or region in self._regions:
+            return False
+        with self._lock:
+            if region in self._regions:
+                return False
+            self._regions.add(region)
+            self._save()
+        self.logger.info(f"📍 New region with users: {region}")
+        for listener in self._listeners:
+            try:
+                listener(region)
+            except Exception as e:
+                self.logger.error(f"New-region listener failed for {region}: {str(e)}")
+        return True
+
+    def _save(self) -> None:
+        try:
+            tmp_file = self.path.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(sorted(self._regions), f)
+            tmp_file.replace(self.path)
+        except Exception as e:
+            self.logger.error(f"Could not save active regions: {str(e)}")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._regions = {region for region in json.load(f) if region in REGIONS}
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.logger.error(f"Could not read active regions: {str(e)}")
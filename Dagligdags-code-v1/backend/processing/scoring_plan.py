@@ -0,0 +1,371 @@
+import hashlib
+import json
+import sys
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from config.constants import PREFERENCE_WEIGHTS, DISTANCE_PENALTIES
+from backend.processing.deal import Deal
+from backend.processing.geo_calculator import haversine_km
+from backend.processing.unit_pricing import unit_price_score
+
+# Bump when rule semantics change so serialized plans are recompiled
+PLAN_VERSION = 1
+
+# Loyalty programme that unlocks member prices in each chain
+MEMBERSHIP_STORES = {
+    'coop': 'coop_medlem',
+    'rema': 'ae_rema',
+    'ica': 'ica_kort'
+}
+
+ALLERGEN_PENALTY = 5.0
+DIET_PENALTY = 3.0
+CUISINE_BONUS = 1.5
+HIGH_PROTEIN_BONUS = 2.0
+HIGH_PROTEIN_GRAMS = 20
+PACKAGE_BONUS = 1.0
+STORE_BONUS = 1.5
+MEMBERSHIP_BONUS = 2.0
+SUSTAINABILITY_WEIGHT = 0.3
+REASON_DISCOUNT_PERCENT = 20
+
+# Recommendation reasons: bits of the mask ScoringPlan.evaluate returns,
+# in the order they are rendered
+REASON_ORGANIC = 1
+REASON_LOCAL = 2
+REASON_DISCOUNT = 4
+REASON_CUISINE = 8
+REASON_HIGH_PROTEIN = 16
+DEFAULT_REASON = "good value"
+REASON_CACHE_SIZE = 4096  # Distinct (mask, discount, cuisine) renderings kept
+
+# A rule returns (score delta, reason bits) for a deal
+Rule = Callable[[Deal], Tuple[float, int]]
+_NO_EFFECT = (0.0, 0)
+
+
+def profile_fingerprint(user_profile: Dict) -> str:
+    """Hash of the scoring inputs in a profile, ignoring any stored plan."""
+    inputs = {k: v for k, v in user_profile.items() if k != 'scoring_plan'}
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def base_price_score(deal: Deal) -> float:
+    # Base price score (higher discount = higher score)
+    if deal.discount_percentage is not None:
+        return deal.discount_percentage * 0.1
+    elif deal.unit_price is not None:
+        # Cheap per kg/l/piece beats a cheap small pack
+        return unit_price_score(deal)
+    elif deal.price is not None:
+        # Lower price gets higher score
+        return max(0, 100 - deal.price) * 0.01
+    return 0.0
+
+
+def deal_score_bound(deal: Deal) -> float:
+    """Highest score a deal can reach for any profile, before store and diet terms."""
+    bound = base_price_score(deal)
+    bound += PREFERENCE_WEIGHTS['organic'] if deal.organic else 0
+    bound += PREFERENCE_WEIGHTS['local'] if deal.local else 0
+    bound += PREFERENCE_WEIGHTS['price_sensitive']
+    bound += CUISINE_BONUS if deal.cuisine_type else 0
+    bound += HIGH_PROTEIN_BONUS if deal.protein_content > HIGH_PROTEIN_GRAMS else 0
+    bound += PACKAGE_BONUS
+    bound += max(0, _sustainability_delta(deal))
+    return bound
+
+
+class ScoringPlan:
+    """A profile compiled into the scoring rules that can actually fire for it.
+
+    Threshold checks like ``organic_preference >= 4`` are decided once at
+    compile time, so scoring a deal only runs the rules that matter to this
+    user. The same pass collects the recommendation reasons.
+    """
+
+    def __init__(self, specs: List[Tuple[str, tuple]], fingerprint: str = '',
+                 transport_penalty: float = 0.5):
+        self.specs = specs
+        self.fingerprint = fingerprint
+        self.transport_penalty = transport_penalty
+        self.params = dict(specs)
+        self._rules: List[Rule] = [_RULE_FACTORIES[name](*args) for name, args in specs]
+        # Profiles with the same rules rank deals identically before the
+        # distance term, however their raw answers differ
+        self.signature = hashlib.sha1(json.dumps(
+            [[name, [_to_json(arg) for arg in args]] for name, args in specs], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    @classmethod
+    def compile(cls, user_profile: Dict) -> 'ScoringPlan':
+        """Resolve a profile's preferences into rule specs."""
+        specs = []
+        if user_profile.get('organic_preference', 3) >= 4:
+            specs.append(('organic', (PREFERENCE_WEIGHTS['organic'],)))
+        if user_profile.get('local_preference', 3) >= 4:
+            specs.append(('local', (PREFERENCE_WEIGHTS['local'],)))
+        if user_profile.get('price_sensitivity', 3) >= 4:
+            specs.append(('price_sensitive', (PREFERENCE_WEIGHTS['price_sensitive'],)))
+
+        allergies = frozenset(user_profile.get('allergies', []))
+        if allergies:
+            specs.append(('allergens', (allergies,)))
+
+        penalized = _diet_penalties(user_profile.get('diet', []))
+        if penalized:
+            specs.append(('diet', (penalized,)))
+
+        cuisines = frozenset(c.lower() for c in user_profile.get('cuisine_preferences', []))
+        if cuisines:
+            specs.append(('cuisine', (cuisines,)))
+
+        if user_profile.get('pantry_type', '') == 'high_protein':
+            specs.append(('high_protein', ()))
+
+        specs.append(('package', (user_profile.get('package_preference', 'regular'),)))
+
+        stores = frozenset(user_profile.get('preferred_stores', []))
+        if stores:
+            specs.append(('store', (stores,)))
+
+        memberships = {m.lower() for m in user_profile.get('loyalty_memberships', [])}
+        member_stores = frozenset(store for store, membership in MEMBERSHIP_STORES.items()
+                                  if membership in memberships)
+        if member_stores:
+            specs.append(('membership', (member_stores,)))
+
+        if user_profile.get('sustainability_importance', 3) >= 4:
+            specs.append(('sustainability', ()))
+
+        transport_mode = user_profile.get('transport_mode', 'walking')
+        return cls(specs, profile_fingerprint(user_profile), DISTANCE_PENALTIES.get(transport_mode, 0.5))
+
+    def evaluate(self, deal: Deal, user_location: Tuple[float, float] = None) -> Tuple[float, int]:
+        """Score a deal and collect why it was recommended, in one pass.
+
+        Reasons come back as a bitmask of ``REASON_*`` flags; only deals that
+        are shown get it turned into text, by ``render_reasons``.
+        """
+        # Same loop as evaluate_base, inlined: this is the per-deal hot path
+        mask = 0
+        score = base_price_score(deal)
+        for rule in self._rules:
+            delta, reason = rule(deal)
+            score += delta
+            mask |= reason
+
+        # Distance penalty
+        if user_location and deal.store_location:
+            score -= self.distance_penalty(deal.store_location, user_location)
+
+        return max(0, score), mask  # Never negative
+
+    def evaluate_base(self, deal: Deal) -> Tuple[float, int]:
+        """Score and reason mask before the distance penalty, possibly negative.
+
+        Depends only on the plan's rules, so it is shared by every user
+        whose profile compiles to the same ``signature``.
+        """
+        mask = 0
+        score = base_price_score(deal)
+        for rule in self._rules:
+            delta, reason = rule(deal)
+            score += delta
+            mask |= reason
+        return score, mask
+
+    def distance_penalty(self, store_location: Tuple[float, float], user_location: Tuple[float, float]) -> float:
+        """Score this user loses on any deal for the trip to a store."""
+        return haversine_km(user_location, store_location) * self.transport_penalty
+
+    def score(self, deal: Deal, user_location: Tuple[float, float] = None) -> float:
+        return self.evaluate(deal, user_location)[0]
+
+    def store_bonus(self, store: str) -> float:
+        """Store and membership bonus this profile gives any deal from ``store``."""
+        bonus = STORE_BONUS if store in self.params.get('store', (frozenset(),))[0] else 0.0
+        if store.lower() in self.params.get('membership', (frozenset(),))[0]:
+            bonus += MEMBERSHIP_BONUS
+        return bonus
+
+    def diet_penalty(self, category: str) -> float:
+        """Diet penalty this profile gives any deal in ``category``."""
+        return dict(self.params.get('diet', ((),))[0]).get(category, 0.0)
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly form, stored next to the profile it was compiled from."""
+        return {
+            'version': PLAN_VERSION,
+            'fingerprint': self.fingerprint,
+            'transport_penalty': self.transport_penalty,
+            'rules': [[name, [_to_json(arg) for arg in args]] for name, args in self.specs],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> Optional['ScoringPlan']:
+        """Rebuild a stored plan, or None if it was compiled by older rules."""
+        if data.get('version') != PLAN_VERSION:
+            return None
+        specs = [(name, tuple(_from_json(arg) for arg in args)) for name, args in data['rules']]
+        return cls(specs, data.get('fingerprint', ''), data.get('transport_penalty', 0.5))
+
+
+def _diet_penalties(diet: List[str]) -> tuple:
+    penalties = {}
+    if 'vegetarian' in diet:
+        penalties['meat'] = penalties.get('meat', 0.0) + DIET_PENALTY
+    if 'vegan' in diet:
+        for category in ('meat', 'dairy'):
+            penalties[category] = penalties.get(category, 0.0) + DIET_PENALTY
+    return tuple(sorted(penalties.items()))
+
+
+def _to_json(arg):
+    if isinstance(arg, frozenset):
+        return {'set': sorted(arg)}
+    if isinstance(arg, tuple):
+        return {'pairs': [list(pair) for pair in arg]}
+    return arg
+
+
+def _from_json(arg):
+    if isinstance(arg, dict) and 'set' in arg:
+        return frozenset(arg['set'])
+    if isinstance(arg, dict) and 'pairs' in arg:
+        return tuple(tuple(pair) for pair in arg['pairs'])
+    return arg
+
+
+# Rule factories: each returns a closure giving a deal's (score delta, reason
+# bits). Results are built once per plan, so scoring allocates nothing.
+
+def _organic_rule(weight: float) -> Rule:
+    hit = (weight, REASON_ORGANIC)
+    def rule(deal):
+        return hit if deal.organic else _NO_EFFECT
+    return rule
+
+
+def _local_rule(weight: float) -> Rule:
+    hit = (weight, REASON_LOCAL)
+    def rule(deal):
+        return hit if deal.local else _NO_EFFECT
+    return rule
+
+
+def _price_sensitive_rule(weight: float) -> Rule:
+    plain, discounted = (weight, 0), (weight, REASON_DISCOUNT)
+    def rule(deal):
+        discount = deal.discount_percentage
+        return discounted if discount is not None and discount > REASON_DISCOUNT_PERCENT else plain
+    return rule
+
+
+def _allergen_rule(allergies: frozenset) -> Rule:
+    # Heavy penalty for allergens
+    hit = (-ALLERGEN_PENALTY, 0)
+    def rule(deal):
+        return hit if not allergies.isdisjoint(deal.allergens) else _NO_EFFECT
+    return rule
+
+
+def _diet_rule(penalties: tuple) -> Rule:
+    by_category = {category: (-penalty, 0) for category, penalty in penalties}
+    def rule(deal):
+        return by_category.get(deal.product_category, _NO_EFFECT)
+    return rule
+
+
+def _cuisine_rule(cuisines: frozenset) -> Rule:
+    hit = (CUISINE_BONUS, REASON_CUISINE)
+    def rule(deal):
+        deal_cuisine = deal.cuisine_type
+        return hit if deal_cuisine and deal_cuisine.lower() in cuisines else _NO_EFFECT
+    return rule
+
+
+def _high_protein_rule() -> Rule:
+    hit = (HIGH_PROTEIN_BONUS, REASON_HIGH_PROTEIN)
+    def rule(deal):
+        return hit if deal.protein_content > HIGH_PROTEIN_GRAMS else _NO_EFFECT
+    return rule
+
+
+def _package_rule(package_preference: str) -> Rule:
+    hit = (PACKAGE_BONUS, 0)
+    def rule(deal):
+        return hit if deal.package_size == package_preference else _NO_EFFECT
+    return rule
+
+
+def _store_rule(stores: frozenset) -> Rule:
+    hit = (STORE_BONUS, 0)
+    def rule(deal):
+        return hit if deal.store in stores else _NO_EFFECT
+    return rule
+
+
+def _membership_rule(member_stores: frozenset) -> Rule:
+    hit = (MEMBERSHIP_BONUS, 0)
+    def rule(deal):
+        return hit if deal.store.lower() in member_stores else _NO_EFFECT
+    return rule
+
+
+def _sustainability_rule() -> Rule:
+    def rule(deal):
+        # Bonus/penalty based on sustainability
+        return _sustainability_delta(deal), 0
+    return rule
+
+
+def _sustainability_delta(deal: Deal) -> float:
+    # Around the scale's midpoint; an unknown score is neutral
+    if deal.sustainability_score is None:
+        return 0.0
+    return (deal.sustainability_score - 5) * SUSTAINABILITY_WEIGHT
+
+
+_RULE_FACTORIES = {
+    'organic': _organic_rule,
+    'local': _local_rule,
+    'price_sensitive': _price_sensitive_rule,
+    'allergens': _allergen_rule,
+    'diet': _diet_rule,
+    'cuisine': _cuisine_rule,
+    'high_protein': _high_protein_rule,
+    'package': _package_rule,
+    'store': _store_rule,
+    'membership': _membership_rule,
+    'sustainability': _sustainability_rule,
+}
+
+
+def render_reasons(mask: int, deal: Deal) -> str:
+    """Human-readable recommendation reason for a deal's reason mask.
+
+    Only the discount and cuisine vary per deal, so the text is built once
+    per (mask, discount, cuisine) and the same interned string is reused.
+    """
+    if not mask:
+        return DEFAULT_REASON
+    discount = round(deal.discount_percentage) if mask & REASON_DISCOUNT else None
+    cuisine = deal.cuisine_type if mask & REASON_CUISINE else ''
+    return _render_reasons(mask, discount, cuisine)
+
+
+@lru_cache(maxsize=REASON_CACHE_SIZE)
+def _render_reasons(mask: int, discount: Optional[int], cuisine: str) -> str:
+    reasons = []
+    if mask & REASON_ORGANIC:
+        reasons.append("matches your organic preference")
+    if mask & REASON_LOCAL:
+        reasons.append("is locally produced")
+    if mask & REASON_DISCOUNT:
+        reasons.append(f"{discount}% discount")
+    if mask & REASON_CUISINE:
+        reasons.append(f"perfect for {cuisine} cooking")
+    if mask & REASON_HIGH_PROTEIN:
+        reasons.append("high in protein")
+    return sys.intern(", ".join(reasons))
@@ -0,0 +1,159 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import SnapshotDelta
+
+NGRAM = 3
+CATEGORY_WEIGHT = 0.5  # A shared category counts for half of a shared n-gram
+MAX_CANDIDATES = 1000  # Deals nominated by a query's rarest features; the rest only rescore them
+MIN_SIMILARITY = 0.3  # Below this a "similar" deal is more noise than substitute
+NORM_REFRESH = 0.25  # Corpus growth or shrink after which cached vector norms are recomputed
+
+_WORD = re.compile(r"[a-zæøå]+")
+# Pack sizes and counts say nothing about what the product is
+_UNIT_WORDS = frozenset({'g', 'kg', 'l', 'ml', 'cl', 'dl', 'stk', 'pk', 'pkn', 'x', 'ca', 'pr', 'per'})
+
+
+def text_features(product: str, category: str = '') -> Counter:
+    """Sparse feature counts: character n-grams of each word, whole words, and the category.
+
+    Words are padded with spaces, so "melk" yields " me", "mel", "elk",
+    "lk " and matches "lettmelk" and "melkesjokolade" partially.
+    """
+    features = Counter()
+    for word in _WORD.findall(product.lower()):
+        if word in _UNIT_WORDS:
+            continue
+        padded = f" {word} "
+        features.update(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+        features[f"w:{word}"] += 1
+    if category:
+        features[f"c:{category.lower()}"] += CATEGORY_WEIGHT
+    return features
+
+
+class SimilarityIndex:
+    """Nearest products to a free-text query, over TF-IDF weighted n-gram vectors.
+
+    The deal-by-feature matrix is stored sparsely by column: one posting
+    dict per feature, mapping deal ids to counts. A query walks only the
+    postings of its own features, rarest first, so the cost scales with the
+    deals that share something with the query rather than with the catalog.
+    Once ``MAX_CANDIDATES`` deals have been nominated, the remaining, more
+    common features ("lk ", "en ") only add to the scores of those deals.
+    That pruning is what makes the search approximate: a deal sharing only
+    common grams with a query can be missed, and is the least likely to
+    clear ``MIN_SIMILARITY`` anyway.
+
+    Deals are added and removed one by one, so a ``SnapshotDelta`` updates
+    the index in place. IDF weights are read at query time; vector norms are
+    cached and recomputed once the corpus has changed size by ``NORM_REFRESH``.
+    """
+
+    def __init__(self, deals: Iterable[Deal] = (), version: int = 0):
+        self.version = version
+        self.deals: Dict[str, Deal] = {}
+        self._vectors: Dict[str, Counter] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._norms: Dict[str, float] = {}
+        self._norms_size = 0  # Corpus size the cached norms were computed at
+        for deal in deals:
+            self.add(deal)
+        self._maybe_refresh_norms()
+
+    def __len__(self) -> int:
+        return len(self.deals)
+
+    def __contains__(self, deal: Deal) -> bool:
+        return self.deals.get(deal.deal_id) is deal
+
+    def add(self, deal: Deal) -> None:
+        if deal.deal_id in self.deals:
+            self.discard(deal.deal_id)
+        vector = text_features(deal.product, deal.product_category)
+        self.deals[deal.deal_id] = deal
+        self._vectors[deal.deal_id] = vector
+        for feature, count in vector.items():
+            self._postings.setdefault(feature, {})[deal.deal_id] = count
+
+    def discard(self, deal_id: str) -> None:
+        if self.deals.pop(deal_id, None) is None:
+            return
+        self._norms.pop(deal_id, None)
+        for feature in self._vectors.pop(deal_id):
+            posting = self._postings[feature]
+            del posting[deal_id]
+            if not posting:
+                del self._postings[feature]
+
+    def apply_delta(self, delta: SnapshotDelta) -> bool:
+        """Move the index forward by one snapshot delta; False if it was built for another version."""
+        if delta.from_version != self.version:
+            return False
+        for deal in delta.removed:
+            self.discard(deal.deal_id)
+        for deal in delta.added + delta.changed:
+            self.add(deal)
+        self.version = delta.to_version
+        return True
+
+    def similar(self, text: str, k: int = 10, allowed: Optional[Collection[str]] = None,
+                min_similarity: float = MIN_SIMILARITY) -> List[Tuple[float, Deal]]:
+        """The ``k`` deals most similar to ``text`` by cosine, best first.
+
+        ``allowed`` limits the result to those deal ids, e.g. one region's
+        currently valid deals.
+        """
+        query = text_features(text)
+        if not query or not self.deals:
+            return []
+        self._maybe_refresh_norms()
+        weights = {feature: count * self._idf(feature) for feature, count in query.items()}
+        query_norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        weights = {feature: weight for feature, weight in weights.items() if feature in self._postings}
+
+        dots: Dict[str, float] = {}
+        common = []
+        for feature in sorted(weights, key=lambda f: len(self._postings[f])):
+            posting = self._postings[feature]
+            weight = weights[feature] * self._idf(feature)
+            if len(dots) >= MAX_CANDIDATES:
+                common.append((feature, weight))
+                continue
+            for deal_id, count in posting.items():
+                if allowed is None or deal_id in allowed:
+                    dots[deal_id] = dots.get(deal_id, 0.0) + weight * count
+        for feature, weight in common:
+            posting = self._postings[feature]
+            for deal_id in dots:
+                count = posting.get(deal_id)
+                if count:
+                    dots[deal_id] += weight * count
+
+        scored = []
+        for deal_id, dot in dots.items():
+            score = dot / (query_norm * self._norm(deal_id))
+            if score >= min_similarity:
+                scored.append((score, deal_id))
+        return [(round(score, 4), self.deals[deal_id])
+                for score, deal_id in heapq.nlargest(k, scored, key=lambda item: (item[0], item[1]))]
+
+    def _idf(self, feature: str) -> float:
+        return math.log((1 + len(self.deals)) / (1 + len(self._postings.get(feature, ())))) + 1
+
+    def _norm(self, deal_id: str) -> float:
+        norm = self._norms.get(deal_id)
+        if norm is None:
+            norm = self._norms[deal_id] = math.sqrt(sum(
+                (count * self._idf(feature)) ** 2 for feature, count in self._vectors[deal_id].items()))
+        return norm
+
+    def _maybe_refresh_norms(self) -> None:
+        if abs(len(self.deals) - self._norms_size) > NORM_REFRESH * max(self._norms_size, 1):
+            self._norms.clear()
+            self._norms_size = len(self.deals)
+            for deal_id in self._vectors:
+                self._norm(deal_id)
@@ -0,0 +1,126 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from backend.processing.deal import Deal
+
+# "500 g", "1,5 l", "6x0,33 l", "10 stk"; the lookahead skips non-digits fast
+QUANTITY_RE = re.compile(
+    r"(?=\d)(?:(?P<count>\d+)\s*[x×]\s*)?(?P<amount>\d+(?:[.,]\d+)?)\s*(?P<unit>kg|g|gram|l|liter|dl|cl|ml|stk)\b"
+)
+# "pr kg", "per liter", "/stk": the price is already a unit price
+PER_UNIT_RE = re.compile(r"(?:\bpr\.?|\bper|/)\s*(?P<unit>kg|l|liter|stk)\b")
+
+# Unit -> (base unit, factor to base unit)
+UNIT_SCALE = {'kg': ('kg', 1.0), 'g': ('kg', 0.001), 'gram': ('kg', 0.001), 'l': ('l', 1.0),
+              'liter': ('l', 1.0), 'dl': ('l', 0.1), 'cl': ('l', 0.01), 'ml': ('l', 0.001),
+              'stk': ('stk', 1.0)}
+BASE_UNITS = ('kg', 'l', 'stk')
+
+# A unit price at or above this scores zero in base_price_score (NOK per kg/l/piece)
+REFERENCE_UNIT_PRICES_NOK = {'kg': 150.0, 'l': 40.0, 'stk': 15.0}
+
+# Pack sizes (in base units) that count as small or bulk for package_preference
+SMALL_PACK = {'kg': 0.25, 'l': 0.25, 'stk': 1}
+BULK_PACK = {'kg': 1.5, 'l': 3.0, 'stk': 10}
+BULK_MULTIPACK = 6
+
+
+class Quantity(NamedTuple):
+    amount: float       # In the base unit, multipacks multiplied out; NaN for "pr kg"
+    unit: str           # 'kg', 'l' or 'stk'
+    count: int          # Items in a multipack, 1 otherwise
+    per_unit: bool      # True for "pr kg" style prices
+    span: Tuple[int, int]
+
+
+def parse_quantity(text: str) -> Optional[Quantity]:
+    """Pack size or per-unit pricing from a product text, in kg, l or stk."""
+    text = text.lower()
+    match = QUANTITY_RE.search(text)
+    if match:
+        unit, scale = UNIT_SCALE[match.group('unit')]
+        count = int(match.group('count') or 1)
+        amount = float(match.group('amount').replace(',', '.')) * scale * count
+        return Quantity(amount, unit, count, False, match.span())
+    match = PER_UNIT_RE.search(text)
+    if match:
+        unit = UNIT_SCALE[match.group('unit')][0]
+        return Quantity(float('nan'), unit, 1, True, match.span())
+    return None
+
+
+class UnitPriceColumns(NamedTuple):
+    """Column view of one batch, aligned with the input deals."""
+    quantity: np.ndarray    # float64, NaN where unknown
+    unit: np.ndarray        # int8 index into BASE_UNITS, -1 where unknown
+    count: np.ndarray       # int32 items per multipack, 1 where unknown
+    unit_price: np.ndarray  # float64 NOK per unit, NaN where unknown
+
+
+# Parsed pack sizes by product name; avis names repeat across stores and weeks
+_parse_cache: Dict[str, Optional[Quantity]] = {}
+PARSE_CACHE_SIZE = 200_000
+_MISSING = object()
+_UNKNOWN = Quantity(float('nan'), '', 1, False, (0, 0))
+_UNIT_CODES = {name: code for code, name in enumerate(BASE_UNITS)}
+_PACK_SIZES = (None, 'small', 'bulk')
+
+
+def compute_unit_prices(deals: List[Deal]) -> UnitPriceColumns:
+    """Parse every deal's pack size once per distinct name, then price the batch with numpy."""
+    if len(_parse_cache) >= PARSE_CACHE_SIZE:
+        _parse_cache.clear()
+    parsed = []
+    for deal in deals:
+        quantity = _parse_cache.get(deal.product, _MISSING)
+        if quantity is _MISSING:
+            quantity = _parse_cache[deal.product] = parse_quantity(deal.product)
+        parsed.append(quantity or _UNKNOWN)
+
+    n = len(deals)
+    price = np.fromiter((np.nan if deal.price is None else deal.price for deal in deals), float, n)
+    quantity = np.fromiter((q.amount for q in parsed), float, n)
+    unit = np.fromiter((_UNIT_CODES.get(q.unit, -1) for q in parsed), np.int8, n)
+    count = np.fromiter((q.count for q in parsed), np.int32, n)
+    per_unit = np.fromiter((q.per_unit for q in parsed), bool, n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit_price = np.where(per_unit, price, price / quantity)
+    unit_price[~np.isfinite(unit_price) | (quantity <= 0)] = np.nan
+    return UnitPriceColumns(quantity, unit, count, np.round(unit_price, 2))
+
+
+def apply_unit_prices(deals: Iterable[Deal]) -> List[Deal]:
+    """Fill ``quantity``, ``price_unit``, ``unit_price`` and pack size on a batch, in place."""
+    deals = list(deals)
+    columns = compute_unit_prices(deals)
+    known = columns.unit >= 0
+    codes = np.where(known, columns.unit, 0)
+    small = np.array([SMALL_PACK[u] for u in BASE_UNITS])[codes]
+    bulk = np.array([BULK_PACK[u] for u in BASE_UNITS])[codes]
+    # 0 = leave as is, 1 = small, 2 = bulk
+    pack = np.where((columns.quantity >= bulk) | (columns.count >= BULK_MULTIPACK), 2,
+                    np.where(columns.quantity <= small, 1, 0))
+
+    # Plain Python values for the write-back; NaN becomes None
+    indices = np.flatnonzero(known).tolist()
+    units = columns.unit.tolist()
+    quantities = np.where(np.isnan(columns.quantity), None, columns.quantity).tolist()
+    unit_prices = np.where(np.isnan(columns.unit_price), None, columns.unit_price).tolist()
+    packs = pack.tolist()
+    for i in indices:
+        deal = deals[i]
+        deal.price_unit = BASE_UNITS[units[i]]
+        deal.quantity = quantities[i]
+        deal.unit_price = unit_prices[i]
+        if packs[i] and deal.package_size == 'regular':
+            deal.package_size = _PACK_SIZES[packs[i]]
+    return deals
+
+
+def unit_price_score(deal: Deal) -> Optional[float]:
+    """0..1 value score from the unit price, None if the deal has none."""
+    reference = REFERENCE_UNIT_PRICES_NOK.get(deal.price_unit)
+    if deal.unit_price is None or reference is None:
+        return None
+    return max(0.0, reference - deal.unit_price) / reference
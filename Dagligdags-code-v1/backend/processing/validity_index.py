@@ -0,0 +1,68 @@
+import bisect
+import heapq
+from typing import Dict, List, Set, Tuple
+
+# (valid_from, valid_to) as ISO dates; '' leaves that side open
+Window = Tuple[str, str]
+_AFTER_ANY_DATE = '\uffff'  # Sorts after every ISO date
+
+
+class ValidityIndex:
+    """Deal ids grouped by validity window, for expiry and "valid on day X" queries.
+
+    A chain prints one window per avis, so there are few distinct windows
+    however many deals share them. Windows are kept sorted by start, so a
+    day query only looks at windows that have started by then, and in a
+    min-heap by end, so expiring everything that ended before a day costs
+    O(log n) per expired window rather than a scan of all deals.
+    """
+
+    def __init__(self):
+        self._windows: Dict[Window, Set[str]] = {}
+        self._starts: List[Window] = []  # Sorted by (valid_from, valid_to)
+        self._ends: List[Tuple[str, Window]] = []  # Min-heap; entries of emptied windows are skipped
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._windows.values())
+
+    def windows(self) -> List[Window]:
+        return list(self._starts)
+
+    def add(self, deal_id: str, window: Window) -> None:
+        ids = self._windows.get(window)
+        if ids is None:
+            ids = self._windows[window] = set()
+            bisect.insort(self._starts, window)
+            if window[1]:
+                heapq.heappush(self._ends, (window[1], window))
+        ids.add(deal_id)
+
+    def discard(self, deal_id: str, window: Window) -> None:
+        ids = self._windows.get(window)
+        if ids is None:
+            return
+        ids.discard(deal_id)
+        if not ids:
+            self._drop(window)
+
+    def valid_on(self, day: str) -> List[str]:
+        """Ids of deals whose window contains ``day``."""
+        started = bisect.bisect_right(self._starts, (day, _AFTER_ANY_DATE))
+        return [deal_id for window in self._starts[:started] if not window[1] or day <= window[1]
+                for deal_id in self._windows[window]]
+
+    def pop_expired(self, day: str) -> List[str]:
+        """Remove and return the ids of deals whose window ended before ``day``."""
+        expired = []
+        while self._ends and self._ends[0][0] < day:
+            _, window = heapq.heappop(self._ends)
+            ids = self._windows.get(window)
+            if ids is not None:
+                expired.extend(ids)
+                self._drop(window)
+        return expired
+
+    def _drop(self, window: Window) -> None:
+        # The heap entry of a dropped window stays until it surfaces, then is skipped
+        del self._windows[window]
+        del self._starts[bisect.bisect_left(self._starts, window)]
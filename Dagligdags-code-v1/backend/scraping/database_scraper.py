@@ -2,10 +2,11 @@ import requests
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List
 from config.constants import API_ENDPOINTS, REQUEST_TIMEOUT
 from config.paths import NORMALIZED_DATA_DIR
 from utilities.logger import setup_logger
+from utilities.record_stream import RecordWriter, is_record_file, output_suffix, read_records
 
 class DatabaseScraper:
     """Scrapes and normalizes food databases for Norwegian market."""
@@ -19,24 +20,31 @@ class DatabaseScraper:
         self.timeout = REQUEST_TIMEOUT
         self.verify_ssl = False  # Managed via environment variables
 
+    # Shape checks for each configured food database response
+    SOURCE_VALIDATORS: Dict[str, Callable[[Any], bool]] = {
+        # Norwegian Food Database
+        'matvaretabellen': lambda data: isinstance(data, list) and len(data) > 0,
+        # USDA National Nutrient Database
+        'usda': lambda data: 'items' in data,
+    }
+
     def scrape_all_sources(self) -> Dict[str, Any]:
         """Coordinate scraping across all configured data sources."""
         results = {}
         
-        # Norwegian Food Database
-        results['matvaretabellen'] = self._scrape_endpoint(
-            'matvaretabellen',
-            validator=lambda data: isinstance(data, list) and len(data) > 0
-        )
-        
-        # USDA National Nutrient Database
-        results['usda'] = self._scrape_endpoint(
-            'usda',
-            validator=lambda data: 'items' in data
-        )
+        for endpoint_key in self.SOURCE_VALIDATORS:
+            results[endpoint_key] = self.fetch_source(endpoint_key)
         
         return self._normalize_data(results)
 
+    def fetch_source(self, endpoint_key: str) -> List[Dict]:
+        """Fetch one food database without normalizing it."""
+        return self._scrape_endpoint(endpoint_key, validator=self.SOURCE_VALIDATORS[endpoint_key])
+
+    def normalize_source(self, endpoint_key: str, raw_data: Any) -> Dict:
+        """Normalize the raw response of a single food database."""
+        return self._normalize_data({endpoint_key: raw_data})
+
     def _scrape_endpoint(self, endpoint_key: str, validator: callable) -> List[Dict]:
         """Generic API scraper with validation."""
         url = API_ENDPOINTS.get(endpoint_key)
@@ -75,7 +83,7 @@ class DatabaseScraper:
             ]
         
         # Normalize USDA data
-        if 'usda' in raw_data:
+        if isinstance(raw_data.get('usda'), dict):
             normalized['international_foods'] = [
                 self._normalize_usda(item)
                 for item in raw_data['usda'].get('items', [])
@@ -106,21 +114,39 @@ class DatabaseScraper:
             'source': 'usda'
         }
 
+    def open_results_writer(self) -> RecordWriter:
+        """NDJSON writer for a normalized food database, one record per food item."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return RecordWriter(NORMALIZED_DATA_DIR / f"food_db_{timestamp}{output_suffix()}")
+
+    @staticmethod
+    def write_sections(writer: RecordWriter, data: Dict) -> None:
+        for section, items in data.items():
+            writer.write_many({'section': section, 'item': item} for item in items)
+
     def save_results(self, data: Dict) -> Path:
         """Save normalized data with versioning."""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = NORMALIZED_DATA_DIR / f"food_db_{timestamp}.json"
-            
-            with output_path.open('w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
-            self.logger.info(f"💾 Saved normalized database to {output_path}")
-            return output_path
+            with self.open_results_writer() as writer:
+                self.write_sections(writer, data)
+            self.logger.info(f"💾 Saved normalized database to {writer.path} "
+                             f"({writer.records} items, {writer.bytes_written} bytes)")
+            return writer.path
         except Exception as e:
             self.logger.error(f"💥 Failed to save database: {str(e)}")
             raise
 
+
+def load_food_db(path: Path) -> Dict:
+    """Read a saved food database, NDJSON (food_db_*) or legacy JSON (database_data_*)."""
+    if not is_record_file(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    data: Dict[str, List[Dict]] = {}
+    for record in read_records(path):
+        data.setdefault(record['section'], []).append(record['item'])
+    return data
+
 if __name__ == "__main__":
     scraper = DatabaseScraper()
     data = scraper.scrape_all_sources()
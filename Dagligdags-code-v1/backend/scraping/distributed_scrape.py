@@ -0,0 +1,203 @@
+# backend/scraping/distributed_scrape.py
+
+import argparse
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Add project root to path when run as a script
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from backend.processing.deal import Deal
+from backend.scraping.job_queue import JobQueue, ScrapeJob, default_worker_id
+from backend.scraping.pipeline import normalize_store_deals, source_label
+from config.constants import STORE_URLS
+from config.paths import SNAPSHOT_STORE_DIR
+from utilities.logger import setup_logger
+from utilities.record_stream import RecordWriter, output_suffix, read_records
+
+JobRunner = Callable[[ScrapeJob], List[Deal]]
+POLL_SECONDS = 1.0
+
+
+class SnapshotStore:
+    """Per-job result files on storage shared by the coordinator and all workers."""
+
+    def __init__(self, root: Path = SNAPSHOT_STORE_DIR):
+        self.root = Path(root)
+
+    def write(self, job: ScrapeJob, deals: Iterable[Deal]) -> str:
+        pages = f"_p{job.page_start}-{job.page_end}" if job.pages else ''
+        path = self.root / job.batch / f"{job.store}_{job.region or 'national'}{pages}_{job.job_id}{output_suffix()}"
+        with RecordWriter(path) as writer:
+            writer.write_many(deal.to_dict() for deal in deals)
+        return str(path.relative_to(self.root))
+
+    def read(self, result: str) -> Iterable[Dict]:
+        return read_records(self.root / result)
+
+
+def newsletter_job_runner(scraper=None) -> JobRunner:
+    """Runs a job with NewsletterScraper: fetch, parse the page range, normalize."""
+    if scraper is None:
+        from backend.scraping.newsletter_scraper import NewsletterScraper
+        scraper = NewsletterScraper()
+
+    def run(job: ScrapeJob) -> List[Deal]:
+        payload = scraper.fetch_store(job.store, job.region)
+        payload['pages'] = job.pages
+        return normalize_store_deals(job.store, scraper.parse_store_payload(payload), job.region)
+    return run
+
+
+class ScrapeWorker:
+    """Claims jobs from the queue until it is empty (or forever), one at a time."""
+
+    def __init__(self, queue: JobQueue, store: SnapshotStore, runner: JobRunner,
+                 worker_id: Optional[str] = None):
+        self.logger = setup_logger("scrape_worker")
+        self.queue = queue
+        self.store = store
+        self.runner = runner
+        self.worker_id = worker_id or default_worker_id()
+        self.completed = 0
+
+    def run(self, batch: Optional[str] = None, wait: bool = False, poll_seconds: float = POLL_SECONDS) -> int:
+        """Process jobs; with ``wait`` keep polling when the queue is empty."""
+        while True:
+            job = self.queue.claim(self.worker_id, batch)
+            if job is None:
+                if not wait:
+                    return self.completed
+                time.sleep(poll_seconds)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: ScrapeJob) -> None:
+        label = f"{job.store}/{job.region or 'national'}"
+        if job.pages:
+            label += f" pages {job.page_start}-{job.page_end}"
+        heartbeat = _LeaseHeartbeat(self.queue, job, self.worker_id)
+        heartbeat.start()
+        try:
+            deals = self.runner(job)
+            result = self.store.write(job, deals)
+        except Exception as e:
+            heartbeat.stop()
+            self.logger.error(f"❌ Job {job.job_id} ({label}) failed on attempt {job.attempts}: {e}")
+            self.logger.debug(traceback.format_exc())
+            self.queue.fail(job, self.worker_id, str(e))
+            return
+        heartbeat.stop()
+        if self.queue.complete(job, self.worker_id, result):
+            self.completed += 1
+            self.logger.info(f"✅ Job {job.job_id} ({label}): {len(deals)} deals")
+        else:
+            self.logger.warning(f"⚠️ Lost the lease on job {job.job_id} ({label}), result discarded")
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Extends a job's lease at a third of its length while the job runs."""
+
+    def __init__(self, queue: JobQueue, job: ScrapeJob, worker_id: str):
+        super().__init__(daemon=True)
+        # SQLite connections are per thread, so the heartbeat opens its own
+        self._queue_args = (queue.db_path, queue.lease_seconds)
+        self._job = job
+        self._worker_id = worker_id
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        db_path, lease_seconds = self._queue_args
+        queue = None
+        while not self._stopped.wait(lease_seconds / 3):
+            queue = queue or JobQueue(db_path, lease_seconds=lease_seconds)
+            if not queue.extend_lease(self._job, self._worker_id):
+                break
+        if queue is not None:
+            queue.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+class ScrapeCoordinator:
+    """Plans a batch of jobs, waits for the workers, then merges their results.
+
+    The merged batch becomes a regular ``deals_*`` snapshot, written through
+    the same NDJSON writer as a single-process scrape.
+    """
+
+    def __init__(self, queue: JobQueue, store: SnapshotStore):
+        self.logger = setup_logger("scrape_coordinator")
+        self.queue = queue
+        self.store = store
+
+    def submit(self, stores: Iterable[str] = STORE_URLS, regions: Dict[str, List[str]] = None,
+               pages: Dict[str, List[Tuple[int, int]]] = None, batch: Optional[str] = None) -> str:
+        """Enqueue one job per store x region x page range and return the batch id."""
+        batch = batch or datetime.now().strftime('%Y%m%d_%H%M%S')
+        regions = regions or {}
+        pages = pages or {}
+        jobs = [(store, region, page_range)
+                for store in stores
+                for region in regions.get(store, [''])
+                for page_range in pages.get(store, [None])]
+        self.queue.enqueue(batch, jobs)
+        self.logger.info(f"📋 Batch {batch}: {len(jobs)} jobs queued")
+        return batch
+
+    def wait(self, batch: str, timeout: Optional[float] = None, poll_seconds: float = POLL_SECONDS) -> Dict[str, int]:
+        """Block until no job in the batch is pending or leased."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            status = self.queue.batch_status(batch)
+            if status['pending'] == 0 and status['leased'] == 0:
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch} still has unfinished jobs: {status}")
+            time.sleep(poll_seconds)
+
+    def merge(self, batch: str, writer: RecordWriter,
+              enrichers: Sequence[Callable[[List[Deal]], object]] = ()) -> Dict[str, List[Deal]]:
+        """Write a finished batch's deals to ``writer``, grouped per store avis.
+
+        Results are keyed by ``source_label`` ('coop', 'coop@vestlandet').
+        Deal ids are re-normalized per avis, since page-range jobs of the same
+        avis cannot see each other's duplicates. Enrichers run here rather than
+        on the workers, so their caches have a single writer.
+        """
+        by_store: Dict[str, List[Deal]] = {}
+        for job, result in self.queue.batch_results(batch):
+            by_store.setdefault(source_label(job.store, job.region), []).extend(
+                Deal.from_dict(r) for r in self.store.read(result))
+        for label, deals in by_store.items():
+            store, _, region = label.partition('@')
+            by_store[label] = normalize_store_deals(store, deals, region)
+            for enricher in enrichers:
+                enricher(by_store[label])
+            writer.write_many(deal.to_dict() for deal in by_store[label])
+        for job, error in self.queue.batch_errors(batch):
+            self.logger.error(f"❌ Job {job.job_id} ({job.store}/{job.region or 'national'}) gave up: {error}")
+        return by_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed Dagligdags scrape")
+    sub = parser.add_subparsers(dest='role', required=True)
+    coordinator_args = sub.add_parser('coordinator', help="queue a batch, wait for it and save the snapshot")
+    coordinator_args.add_argument('--stores', nargs='*', default=list(STORE_URLS))
+    coordinator_args.add_argument('--timeout', type=float, default=None)
+    worker_args = sub.add_parser('worker', help="process jobs until stopped")
+    worker_args.add_argument('--once', action='store_true', help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if args.role == 'worker':
+        ScrapeWorker(JobQueue(), SnapshotStore(), newsletter_job_runner()).run(wait=not args.once)
+    else:
+        from backend.scraping.scraping_manager import ScrapingManager
+        ScrapingManager().run_distributed_scrape(args.stores, timeout=args.timeout)
@@ -0,0 +1,181 @@
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.paths import SCRAPE_QUEUE_DB
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5.0
+
+
+@dataclass
+class ScrapeJob:
+    """One unit of scraping work: a store, optionally a region and a page range."""
+    job_id: int
+    batch: str
+    store: str
+    region: str = ''
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    attempts: int = 0
+
+    @property
+    def pages(self) -> Optional[Tuple[int, int]]:
+        return (self.page_start, self.page_end) if self.page_start is not None else None
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Durable scrape job queue in SQLite, shared by workers on any node.
+
+    A worker claims a job by taking a lease; if it dies, the lease expires and
+    another worker picks the job up. Failures are retried with exponential
+    backoff until ``max_attempts``. Put the database on storage every worker
+    can reach; WAL mode and ``BEGIN IMMEDIATE`` keep claims exclusive.
+    """
+
+    def __init__(self, db_path=SCRAPE_QUEUE_DB, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, retry_backoff: float = RETRY_BACKOFF_SECONDS):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scrape_jobs ("
+            " job_id INTEGER PRIMARY KEY AUTOINCREMENT, batch TEXT NOT NULL,"
+            " store TEXT NOT NULL, region TEXT NOT NULL DEFAULT '',"
+            " page_start INTEGER, page_end INTEGER,"
+            " status TEXT NOT NULL DEFAULT 'pending',"  # pending, leased, done, failed
+            " attempts INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL DEFAULT 0,"
+            " lease_owner TEXT, lease_expires REAL, last_error TEXT, result TEXT,"
+            " created_at REAL NOT NULL, finished_at REAL, leased_by TEXT)"
+        )
+        # Queues created before leased_by was recorded
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scrape_jobs)")}
+        if 'leased_by' not in columns:
+            self._conn.execute("ALTER TABLE scrape_jobs ADD COLUMN leased_by TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scrape_jobs_claim ON scrape_jobs (status, not_before)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scrape_jobs_batch ON scrape_jobs (batch, status)")
+
+    def enqueue(self, batch: str, jobs: Iterable[Tuple[str, str, Optional[Tuple[int, int]]]]) -> int:
+        """Add (store, region, pages) jobs to ``batch``; returns how many were added."""
+        now = time.time()
+        rows = [(batch, store, region, pages[0] if pages else None, pages[1] if pages else None, now)
+                for store, region, pages in jobs]
+        with self._transaction():
+            self._conn.executemany(
+                "INSERT INTO scrape_jobs (batch, store, region, page_start, page_end, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def claim(self, worker_id: str, batch: Optional[str] = None) -> Optional[ScrapeJob]:
+        """Lease the next runnable job (pending, or leased by a worker that went away)."""
+        now = time.time()
+        query = ("SELECT job_id, batch, store, region, page_start, page_end, attempts FROM scrape_jobs"
+                 " WHERE ((status = 'pending' AND not_before <= ?) OR (status = 'leased' AND lease_expires < ?))")
+        params: List = [now, now]
+        if batch is not None:
+            query += " AND batch = ?"
+            params.append(batch)
+        with self._transaction():
+            while True:
+                row = self._conn.execute(query + " ORDER BY job_id LIMIT 1", params).fetchone()
+                if row is None:
+                    return None
+                if row[-1] < self.max_attempts:
+                    break
+                # Its workers kept dying mid-job; stop handing it out
+                self._conn.execute(
+                    "UPDATE scrape_jobs SET status = 'failed', last_error = 'lease expired', finished_at = ?,"
+                    " lease_owner = NULL WHERE job_id = ?", (now, row[0]))
+            self._conn.execute(
+                "UPDATE scrape_jobs SET status = 'leased', lease_owner = ?, leased_by = ?, lease_expires = ?,"
+                " attempts = attempts + 1 WHERE job_id = ?",
+                (worker_id, worker_id, now + self.lease_seconds, row[0]))
+        job = ScrapeJob(*row)
+        job.attempts += 1
+        return job
+
+    def extend_lease(self, job: ScrapeJob, worker_id: str) -> bool:
+        """Keep a long job's lease alive; False if it was lost to another worker."""
+        with self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE scrape_jobs SET lease_expires = ? WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, job.job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, job: ScrapeJob, worker_id: str, result: str) -> bool:
+        """Mark a job done with a pointer to its result; ignored if the lease was lost."""
+        with self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE scrape_jobs SET status = 'done', result = ?, finished_at = ?, lease_owner = NULL"
+                " WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (result, time.time(), job.job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, job: ScrapeJob, worker_id: str, error: str) -> None:
+        """Release a failed job for a retry after a backoff, or give up on it."""
+        final = job.attempts >= self.max_attempts
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE scrape_jobs SET status = ?, last_error = ?, not_before = ?, lease_owner = NULL,"
+                " finished_at = ? WHERE job_id = ? AND lease_owner = ?",
+                ('failed' if final else 'pending', error,
+                 time.time() + self.retry_backoff * 2 ** (job.attempts - 1),
+                 time.time() if final else None, job.job_id, worker_id))
+
+    def batch_status(self, batch: str) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT status, count(*) FROM scrape_jobs WHERE batch = ? GROUP BY status", (batch,)).fetchall()
+        return {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    def batch_workers(self, batch: str) -> Dict[str, int]:
+        """How many of the batch's jobs each worker completed.
+
+        ``lease_owner`` is cleared when a job finishes; ``leased_by`` keeps the
+        last worker to lease it, which for a done job is the one that did it.
+        """
+        rows = self._conn.execute(
+            "SELECT leased_by, count(*) FROM scrape_jobs WHERE batch = ? AND status = 'done' GROUP BY leased_by",
+            (batch,)).fetchall()
+        return dict(rows)
+
+    def batch_results(self, batch: str) -> List[Tuple[ScrapeJob, str]]:
+        rows = self._conn.execute(
+            "SELECT job_id, batch, store, region, page_start, page_end, attempts, result FROM scrape_jobs"
+            " WHERE batch = ? AND status = 'done' ORDER BY job_id", (batch,)).fetchall()
+        return [(ScrapeJob(*row[:-1]), row[-1]) for row in rows]
+
+    def batch_errors(self, batch: str) -> List[Tuple[ScrapeJob, str]]:
+        rows = self._conn.execute(
+            "SELECT job_id, batch, store, region, page_start, page_end, attempts, last_error FROM scrape_jobs"
+            " WHERE batch = ? AND status = 'failed' ORDER BY job_id", (batch,)).fetchall()
+        return [(ScrapeJob(*row[:-1]), row[-1]) for row in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn)
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, so two workers never claim the same row."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
@@ -1,16 +1,32 @@
 import requests
 import pdfplumber
+import os
 import re
-import json
-import tempfile
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple, Union
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from config.constants import STORE_URLS, REQUEST_TIMEOUT
-from config.paths import PDF_STORAGE_DIR, PARSED_DATA_DIR
+from config.constants import STORE_URLS, REGIONAL_STORE_URLS, REQUEST_TIMEOUT
+from config.paths import PDF_PARSE_CACHE_DIR, PARSED_DATA_DIR
+from backend.processing.deal import Deal
+from backend.scraping.ocr import OCR_VERSION, PageOcr, has_text_layer, page_count
+from backend.scraping.pipeline import normalize_store_deals
+from backend.scraping.validity import parse_validity
 from utilities.logger import setup_logger
+from utilities.record_stream import RecordWriter, output_suffix, read_records
+from utilities.spill_buffer import SpillBuffer
+
+# Chains that publish their tilbudsavis as a PDF rather than HTML listings
+PDF_STORES = ('coop', 'rema', 'bunnpris')
+# Bump when PDF parsing changes, so avis deals cached by an older parser are parsed again
+PARSER_VERSION = 1
+
+# Norwegian price patterns in page text
+PRICE_RE = re.compile(r"""
+    (?P<product>\S.*?)                 # Product name
+    \s+                                # Whitespace separator
+    (?P<price>\d{1,3}(?:,\d{2})?)\s*kr  # Norwegian price format
+""", re.VERBOSE)
 
 class NewsletterScraper:
     """Scrapes grocery newsletters from Norwegian stores with robust error handling."""
@@ -24,40 +40,99 @@ class NewsletterScraper:
         })
         self.verify_ssl = False  # Set via environment variable in production
         self.timeout = REQUEST_TIMEOUT
+        # Reads scanned (image-only) avis pages; its process pool starts on first use
+        self.ocr = PageOcr()
+        # Validity printed on each avis' front page, by PDF hash, for page-range jobs
+        self._avis_validity: Dict[str, Optional[Tuple[str, str]]] = {}
 
-    def scrape_all_stores(self) -> Dict[str, List[Dict]]:
+    def scrape_all_stores(self) -> Dict[str, List[Deal]]:
         """Orchestrate scraping for all configured stores."""
         all_deals = {}
+        writer = self.open_results_writer()
         
-        for store_name, base_url in STORE_URLS.items():
-            try:
-                self.logger.info(f"🔄 Starting scrape for {store_name}")
-                if store_name in ['coop', 'rema', 'bunnpris']:
-                    deals = self._scrape_pdf_store(base_url)
-                else:
-                    deals = self._scrape_html_store(base_url)
-                all_deals[store_name] = deals
-                self.logger.info(f"✅ Successfully scraped {store_name}: {len(deals)} deals")
-            except Exception as e:
-                self.logger.error(f"❌ Critical error scraping {store_name}: {str(e)}", exc_info=True)
-                all_deals[store_name] = []
+        for store_name in STORE_URLS:
+            # Tagged with store and deal_id before writing, as DealSnapshot.load expects
+            all_deals[store_name] = normalize_store_deals(store_name, self.scrape_store(store_name))
+            # Written as each store finishes, not after the last one
+            writer.write_many(deal.to_dict() for deal in all_deals[store_name])
         
-        self._save_results(all_deals)
+        self._commit_results(writer, len(all_deals))
         return all_deals
 
-    def _scrape_pdf_store(self, base_url: str) -> List[Dict]:
-        """Handle PDF-based newsletter stores."""
+    def scrape_store(self, store_name: str) -> List[Deal]:
+        """Fetch and parse the current deals for a single store."""
         try:
+            self.logger.info(f"🔄 Starting scrape for {store_name}")
+            deals = self.parse_store_payload(self.fetch_store(store_name))
+            self.logger.info(f"✅ Successfully scraped {store_name}: {len(deals)} deals")
+            return deals
+        except Exception as e:
+            self.logger.error(f"❌ Critical error scraping {store_name}: {str(e)}", exc_info=True)
+            return []
+
+    def fetch_store(self, store_name: str, region: str = '') -> Dict:
+        """Download the raw newsletter for a store without parsing it.
+
+        Returns a payload dict with ``store``, ``region``, ``kind`` ('pdf' or
+        'html') and either ``pdf`` (a ``SpillBuffer`` holding the download) or
+        ``html``. The network-bound half of a scrape, so the pipeline can run
+        it concurrently across stores. With ``region``, fetches that region's
+        variant of a chain listed in ``REGIONAL_STORE_URLS``.
+        """
+        if region:
+            template = REGIONAL_STORE_URLS.get(store_name.lower(), '')
+            base_url = template.format(region=region) if template else ''
+        else:
+            base_url = STORE_URLS.get(store_name.lower(), '')
+        if not base_url:
+            raise ValueError(f"No URL configured for store {store_name}" + (f" in region {region}" if region else ""))
+        
+        if store_name in PDF_STORES:
             pdf_url = self._find_pdf_link(base_url)
             if not pdf_url:
-                return []
-                
-            with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                self._download_pdf(pdf_url, tmp_file.name)
-                return self._parse_pdf(tmp_file.name)
+                return {'store': store_name, 'region': region, 'kind': 'pdf', 'pdf': None}
+            return {'store': store_name, 'region': region, 'kind': 'pdf', 'pdf': self._download_pdf(pdf_url)}
+        
+        response = self.session.get(base_url, timeout=self.timeout, verify=self.verify_ssl)
+        response.raise_for_status()
+        return {'store': store_name, 'region': region, 'kind': 'html', 'html': response.text}
+
+    def parse_store_payload(self, payload: Dict) -> List[Deal]:
+        """Turn a payload from ``fetch_store`` into deals, releasing the downloaded PDF.
+
+        A ``pages`` entry of (first, last), 1-based and inclusive, limits a PDF
+        to those pages, so one avis can be split across scrape workers. An avis
+        whose bytes were parsed before (chains re-serve the same PDF all week)
+        reuses the deals parsed then, as long as every page had text that time
+        and neither the parser nor the OCR setup has changed since.
+        """
+        if payload['kind'] == 'html':
+            return self._parse_html(payload['html'])
+        
+        pdf = payload.get('pdf')
+        if pdf is None:
+            return []
+        pages = payload.get('pages')
+        try:
+            key = (f"{pdf.hexdigest()}_v{PARSER_VERSION}.{OCR_VERSION}"
+                   + (f"_p{pages[0]}-{pages[1]}" if pages else ''))
+            deals = self._load_parsed_pdf(key)
+            if deals is not None:
+                self.logger.info(f"♻️ Unchanged avis for {payload['store']}, reusing {len(deals)} parsed deals")
+                return deals
+            texts, complete = self._read_pages(pdf, pages)
+            deals = self._deals_from_pages(texts, self._front_page_validity(pdf, pages))
+            if complete:
+                self._save_parsed_pdf(key, deals)
+            else:
+                # Pages lost to missing Tesseract or an OCR error are retried next scrape
+                self.logger.warning(f"⚠️ Parsed avis for {payload['store']} is missing pages, not caching it")
+            return deals
         except Exception as e:
             self.logger.error(f"PDF processing failed: {str(e)}")
             return []
+        finally:
+            pdf.close()
 
     def _find_pdf_link(self, base_url: str) -> Optional[str]:
         """Extract latest PDF link from store website."""
@@ -75,66 +150,130 @@ class NewsletterScraper:
             self.logger.error(f"HTTP error fetching PDF links: {e.response.status_code}")
             return None
 
-    def _download_pdf(self, url: str, save_path: str) -> None:
-        """Download PDF with proper resource cleanup."""
+    def _download_pdf(self, url: str) -> SpillBuffer:
+        """Stream a PDF into memory (spilling to an unlinked file if large), hashing it on the way."""
         try:
-            response = self.session.get(url, stream=True, timeout=self.timeout, verify=self.verify_ssl)
-            response.raise_for_status()
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            return self._stream_into_buffer(url, self.verify_ssl)
         except requests.exceptions.SSLError:
             self.logger.warning("⚠️ SSL verification failed, retrying without...")
-            response = self.session.get(url, stream=True, timeout=self.timeout, verify=False)
-            response.raise_for_status()
+            return self._stream_into_buffer(url, False)
 
-    def _parse_pdf(self, pdf_path: str) -> List[Dict]:
-        """Extract deals from PDF with fallback strategies."""
-        deals = []
+    def _stream_into_buffer(self, url: str, verify: bool) -> SpillBuffer:
+        buffer = SpillBuffer()
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout, verify=verify) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    buffer.write(chunk)
+        except BaseException:
+            buffer.close()
+            raise
+        return buffer
+
+    def _load_parsed_pdf(self, key: str) -> Optional[List[Deal]]:
+        """Deals parsed earlier from byte-identical PDF content, re-stamped as scraped now."""
+        path = PDF_PARSE_CACHE_DIR / f"{key}{output_suffix()}"
+        try:
+            records = list(read_records(path))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Could not read parsed-PDF cache {path.name}: {str(e)}")
+            return None
+        os.utime(path)  # Retention counts from the last time it was used
+        scraped_at = datetime.now().isoformat()
+        return [Deal.from_dict({**record, 'scraped_at': scraped_at}) for record in records]
+
+    def _save_parsed_pdf(self, key: str, deals: List[Deal]) -> None:
+        try:
+            with RecordWriter(PDF_PARSE_CACHE_DIR / f"{key}{output_suffix()}") as writer:
+                writer.write_many(deal.to_dict() for deal in deals)
+        except Exception as e:
+            self.logger.error(f"Could not cache parsed PDF: {str(e)}")
+
+    def _parse_pdf(self, pdf: Union[str, SpillBuffer], pages: Optional[Tuple[int, int]] = None) -> List[Deal]:
+        """Extract deals from PDF with fallback strategies.
+
+        Pages without a text layer (scanned images) are OCR'd; the text of
+        every page then goes through the same price extractor, in page order.
+        The first validity period printed in the avis applies to all its
+        deals. ``pdf`` is a path or a downloaded buffer, read in place.
+        """
+        return self._deals_from_pages(self._read_pages(pdf, pages)[0], self._front_page_validity(pdf, pages))
+
+    def _front_page_validity(self, pdf: Union[str, SpillBuffer],
+                             pages: Optional[Tuple[int, int]]) -> Optional[Tuple[str, str]]:
+        """Validity printed on page 1, for a page range that does not include it.
+
+        Chains print the period on the front page, so every page-range job of
+        an avis gets it from there, parsed once per PDF. None when the range
+        starts at page 1, or the front page has no period; the job's own pages
+        are searched then.
+        """
+        if not pages or pages[0] <= 1:
+            return None
+        key = pdf.hexdigest() if isinstance(pdf, SpillBuffer) else str(pdf)
+        if key not in self._avis_validity:
+            texts, _ = self._read_pages(pdf, (1, 1))
+            self._avis_validity[key] = parse_validity(texts.get(1, ''), date.today())
+        return self._avis_validity[key]
+
+    def _read_pages(self, pdf: Union[str, SpillBuffer],
+                    pages: Optional[Tuple[int, int]] = None) -> Tuple[Dict[int, str], bool]:
+        """Text of each page by page number, and whether every page yielded text.
+
+        Scanned pages are OCR'd; one that could not be (no Tesseract, or an
+        OCR error) is left out, which makes the result incomplete.
+        """
+        first = pages[0] if pages else 1
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text(layout=True) or ''
-                    deals.extend(self._parse_page_text(text))
+            with pdfplumber.open(_pdf_input(pdf)) as document:
+                selected = document.pages[first - 1:pages[1]] if pages else document.pages
+                texts = {number: page.extract_text(layout=True) or ''
+                         for number, page in enumerate(selected, start=first)}
         except pdfplumber.PDFSyntaxError:
             self.logger.warning("⚠️ PDF syntax error, attempting OCR fallback...")
-            deals.extend(self._parse_with_ocr(pdf_path))
-        return deals
+            last = pages[1] if pages else page_count(_pdf_input(pdf))
+            texts = self.ocr.recognize(_pdf_input(pdf), range(first, last + 1))
+            return texts, len(texts) == last - first + 1
+        
+        scanned = [number for number, text in texts.items() if not has_text_layer(text)]
+        if not scanned:
+            return texts, True
+        self.logger.info(f"🔍 OCR for {len(scanned)}/{len(texts)} image-only pages")
+        recognized = self.ocr.recognize(_pdf_input(pdf), scanned)
+        texts.update(recognized)
+        return texts, len(recognized) == len(scanned)
 
-    def _parse_page_text(self, text: str) -> List[Dict]:
+    def _parse_page_text(self, text: str) -> List[Deal]:
         """Parse Norwegian price patterns from text."""
-        price_regex = r"""
-            (?P<product>.+?)          # Product name
-            \s+                       # Whitespace separator
-            (?P<price>\d{1,3}(?:,\d{2})?)\s*kr  # Norwegian price format
+        matches = PRICE_RE.finditer(text)
+        scraped_at = datetime.now().isoformat()
+        return [Deal(
+            product=m.group('product').strip(),
+            price=float(m.group('price').replace(',', '.')),
+            source='pdf',
+            scraped_at=scraped_at
+        ) for m in matches]
+
+    def _deals_from_pages(self, texts: Dict[int, str],
+                          validity: Optional[Tuple[str, str]] = None) -> List[Deal]:
+        """Deals from every page's text, in page order, stamped with the avis' validity.
+
+        Without ``validity`` the first period printed on these pages is used.
         """
-        matches = re.finditer(price_regex, text, re.VERBOSE)
-        return [{
-            'product': m.group('product').strip(),
-            'price': float(m.group('price').replace(',', '.')),
-            'source': 'pdf',
-            'scraped_at': datetime.now().isoformat()
-        } for m in matches]
-
-    def _parse_with_ocr(self, pdf_path: str) -> List[Dict]:
-        """Fallback PDF parsing using OCR."""
-        # Implementation would use Tesseract here
-        return []
-
-    def _scrape_html_store(self, base_url: str) -> List[Dict]:
-        """Scrape HTML-based deal listings."""
-        try:
-            response = self.session.get(base_url, timeout=self.timeout, verify=self.verify_ssl)
-            response.raise_for_status()
-            return self._parse_html(response.text)
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"HTML scrape failed: {str(e)}")
-            return []
+        pages = [texts[number] for number in sorted(texts)]
+        deals = [deal for text in pages for deal in self._parse_page_text(text)]
+        if validity is None:
+            validity = next(filter(None, (parse_validity(text, date.today()) for text in pages)), None)
+        _stamp_validity(deals, validity)
+        return deals
 
-    def _parse_html(self, html: str) -> List[Dict]:
+    def _parse_html(self, html: str) -> List[Deal]:
         """Parse Norwegian HTML structure for deals."""
         soup = BeautifulSoup(html, 'lxml')
         deals = []
+        scraped_at = datetime.now().isoformat()
         
         # Example for Oda-style HTML
         for item in soup.select('[data-testid="product-item"]'):
@@ -142,31 +281,57 @@ class NewsletterScraper:
                 name = item.select_one('.product-name').text.strip()
                 price_text = item.select_one('.price').text
                 price = float(price_text.replace('kr', '').replace(',', '.').strip())
-                deals.append({
-                    'product': name,
-                    'price': price,
-                    'source': 'html',
-                    'scraped_at': datetime.now().isoformat()
-                })
+                deals.append(Deal(
+                    product=name,
+                    price=price,
+                    source='html',
+                    scraped_at=scraped_at
+                ))
             except (AttributeError, ValueError) as e:
                 self.logger.debug(f"Skipping invalid item: {str(e)}")
+        _stamp_validity(deals, parse_validity(soup.get_text(' '), date.today()))
         return deals
 
+    def open_results_writer(self) -> RecordWriter:
+        """NDJSON writer for this run's deals, one record per deal."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return RecordWriter(PARSED_DATA_DIR / f"deals_{timestamp}{output_suffix()}", default=Deal.to_dict)
+
     def _save_results(self, data: Dict) -> None:
-        """Atomic write with backup retention."""
+        """Atomic write of {store: deals} as compressed NDJSON."""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = PARSED_DATA_DIR / f"deals_{timestamp}.json"
-            
-            # Write to temp file first
-            with tempfile.NamedTemporaryFile('w', delete=False) as tmp:
-                json.dump(data, tmp, ensure_ascii=False, indent=2)
-                
-            # Atomic rename
-            Path(tmp.name).rename(output_file)
-            self.logger.info(f"💾 Saved {len(data)} stores' deals to {output_file}")
+            writer = self.open_results_writer()
         except Exception as e:
             self.logger.error(f"💥 Failed to save results: {str(e)}")
+            return
+        try:
+            for store_name, deals in data.items():
+                writer.write_many(deal.to_dict() for deal in normalize_store_deals(store_name, deals))
+        except Exception as e:
+            writer.abort()
+            self.logger.error(f"💥 Failed to save results: {str(e)}")
+            return
+        self._commit_results(writer, len(data))
+
+    def _commit_results(self, writer: RecordWriter, store_count: int) -> None:
+        try:
+            output_file = writer.commit()
+            self.logger.info(f"💾 Saved {store_count} stores' deals to {output_file} "
+                             f"({writer.records} deals, {writer.bytes_written} bytes, {writer.seconds * 1000:.0f} ms)")
+        except Exception as e:
+            writer.abort()
+            self.logger.error(f"💥 Failed to save results: {str(e)}")
+
+
+def _stamp_validity(deals: List[Deal], window: Optional[Tuple[str, str]]) -> None:
+    if window:
+        for deal in deals:
+            deal.valid_from, deal.valid_to = window
+
+
+def _pdf_input(pdf: Union[str, SpillBuffer]):
+    """What pdfplumber and pypdfium2 open: the path, or a fresh reader over the buffer."""
+    return pdf.reader() if isinstance(pdf, SpillBuffer) else pdf
 
 if __name__ == "__main__":
     scraper = NewsletterScraper()
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import pypdfium2
+
+from config.paths import OCR_CACHE_DIR
+from utilities.logger import setup_logger
+
+try:
+    import pytesseract
+except ImportError:  # Optional: image-only pages yield no deals without it
+    pytesseract = None
+
+OCR_DPI = 300
+OCR_LANG = 'nor'
+# Bump when rendering or Tesseract settings change; text cached by an older setup is not reused
+OCR_VERSION = 1
+MIN_TEXT_CHARS = 20  # Fewer characters in a page's text layer means it is a scanned image
+
+
+def ocr_available() -> bool:
+    """Whether pytesseract and the tesseract binary are both installed."""
+    return pytesseract is not None and shutil.which('tesseract') is not None
+
+
+def has_text_layer(text: Optional[str]) -> bool:
+    return text is not None and sum(not c.isspace() for c in text) >= MIN_TEXT_CHARS
+
+
+PdfInput = Union[str, Path, BinaryIO]
+
+
+def page_count(source: PdfInput) -> int:
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def render_pages(source: PdfInput, page_numbers: Iterable[int],
+                 dpi: int = OCR_DPI) -> Iterator[Tuple[int, bytes, Tuple[int, int]]]:
+    """Rasterize 1-based pages to 8-bit grayscale: (page number, pixels, (width, height))."""
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        for page_number in page_numbers:
+            image = pdf[page_number - 1].render(scale=dpi / 72, grayscale=True).to_pil().convert('L')
+            yield page_number, image.tobytes(), image.size
+    finally:
+        pdf.close()
+
+
+def page_digest(pixels: bytes, size: Tuple[int, int], lang: str = OCR_LANG) -> str:
+    """Cache key of a page image: a re-published avis renders to the same pixels."""
+    digest = hashlib.sha256(f"v{OCR_VERSION}|{lang}|{size[0]}x{size[1]}|".encode())
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+def _init_worker() -> None:
+    # One page per process; keep tesseract from spawning threads of its own
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _ocr_page(pixels: bytes, size: Tuple[int, int], lang: str) -> str:
+    from PIL import Image
+    return pytesseract.image_to_string(Image.frombytes('L', size, pixels), lang=lang, config='--psm 6')
+
+
+class PageOcr:
+    """OCR for scanned avis pages, one page per task across a process pool.
+
+    Pages are rasterized here and looked up by image hash in an on-disk
+    cache, so a re-published or unchanged newsletter is never OCR'd twice;
+    only cache misses are sent to Tesseract.
+    """
+
+    def __init__(self, cache_dir: Path = OCR_CACHE_DIR, workers: Optional[int] = None,
+                 dpi: int = OCR_DPI, lang: str = OCR_LANG):
+        self.logger = setup_logger("ocr")
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.dpi = dpi
+        self.lang = lang
+        self.stats = {'pages': 0, 'cache_hits': 0, 'recognized': 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def recognize(self, source: PdfInput, page_numbers: Iterable[int]) -> Dict[int, str]:
+        """Text of the given 1-based pages; pages that cannot be OCR'd are left out.
+
+        At most two pages per worker are rendered ahead of the pool, so a
+        long avis does not hold every page image in memory at once.
+        """
+        texts = {}
+        inflight = deque()
+        available = ocr_available()
+        skipped = 0
+        for page_number, pixels, size in render_pages(source, page_numbers, self.dpi):
+            self.stats['pages'] += 1
+            digest = page_digest(pixels, size, self.lang)
+            cached = self._cached(digest)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                texts[page_number] = cached
+            elif not available:
+                skipped += 1
+            else:
+                if len(inflight) >= 2 * self.workers:
+                    self._collect(inflight.popleft(), texts)
+                inflight.append((page_number, digest, self._executor().submit(_ocr_page, pixels, size, self.lang)))
+        while inflight:
+            self._collect(inflight.popleft(), texts)
+        if skipped:
+            self.logger.warning(f"⚠️ Tesseract is not installed, skipped OCR of {skipped} pages")
+        return texts
+
+    def _collect(self, task, texts: Dict[int, str]) -> None:
+        page_number, digest, future = task
+        try:
+            texts[page_number] = text = future.result()
+        except Exception as e:
+            self.logger.error(f"❌ OCR failed for page {page_number}: {str(e)}")
+            return
+        self.stats['recognized'] += 1
+        self._store(digest, text)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the scrape pipeline runs this from worker threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'),
+                                             initializer=_init_worker)
+        return self._pool
+
+    def _cache_path(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.txt"
+
+    def _cached(self, digest: str) -> Optional[str]:
+        try:
+            return self._cache_path(digest).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    def _store(self, digest: str, text: str) -> None:
+        path = self._cache_path(digest)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = path.with_name(f".{path.name}.tmp")
+            tmp_file.write_text(text, encoding='utf-8')
+            tmp_file.replace(path)
+        except OSError as e:
+            self.logger.error(f"Could not cache OCR text: {str(e)}")
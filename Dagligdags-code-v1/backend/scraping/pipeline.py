@@ -0,0 +1,205 @@
+# backend/scraping/pipeline.py
+
+import hashlib
+import queue
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from backend.processing.deal import Deal, as_deal
+from utilities.logger import setup_logger
+
+# Sentinel passed down the queues once a stage has no more work
+_DONE = object()
+
+
+@dataclass
+class PipelineSource:
+    """One independent thing to scrape (a store newsletter or a food database).
+
+    ``fetch`` does the network I/O and ``parse`` turns its result into records.
+    ``kind`` is 'deals' for store newsletters and 'food_db' for nutrition
+    sources; only deal batches are handed to the rescoring stage. A regional
+    avis variant sets ``region``; ``store`` defaults to ``name``.
+    """
+    name: str
+    fetch: Callable[[], Any]
+    parse: Callable[[Any], Any]
+    kind: str = 'deals'
+    store: str = ''
+    region: str = ''
+
+    def __post_init__(self):
+        self.store = self.store or self.name
+
+
+def source_label(store: str, region: str = '') -> str:
+    """Name of a store's scrape source: 'coop', or 'coop@vestlandet' for a regional avis."""
+    return f"{store}@{region}" if region else store
+
+
+def make_deal_id(store: str, product: str, region: str = '') -> str:
+    """Stable id for a deal, so consecutive snapshots can be diffed."""
+    key = f"{store.lower()}|{' '.join(product.lower().split())}"
+    if region:
+        key = f"{key}|{region}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def normalize_store_deals(store: str, deals: List, region: str = '') -> List[Deal]:
+    """Tag parsed deals with their store, region and a stable ``deal_id``, in place."""
+    store = sys.intern(store)
+    region = sys.intern(region)
+    seen = {}
+    normalized = []
+    for deal in deals:
+        deal = as_deal(deal)
+        deal_id = make_deal_id(store, deal.product, region)
+        # The same product can appear twice in one avis (e.g. two pack sizes)
+        seen[deal_id] = seen.get(deal_id, 0) + 1
+        if seen[deal_id] > 1:
+            deal_id = f"{deal_id}-{seen[deal_id]}"
+        deal.store = store
+        deal.region = region
+        deal.deal_id = deal_id
+        normalized.append(deal)
+    return normalized
+
+
+class _Stage:
+    """A pool of worker threads reading from a bounded input queue."""
+
+    def __init__(self, name: str, func: Callable, workers: int, queue_size: int):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input = queue.Queue(maxsize=queue_size)
+        self.next: Optional['_Stage'] = None
+        self._remaining = workers
+        self._lock = threading.Lock()
+
+    def finish_upstream(self) -> None:
+        """Tell every worker of this stage that no more items will arrive."""
+        for _ in range(self.workers):
+            self.input.put(_DONE)
+
+
+class ScrapePipeline:
+    """Staged scrape: fetch -> parse -> normalize -> enrich -> persist -> rescore.
+
+    Stages are connected by bounded queues, so a store's deals move on as soon
+    as they are parsed while slower sources are still downloading, and a fast
+    producer blocks instead of piling results up in memory. ``enrichers`` are
+    called in order on each store's normalized deals (entity resolution and
+    the like) and may update them in place.
+    """
+
+    def __init__(self, sources: List[PipelineSource],
+                 persist: Callable[[PipelineSource, Any], None],
+                 rescore: Optional[Callable[[PipelineSource, List[Deal]], None]] = None,
+                 enrichers: Optional[List[Callable[[List[Deal]], Any]]] = None,
+                 fetch_workers: int = 4, parse_workers: int = 2, queue_size: int = 4):
+        self.logger = setup_logger("scrape_pipeline")
+        self.sources = sources
+        self.persist = persist
+        self.rescore = rescore
+        self.enrichers = enrichers or []
+        self.stats: Dict[str, Dict] = {}
+        self._stats_lock = threading.Lock()
+
+        fetch_workers = max(1, min(fetch_workers, len(sources)))
+        self.stages = [
+            # The fetch queue holds every source up front, so it is not bounded
+            _Stage('fetch', self._fetch, fetch_workers, 0),
+            _Stage('parse', self._parse, parse_workers, queue_size),
+            _Stage('normalize', self._normalize, 1, queue_size),
+            _Stage('enrich', self._enrich, 1, queue_size),
+            _Stage('persist', self._persist, 1, queue_size),
+            _Stage('rescore', self._rescore, 1, queue_size),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+
+    def run(self) -> Dict[str, Dict]:
+        """Run every source through all stages and return per-source stats."""
+        started = time.perf_counter()
+        threads = []
+        for stage in self.stages:
+            for i in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage,),
+                                          name=f"pipeline-{stage.name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        for source in self.sources:
+            self.stats[source.name] = {'kind': source.kind, 'records': 0, 'error': None}
+            first.input.put((source, None))
+        first.finish_upstream()
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Pipeline finished {len(self.sources)} sources in {elapsed:.2f}s")
+        return self.stats
+
+    def _work(self, stage: _Stage) -> None:
+        while True:
+            item = stage.input.get()
+            if item is _DONE:
+                break
+            source, payload = item
+            try:
+                result = stage.func(source, payload)
+            except Exception as e:
+                self._record_error(source, stage.name, e)
+                continue
+            if stage.next is not None and result is not None:
+                stage.next.input.put((source, result))
+
+        # The last worker out closes the downstream stage
+        with stage._lock:
+            stage._remaining -= 1
+            last = stage._remaining == 0
+        if last and stage.next is not None:
+            stage.next.finish_upstream()
+
+    def _record_error(self, source: PipelineSource, stage_name: str, error: Exception) -> None:
+        self.logger.error(f"❌ {stage_name} failed for {source.name}: {error}")
+        self.logger.debug(traceback.format_exc())
+        with self._stats_lock:
+            self.stats[source.name]['error'] = f"{stage_name}: {error}"
+
+    def _fetch(self, source: PipelineSource, _: Any) -> Any:
+        self.logger.info(f"🔄 Fetching {source.name}")
+        return source.fetch()
+
+    def _parse(self, source: PipelineSource, raw: Any) -> Any:
+        return source.parse(raw)
+
+    def _normalize(self, source: PipelineSource, records: Any) -> Any:
+        if source.kind != 'deals':
+            return records
+        return normalize_store_deals(source.store, records, source.region)
+
+    def _enrich(self, source: PipelineSource, records: Any) -> Any:
+        if source.kind == 'deals':
+            for enricher in self.enrichers:
+                enricher(records)
+        return records
+
+    def _persist(self, source: PipelineSource, records: Any) -> Any:
+        self.persist(source, records)
+        with self._stats_lock:
+            self.stats[source.name]['records'] = len(records)
+            self.stats[source.name]['persisted_at'] = datetime.now().isoformat()
+        return records
+
+    def _rescore(self, source: PipelineSource, records: Any) -> None:
+        if self.rescore is not None and source.kind == 'deals':
+            self.rescore(source, records)
+        return None
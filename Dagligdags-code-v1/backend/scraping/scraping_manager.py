@@ -1,9 +1,21 @@
 # backend/scraping/scraping_manager.py
 
+import threading
 import traceback
 from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
 from backend.scraping.newsletter_scraper import NewsletterScraper
 from backend.scraping.database_scraper import DatabaseScraper
+from backend.scraping.pipeline import PipelineSource, ScrapePipeline, source_label
+from backend.scraping.job_queue import JobQueue
+from backend.scraping.distributed_scrape import ScrapeCoordinator, SnapshotStore
+from backend.processing.entity_resolution import EntityResolver
+from backend.processing.nutrient_enrichment import NutrientEnricher
+from backend.processing.unit_pricing import apply_unit_prices
+from backend.processing.data_retention import RetentionJob
+from backend.processing.regions import RegionRegistry
+from config.constants import STORE_URLS, REGIONAL_STORE_URLS
 from utilities.logger import setup_logger
 
 class ScrapingManager:
@@ -11,28 +23,121 @@ class ScrapingManager:
         self.logger = setup_logger("scraping_manager")
         self.newsletter_scraper = NewsletterScraper()
         self.database_scraper = DatabaseScraper()
+        # Maps each store's product names to one id per product across chains
+        self.entity_resolver = EntityResolver()
+        # Protein, sustainability and category from the food database
+        self.nutrient_enricher = NutrientEnricher()
+        # Run on each store's normalized deals, in order
+        self.enrichers = [apply_unit_prices, self.entity_resolver.resolve, self.nutrient_enricher.enrich]
+        # Regions with users get their regional avis variants scraped too;
+        # a region's first user triggers a scrape of just that region
+        self.regions = RegionRegistry()
+        self.regions.add_listener(self.scrape_region_in_background)
+        # Called with (store, deals, region) as soon as each store's deals are persisted
+        self.rescore_listeners: List[Callable[[str, List[Dict], str], None]] = []
+        # Called with the run's stats once every store of a daily scrape has been rescored
+        self.scrape_listeners: List[Callable[[Dict], None]] = []
+
+    def add_rescore_listener(self, listener: Callable[[str, List[Dict], str], None]) -> None:
+        """Register a callback that rescores users when a store's deals land."""
+        self.rescore_listeners.append(listener)
+
+    def add_scrape_listener(self, listener: Callable[[Dict], None]) -> None:
+        """Register a callback run after each completed daily or distributed scrape, e.g. deal alerts."""
+        self.scrape_listeners.append(listener)
 
     def run_daily_scrape(self):
-        """Run all scraping tasks for the day and log results."""
+        """Run all scraping tasks for the day as one pipeline and log results."""
         self.logger.info("Starting daily scraping tasks...")
+        # Food databases written by earlier daily runs of this process
+        self.nutrient_enricher.refresh()
 
+        run = _ScrapeRun(self.newsletter_scraper, self.database_scraper)
+        pipeline = ScrapePipeline(self._build_sources(), persist=run.persist, rescore=self._rescore,
+                                  enrichers=self.enrichers)
         try:
-            self.logger.info("Scraping newsletters...")
-            newsletter_results = self.newsletter_scraper.scrape_all_stores()
-            self.logger.info(f"Newsletter scraping complete. {len(newsletter_results)} stores scraped.")
+            stats = pipeline.run()
         except Exception as e:
-            self.logger.error(f"Error scraping newsletters: {e}")
+            self.logger.error(f"Error running scrape pipeline: {e}")
             self.logger.error(traceback.format_exc())
+            run.abort()
+            return {}
+
+        self._save_enricher_caches()
+        run.commit()
+
+        failed = [name for name, stat in stats.items() if stat['error']]
+        self.logger.info(f"Scraped {len(stats) - len(failed)}/{len(stats)} sources"
+                         + (f", failed: {', '.join(failed)}" if failed else ""))
+        self.run_retention()
+        self._scrape_finished(stats)
+        self.logger.info("All scraping tasks finished at " + datetime.now().isoformat())
+        return stats
+
+    def run_distributed_scrape(self, stores: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """Queue one job per store for worker processes, wait for them and save the merged snapshot.
+
+        Workers run ``python backend/scraping/distributed_scrape.py worker`` on
+        any node that shares the job queue database and snapshot store.
+        """
+        self.nutrient_enricher.refresh()
+        coordinator = ScrapeCoordinator(JobQueue(), SnapshotStore())
+        stores = list(stores or STORE_URLS)
+        regions = {store: ['', *self.regions.regions()] for store in stores if store in REGIONAL_STORE_URLS}
+        batch = coordinator.submit(stores, regions=regions)
+        try:
+            status = coordinator.wait(batch, timeout=timeout)
+        except TimeoutError as e:
+            self.logger.error(str(e))
+            return {}
 
+        writer = self.newsletter_scraper.open_results_writer()
         try:
-            self.logger.info("Scraping product/nutrition databases...")
-            db_results = self.database_scraper.scrape_all_databases()
-            self.logger.info(f"Database scraping complete. {len(db_results)} databases scraped.")
+            merged = coordinator.merge(batch, writer, enrichers=self.enrichers)
         except Exception as e:
-            self.logger.error(f"Error scraping databases: {e}")
+            writer.abort()
+            self.logger.error(f"Error merging batch {batch}: {e}")
             self.logger.error(traceback.format_exc())
+            return {}
+        self._save_enricher_caches()
+        self.newsletter_scraper._commit_results(writer, len(merged))
 
-        self.logger.info("All scraping tasks finished at " + datetime.now().isoformat())
+        for label, deals in merged.items():
+            store, _, region = label.partition('@')
+            self._rescore(PipelineSource(name=label, fetch=None, parse=None, store=store, region=region), deals)
+        self.logger.info(f"Distributed scrape {batch}: {status['done']} jobs done, {status['failed']} failed")
+        self._scrape_finished(status)
+        return status
+
+    def scrape_region(self, region: str):
+        """Scrape only the regional avis variants of one region and rescore with them.
+
+        Used when a region's first user appears. The result is not written to a
+        deals snapshot; the next daily scrape includes the region and saves it.
+        """
+        self.logger.info(f"Scraping regional offers for {region}...")
+        pipeline = ScrapePipeline(self._regional_sources([region]), persist=lambda source, records: None,
+                                  rescore=self._rescore, enrichers=self.enrichers)
+        try:
+            stats = pipeline.run()
+        except Exception as e:
+            self.logger.error(f"Error scraping region {region}: {e}")
+            self.logger.error(traceback.format_exc())
+            return {}
+        self._save_enricher_caches()
+        return stats
+
+    def scrape_region_in_background(self, region: str) -> None:
+        threading.Thread(target=self.scrape_region, args=(region,), name=f"scrape-{region}", daemon=True).start()
+
+    def run_retention(self):
+        """Compact old snapshots, rotate logs and expire data past DATA_RETENTION."""
+        try:
+            return RetentionJob().run()
+        except Exception as e:
+            self.logger.error(f"Error in retention job: {e}")
+            self.logger.error(traceback.format_exc())
+            return {}
 
     def run_newsletter_scrape(self):
         """Run only the newsletter scraper."""
@@ -48,12 +153,112 @@ class ScrapingManager:
         """Run only the database scraper."""
         self.logger.info("Running database scraper only...")
         try:
-            return self.database_scraper.scrape_all_databases()
+            return self.database_scraper.scrape_all_sources()
         except Exception as e:
             self.logger.error(f"Error in database scraper: {e}")
             self.logger.error(traceback.format_exc())
             return {}
 
+    def _build_sources(self) -> List[PipelineSource]:
+        """One pipeline source per store newsletter, regional variant and food database."""
+        sources = [
+            PipelineSource(
+                name=store_name,
+                fetch=partial(self.newsletter_scraper.fetch_store, store_name),
+                parse=self.newsletter_scraper.parse_store_payload,
+            )
+            for store_name in STORE_URLS
+        ]
+        sources.extend(self._regional_sources(self.regions.regions()))
+        for endpoint_key in self.database_scraper.SOURCE_VALIDATORS:
+            sources.append(PipelineSource(
+                name=endpoint_key,
+                fetch=partial(self.database_scraper.fetch_source, endpoint_key),
+                parse=partial(self.database_scraper.normalize_source, endpoint_key),
+                kind='food_db',
+            ))
+        return sources
+
+    def _regional_sources(self, regions: Iterable[str]) -> List[PipelineSource]:
+        return [
+            PipelineSource(
+                name=source_label(store_name, region),
+                fetch=partial(self.newsletter_scraper.fetch_store, store_name, region),
+                parse=self.newsletter_scraper.parse_store_payload,
+                store=store_name,
+                region=region,
+            )
+            for region in regions
+            for store_name in REGIONAL_STORE_URLS
+        ]
+
+    def _save_enricher_caches(self) -> None:
+        for cache in (self.entity_resolver, self.nutrient_enricher):
+            try:
+                cache.save()
+            except Exception as e:
+                self.logger.error(f"Error saving {type(cache).__name__} cache: {e}")
+
+    def _rescore(self, source: PipelineSource, deals: List[Dict]) -> None:
+        for listener in self.rescore_listeners:
+            try:
+                listener(source.store, deals, source.region)
+            except Exception as e:
+                self.logger.error(f"Rescoring after {source.name} failed: {e}")
+                self.logger.error(traceback.format_exc())
+
+    def _scrape_finished(self, stats: Dict) -> None:
+        for listener in self.scrape_listeners:
+            try:
+                listener(stats)
+            except Exception as e:
+                self.logger.error(f"After-scrape listener failed: {e}")
+                self.logger.error(traceback.format_exc())
+
+
+class _ScrapeRun:
+    """Streams what the persist stage hands over into this run's output files.
+
+    Each store's deals are written as soon as they are persisted; the files
+    only appear under their final names once ``commit`` renames them.
+    """
+
+    def __init__(self, newsletter_scraper: NewsletterScraper, database_scraper: DatabaseScraper):
+        self.newsletter_scraper = newsletter_scraper
+        self.database_scraper = database_scraper
+        self.deal_stores = 0
+        self._deals_writer = None
+        self._food_db_writer = None
+        self._lock = threading.Lock()
+
+    def persist(self, source: PipelineSource, records) -> None:
+        with self._lock:
+            if source.kind == 'deals':
+                if self._deals_writer is None:
+                    self._deals_writer = self.newsletter_scraper.open_results_writer()
+                self._deals_writer.write_many(deal.to_dict() for deal in records)
+                self.deal_stores += 1
+            else:
+                if self._food_db_writer is None:
+                    self._food_db_writer = self.database_scraper.open_results_writer()
+                self.database_scraper.write_sections(self._food_db_writer, records)
+
+    def commit(self) -> None:
+        if self._deals_writer is not None:
+            self.newsletter_scraper._commit_results(self._deals_writer, self.deal_stores)
+        if self._food_db_writer is not None:
+            try:
+                path = self._food_db_writer.commit()
+                self.database_scraper.logger.info(f"💾 Saved normalized database to {path}")
+            except Exception as e:
+                self._food_db_writer.abort()
+                self.database_scraper.logger.error(f"💥 Failed to save database: {str(e)}")
+
+    def abort(self) -> None:
+        for writer in (self._deals_writer, self._food_db_writer):
+            if writer is not None:
+                writer.abort()
+
 # For manual testing
 if __name__ == "__main__":
     manager = ScrapingManager()
@@ -0,0 +1,96 @@
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+# Longest validity a printed period may span; anything longer is a misread
+MAX_VALIDITY_DAYS = 62
+
+_MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mai': 5, 'jun': 6,
+           'jul': 7, 'aug': 8, 'sep': 9, 'okt': 10, 'nov': 11, 'des': 12}
+_MONTH = r"(?:jan|feb|mar|apr|mai|jun|jul|aug|sep|okt|nov|des)[a-zæøå]*"
+_DASH = r"\s*(?:-|–|—|til(?:\s+og\s+med)?|t\.o\.m\.?)\s*"
+_WEEKDAY = r"(?:[a-zæøå]+dag\s+)?"
+
+# "2.–8. juni", "fra mandag 2. juni til lørdag 7. juni 2025"
+_TEXT_RANGE = re.compile(
+    rf"\b(?P<d1>\d{{1,2}})\.?\s*(?:(?P<m1>{_MONTH})\.?\s*(?P<y1>\d{{4}})?)?{_DASH}{_WEEKDAY}"
+    rf"(?P<d2>\d{{1,2}})\.?\s*(?P<m2>{_MONTH})\.?(?:\s*(?P<y2>\d{{4}}))?", re.IGNORECASE)
+# "02.06 - 08.06", "2/6–8/6", "02.06.2025 til 08.06.2025"
+_NUMERIC_RANGE = re.compile(
+    rf"\b(?P<d1>\d{{1,2}})[./](?P<m1>\d{{1,2}})(?:[./](?P<y1>\d{{4}}|\d{{2}}))?\.?{_DASH}{_WEEKDAY}"
+    rf"(?P<d2>\d{{1,2}})[./](?P<m2>\d{{1,2}})(?:[./](?P<y2>\d{{4}}|\d{{2}})\b)?", re.IGNORECASE)
+# "t.o.m. 8. juni", "til og med 08.06"
+_UNTIL = re.compile(
+    rf"(?:t\.o\.m\.?|til\s+og\s+med)\s*{_WEEKDAY}(?P<d>\d{{1,2}})(?:\.?\s*(?P<mname>{_MONTH})|[./](?P<m>\d{{1,2}}))",
+    re.IGNORECASE)
+# "uke 23", "uke 23–24", "uke 23 og 24"
+_WEEKS = re.compile(r"\buke\s*(?P<w1>\d{1,2})(?:\s*(?:-|–|og)\s*(?P<w2>\d{1,2}))?\b", re.IGNORECASE)
+
+
+def parse_validity(text: str, today: date) -> Optional[Tuple[str, str]]:
+    """The validity period a tilbudsavis prints, as (valid_from, valid_to) ISO dates.
+
+    Explicit date ranges win over week numbers; a "til og med" date alone
+    gives an open start (''). Years that are not printed are taken as the
+    ones that put the period nearest ``today``. None if nothing plausible
+    is found.
+    """
+    for pattern in (_TEXT_RANGE, _NUMERIC_RANGE):
+        for m in pattern.finditer(text):
+            window = _range(m, today)
+            if window:
+                return window
+    for m in _UNTIL.finditer(text):
+        month = _MONTHS[m.group('mname')[:3].lower()] if m.group('mname') else int(m.group('m'))
+        end = _nearest(int(m.group('d')), month, None, today)
+        if end:
+            return '', end.isoformat()
+    for m in _WEEKS.finditer(text):
+        first, last = int(m.group('w1')), int(m.group('w2') or m.group('w1'))
+        start = _nearest_week(first, today)
+        end = _nearest_week(last, start or today)
+        if start and end and start <= end <= start + timedelta(days=MAX_VALIDITY_DAYS):
+            return start.isoformat(), (end + timedelta(days=6)).isoformat()
+    return None
+
+
+def _range(m: re.Match, today: date) -> Optional[Tuple[str, str]]:
+    m2 = _month(m.group('m2'))
+    m1 = _month(m.group('m1')) if m.group('m1') else m2
+    end = _nearest(int(m.group('d2')), m2, m.group('y2'), today)
+    if end is None:
+        return None
+    start = _nearest(int(m.group('d1')), m1, m.group('y1'), end)
+    if start is None or not start <= end <= start + timedelta(days=MAX_VALIDITY_DAYS):
+        return None
+    return start.isoformat(), end.isoformat()
+
+
+def _month(value: str) -> int:
+    return int(value) if value.isdigit() else _MONTHS[value[:3].lower()]
+
+
+def _nearest(day: int, month: int, year: Optional[str], around: date) -> Optional[date]:
+    """The date with this day and month (and year, if printed) closest to ``around``."""
+    if year:
+        years = [int(year) + (2000 if len(year) == 2 else 0)]
+    else:
+        years = [around.year - 1, around.year, around.year + 1]
+    candidates = []
+    for y in years:
+        try:
+            candidates.append(date(y, month, day))
+        except ValueError:
+            continue
+    return min(candidates, key=lambda d: abs(d - around), default=None)
+
+
+def _nearest_week(week: int, around: date) -> Optional[date]:
+    """Monday of the ISO week with this number closest to ``around``."""
+    candidates = []
+    for y in (around.year - 1, around.year, around.year + 1):
+        try:
+            candidates.append(date.fromisocalendar(y, week, 1))
+        except ValueError:
+            continue
+    return min(candidates, key=lambda d: abs(d - around), default=None)
@@ -0,0 +1,157 @@
+"""Load test for the deal API against localhost.
+
+By default it starts the API itself on synthetic data (``--deals`` deals,
+``--users`` profiles in a temporary directory) with ``--workers`` processes,
+then hammers it from ``--concurrency`` client threads. Use ``--url`` to test
+an API that is already running; user ids are then read from ``--profiles-dir``.
+
+    python benchmarks/api_load_test.py --workers 4 --requests 5000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+STORES = ['coop', 'rema', 'kiwi', 'meny', 'oda']
+CATEGORIES = ['meat', 'dairy', 'vegetables', 'bakery', 'fish']
+ITEMS = ['melk', 'egg', 'brød', 'ost', 'kylling', 'laks', 'epler']
+
+
+def write_synthetic_data(root: Path, n_deals: int, n_users: int, seed: int = 1):
+    rng = random.Random(seed)
+    by_store = {store: [] for store in STORES}
+    for i in range(n_deals):
+        store = rng.choice(STORES)
+        by_store[store].append({
+            'product': f"{rng.choice(ITEMS)} variant {i}",
+            'price': round(rng.uniform(5, 150), 2),
+            'product_category': rng.choice(CATEGORIES),
+            'organic': rng.random() < 0.2,
+            'protein_content': rng.randrange(0, 35),
+        })
+    snapshot_file = root / "deals_synthetic.json"
+    snapshot_file.write_text(json.dumps(by_store), encoding='utf-8')
+
+    profiles_dir = root / "profiles"
+    profiles_dir.mkdir()
+    for u in range(n_users):
+        profile = {
+            'organic_preference': rng.randint(1, 5),
+            'price_sensitivity': rng.randint(1, 5),
+            'preferred_stores': rng.sample(STORES, 2),
+            'diet': rng.choice([[], ['vegetarian']]),
+            'pantry_type': rng.choice(['', 'high_protein']),
+        }
+        (profiles_dir / f"user_u{u}.json").write_text(json.dumps(profile), encoding='utf-8')
+    return snapshot_file, profiles_dir, [f"u{u}" for u in range(n_users)]
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise RuntimeError(f"API at {url} did not come up")
+
+
+def run_load(url: str, user_ids, n_requests: int, concurrency: int, basket_share: float, revalidate: bool):
+    etags = {}
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    rng = random.Random(2)
+    paths = []
+    for _ in range(n_requests):
+        user_id = rng.choice(user_ids)
+        if rng.random() < basket_share:
+            items = urllib.parse.quote(','.join(rng.sample(ITEMS, 3)))
+            paths.append(f"/users/{user_id}/basket?items={items}")
+        else:
+            paths.append(f"/users/{user_id}/deals")
+
+    def one(path):
+        req = urllib.request.Request(url + path)
+        if revalidate and path in etags:
+            req.add_header('If-None-Match', etags[path])
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                response.read()
+                status = response.status
+                etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            status, etag = e.code, None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            if etag:
+                etags[path] = etag
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, paths))
+    wall = time.perf_counter() - started
+    return wall, latencies, statuses
+
+
+def report(label, wall, latencies, statuses):
+    latencies = sorted(latencies)
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{label}: {len(latencies)} requests in {wall:.2f}s = {len(latencies) / wall:.0f} req/s, "
+          f"p50 {q[49] * 1000:.1f} ms, p95 {q[94] * 1000:.1f} ms, p99 {q[98] * 1000:.1f} ms, status {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="existing API, e.g. http://127.0.0.1:8080")
+    parser.add_argument('--profiles-dir', type=Path, help="where to read user ids from with --url")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--deals', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--basket-share', type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = None
+    tmp = tempfile.TemporaryDirectory()
+    if args.url:
+        url = args.url.rstrip('/')
+        user_ids = [p.stem[len('user_'):] for p in Path(args.profiles_dir).glob('user_*.json')]
+    else:
+        snapshot_file, profiles_dir, user_ids = write_synthetic_data(Path(tmp.name), args.deals, args.users)
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, str(PROJECT_ROOT / 'backend' / 'api' / 'deals_api.py'),
+                                   '--port', str(args.port), '--workers', str(args.workers),
+                                   '--snapshot-file', str(snapshot_file), '--profiles-dir', str(profiles_dir)],
+                                  cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url)
+        report("cold", *run_load(url, user_ids, args.requests, args.concurrency, args.basket_share, False))
+        report("warm", *run_load(url, user_ids, args.requests, args.concurrency, args.basket_share, False))
+        report("etag", *run_load(url, user_ids, args.requests, args.concurrency, args.basket_share, True))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Memory per deal: scraper dicts (plus the matcher's scored copies) vs Deal records.
+
+Run from the project root:  python benchmarks/deal_memory.py [n_deals]
+"""
+
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.processing.deal import Deal
+
+STORES = ['coop', 'rema', 'kiwi', 'meny', 'oda']
+CATEGORIES = ['meieri', 'kjøtt', 'fisk', 'grønnsaker', 'kornvarer', 'tørrvarer']
+
+
+def synthetic_records(n):
+    """JSON-decoded records, so categorical strings are distinct objects like after json.load."""
+    rng = random.Random(1)
+    records = [{
+        'deal_id': f"{i:016x}",
+        'store': rng.choice(STORES),
+        'product': f"Vare nummer {i}",
+        'price': round(rng.uniform(5, 150), 2),
+        'product_category': rng.choice(CATEGORIES),
+        'package_size': rng.choice(['regular', 'bulk']),
+        'source': 'pdf',
+        'scraped_at': '2025-05-26T19:52:20.123456',
+    } for i in range(n)]
+    return json.loads(json.dumps(records))
+
+
+def measure(build, n):
+    raw = json.dumps(synthetic_records(n))
+    tracemalloc.start()
+    # Only what ``build`` keeps alive is counted; the decoded records are
+    # garbage once it returns unless it holds on to them
+    built = build(json.loads(raw))
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert built
+    return held / n
+
+
+def as_dicts(records):
+    # The matcher's old path: every positive deal copied and extended
+    scored = []
+    for deal in records:
+        deal_copy = deal.copy()
+        deal_copy['match_score'] = 1.0
+        deal_copy['recommendation_reason'] = "good value"
+        scored.append(deal_copy)
+    return records, scored
+
+
+def as_deals(records):
+    return [Deal.from_dict(record) for record in records]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dict_bytes = measure(lambda records: list(records), n)
+    scored_bytes = measure(as_dicts, n)
+    deal_bytes = measure(as_deals, n)
+    print(f"{n} deals")
+    print(f"dict records:               {dict_bytes:7.0f} B/deal")
+    print(f"dict records + scored copy: {scored_bytes:7.0f} B/deal")
+    print(f"Deal records:               {deal_bytes:7.0f} B/deal")
@@ -0,0 +1,58 @@
+"""Throughput of the distributed scrape with one worker process versus several.
+
+Jobs sleep instead of downloading an avis, so the numbers show queue and
+process overhead, not network speed. With enough jobs the speed-up should
+approach the worker count.
+
+Run from the project root:  python benchmarks/distributed_scrape.py [n_jobs] [n_workers]
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.processing.deal import Deal
+from backend.scraping.distributed_scrape import ScrapeCoordinator, ScrapeWorker, SnapshotStore
+from backend.scraping.job_queue import JobQueue
+
+JOB_SECONDS = 0.25  # Stands in for downloading one avis; long enough that process start-up does not dominate
+
+
+def fake_scrape(job):
+    time.sleep(JOB_SECONDS)
+    return [Deal(store=job.store, product="Vare", price=10.0)]
+
+
+def worker_process(db_path, store_dir, worker_id):
+    ScrapeWorker(JobQueue(db_path), SnapshotStore(store_dir), fake_scrape, worker_id).run()
+
+
+def run(tmp: Path, workers: int, jobs: int) -> float:
+    db_path, store_dir = tmp / f"queue_{workers}.sqlite3", tmp / f"results_{workers}"
+    coordinator = ScrapeCoordinator(JobQueue(db_path), SnapshotStore(store_dir))
+    batch = coordinator.submit([f"store{i}" for i in range(jobs)])
+    context = multiprocessing.get_context('fork')
+    started = time.perf_counter()
+    processes = [context.Process(target=worker_process, args=(db_path, store_dir, f"w{i}")) for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    status = coordinator.wait(batch, timeout=1)
+    print(f"{workers} worker(s): {jobs} jobs in {elapsed:5.2f} s ({jobs / elapsed:5.1f} jobs/s), "
+          f"done {status['done']}, by worker {coordinator.queue.batch_workers(batch)}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        one = run(Path(tmp), 1, n_jobs)
+        many = run(Path(tmp), n_workers, n_jobs)
+    print(f"Speed-up with {n_workers} workers: {one / many:.2f}x")
@@ -0,0 +1,62 @@
+"""OCR throughput on locally generated image-only avis PDFs.
+
+Compares one OCR worker with a process pool, then re-runs the same avis to
+show the page-hash cache. Needs pytesseract and the tesseract binary.
+
+Run from the project root:  python benchmarks/ocr_throughput.py [n_pages]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, ImageFont
+from backend.scraping.newsletter_scraper import PRICE_RE
+from backend.scraping.ocr import PageOcr, ocr_available
+
+PRODUCTS = ['Kjøttdeig 400 g', 'Lettmelk 1 l', 'Norvegia 1 kg', 'Bananer pr kg', 'Egg 12 stk', 'Laks 500 g']
+
+
+def image_avis(path: Path, n_pages: int) -> None:
+    """A scanned-looking avis: every page is a bitmap, nothing in a text layer."""
+    rng = random.Random(1)
+    font = ImageFont.load_default(size=40)
+    pages = []
+    for page in range(n_pages):
+        image = Image.new('L', (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        for line in range(20):
+            price = f"{rng.randrange(10, 200)},{rng.randrange(0, 100):02d}"
+            draw.text((100, 100 + 75 * line), f"{rng.choice(PRODUCTS)} {price} kr", fill=0, font=font)
+        pages.append(image)
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=150)
+
+
+def run(ocr: PageOcr, path: Path, n_pages: int, label: str) -> None:
+    started = time.perf_counter()
+    texts = ocr.recognize(str(path), range(1, n_pages + 1))
+    elapsed = time.perf_counter() - started
+    prices = sum(1 for text in texts.values() for _ in PRICE_RE.finditer(text))
+    print(f"{label:<22} {n_pages} pages: {elapsed:6.2f} s ({n_pages / elapsed:5.2f} pages/s, {prices} prices)")
+
+
+if __name__ == "__main__":
+    if not ocr_available():
+        print("Skipped: pytesseract and the tesseract binary are required")
+        sys.exit(0)
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        avis = tmp / "avis.pdf"
+        image_avis(avis, n_pages)
+        for workers in (1, os.cpu_count() or 1):
+            ocr = PageOcr(tmp / f"cache_{workers}", workers=workers)
+            run(ocr, avis, n_pages, f"{workers} worker(s)")
+            if workers > 1:
+                run(ocr, avis, n_pages, "cached re-run")
+            ocr.close()
@@ -0,0 +1,69 @@
+"""Bytes on disk and write latency: legacy indented JSON vs streamed NDJSON.
+
+Run from the project root:  python benchmarks/output_writes.py [n_deals]
+"""
+
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.processing.deal import Deal
+from utilities.compression import zstandard
+from utilities.record_stream import RecordWriter, read_records
+
+STORES = ['coop', 'rema', 'kiwi', 'meny', 'oda']
+CATEGORIES = ['meieri', 'kjøtt', 'fisk', 'grønnsaker', 'kornvarer', 'tørrvarer']
+
+
+def synthetic_deals(n):
+    rng = random.Random(1)
+    return {store: [Deal(deal_id=f"{i:016x}", store=store, product=f"Vare nummer {i} {rng.choice(['400 g', '1 l'])}",
+                         price=round(rng.uniform(5, 150), 2), product_category=rng.choice(CATEGORIES),
+                         source='pdf', scraped_at='2025-05-26T19:52:20.123456')
+                    for i in range(n // len(STORES))]
+            for store in STORES}
+
+
+def legacy_json(directory, data):
+    path = directory / "deals_legacy.json"
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as tmp:
+        json.dump(data, tmp, ensure_ascii=False, indent=2, default=Deal.to_dict)
+    Path(tmp.name).rename(path)
+    return path
+
+
+def ndjson(suffix):
+    def write(directory, data):
+        with RecordWriter(directory / f"deals_stream{suffix}") as writer:
+            for deals in data.values():
+                writer.write_many(deal.to_dict() for deal in deals)
+        return writer.path
+    return write
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    data = synthetic_deals(n)
+    variants = [('json indent=2', legacy_json), ('ndjson', ndjson('.ndjson')), ('ndjson.gz', ndjson('.ndjson.gz'))]
+    if zstandard is not None:
+        variants.append(('ndjson.zst', ndjson('.ndjson.zst')))
+
+    print(f"{n} deals")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, write in variants:
+            started = time.perf_counter()
+            path = write(Path(directory), data)
+            write_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            if path.suffix == '.json':
+                with open(path, encoding='utf-8') as f:
+                    json.load(f)
+            else:
+                sum(1 for _ in read_records(path))
+            read_ms = (time.perf_counter() - started) * 1000
+            print(f"{name:14s} {path.stat().st_size / 1024:9.0f} KiB  write {write_ms:6.0f} ms  read {read_ms:6.0f} ms")
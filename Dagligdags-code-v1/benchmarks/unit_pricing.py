@@ -0,0 +1,41 @@
+"""Unit-price normalization throughput over a synthetic avis batch.
+
+Run from the project root:  python benchmarks/unit_pricing.py [n_deals]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.processing.deal import Deal
+from backend.processing import unit_pricing
+from backend.processing.unit_pricing import apply_unit_prices
+
+PRODUCTS = ['Kjøttdeig', 'Lettmelk', 'Norvegia', 'Bananer', 'Egg', 'Cola', 'Kyllingfilet', 'Laks', 'Brød']
+SIZES = ['400 g', '1 l', '1 kg', 'pr kg', '12 stk', '6x0,33 l', '1,5 l', '250 g', '']
+
+
+def synthetic_deals(n, distinct_names):
+    rng = random.Random(1)
+    names = [f"{rng.choice(PRODUCTS)} variant {i} {rng.choice(SIZES)}" for i in range(distinct_names)]
+    return [Deal(store='rema', product=rng.choice(names), price=round(rng.uniform(5, 150), 2))
+            for _ in range(n)]
+
+
+def run(n, distinct_names):
+    deals = synthetic_deals(n, distinct_names)
+    unit_pricing._parse_cache.clear()
+    started = time.perf_counter()
+    apply_unit_prices(deals)
+    elapsed = time.perf_counter() - started
+    priced = sum(deal.unit_price is not None for deal in deals)
+    print(f"{n} deals, {distinct_names} distinct names: {elapsed * 1000:6.0f} ms ({priced} unit-priced)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    run(n, n // 20)  # A week of avis data repeats names across stores
+    run(n, n)        # Worst case: every name is new
@@ -49,3 +49,37 @@ class Constants:
         'coop': 60,  # requests/minute
         'rema': 30
     }
+
+
+# Module-level aliases used by the scrapers and the matcher
+STORE_URLS: dict = Config.STORE_URLS
+REGIONAL_STORE_URLS: dict = Config.REGIONAL_STORE_URLS
+API_ENDPOINTS: dict = Config.FOOD_DATABASES
+REQUEST_TIMEOUT: int = Constants.API_TIMEOUT
+
+# Score bonuses for strong (>= 4) profile preferences
+PREFERENCE_WEIGHTS: dict = {
+    'organic': 2.0,
+    'local': 1.5,
+    'price_sensitive': 1.0
+}
+
+# Score penalty per km from the store, by transport mode
+DISTANCE_PENALTIES: dict = {
+    'walking': 1.0,
+    'cycling': 0.5,
+    'public_transport': 0.3,
+    'driving': 0.2,
+    'delivery': 0.0
+}
+
+# Postnummer ranges (first, last) and the offer region they belong to
+POSTCODE_REGIONS: list = [
+    (0, 1299, 'oslo'),
+    (1300, 3999, 'ostlandet'),
+    (4000, 4399, 'vestlandet'),
+    (4400, 4999, 'sorlandet'),
+    (5000, 6999, 'vestlandet'),
+    (7000, 7999, 'midt-norge'),
+    (8000, 9999, 'nord-norge')
+]
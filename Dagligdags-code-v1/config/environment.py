@@ -20,10 +20,25 @@ class Config:
     # API Limits (aligned with Norwegian store policies)
     REQUESTS_PER_MINUTE: int = 60
     MAX_RETRIES: int = 3
+    
+    # Deal alert e-mail (SMTP)
+    SMTP_HOST: str = os.getenv('SMTP_HOST', 'localhost')
+    SMTP_PORT: int = int(os.getenv('SMTP_PORT', '25'))
+    SMTP_USER: str = os.getenv('SMTP_USER', '')
+    SMTP_PASSWORD: str = os.getenv('SMTP_PASSWORD', '')
+    SMTP_STARTTLS: bool = os.getenv('SMTP_STARTTLS', 'false').lower() == 'true'
+    ALERT_SENDER: str = os.getenv('ALERT_SENDER', 'tilbud@dagligdags.no')
+    ALERT_MAX_CONNECTIONS: int = int(os.getenv('ALERT_MAX_CONNECTIONS', '4'))
+
+    # Scraper output files: 'zst', 'gz' or 'none'
+    OUTPUT_COMPRESSION: str = os.getenv('OUTPUT_COMPRESSION', 'zst').lower()
 
     @classmethod
-    def get_store_url(cls, store_name: str) -> str:
-        """Get configured URL for Norwegian grocery chains."""
+    def get_store_url(cls, store_name: str, region: str = '') -> str:
+        """Get configured URL for Norwegian grocery chains, optionally a regional avis."""
+        if region:
+            template = cls.REGIONAL_STORE_URLS.get(store_name.lower(), '')
+            return template.format(region=region) if template else ''
         return cls.STORE_URLS.get(store_name.lower(), '')
     
     # Norwegian grocery store URLs
@@ -35,6 +50,12 @@ class Config:
         'oda': 'https://oda.com/api/v1/products'
     }
     
+    # Chains that run regional offers: one avis per region on top of the national one
+    REGIONAL_STORE_URLS: dict = {
+        'coop': 'https://coop.no/uke-tilbud/?region={region}',
+        'rema': 'https://www.rema.no/aktuelt/aktuelle-tilbud/?region={region}'
+    }
+    
     # Food databases
     FOOD_DATABASES: dict = {
         'matvaretabellen': 'https://www.matvaretabellen.no/api/v2/foods',
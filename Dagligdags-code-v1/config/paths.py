@@ -27,7 +27,32 @@ class Paths:
         dir.mkdir(parents=True, exist_ok=True)
 
 
+# Module-level directories used by the backend and frontend
+PROJECT_ROOT = Paths.PROJECT_ROOT
+LOG_DIR = Paths.LOG_DIR
+BACKEND_DATA_DIR = PROJECT_ROOT / 'backend' / 'data'
+USER_PROFILES_DIR = BACKEND_DATA_DIR / 'user_profiles'
+NORMALIZED_DATA_DIR = BACKEND_DATA_DIR / 'normalized_data'
+NEWSLETTER_DATA_DIR = BACKEND_DATA_DIR / 'grocery_data' / 'newsletters'
+PDF_STORAGE_DIR = NEWSLETTER_DATA_DIR / 'pdfs'
+PARSED_DATA_DIR = NEWSLETTER_DATA_DIR / 'parsed'
+ALERTS_DIR = BACKEND_DATA_DIR / 'alerts'
+OCR_CACHE_DIR = NEWSLETTER_DATA_DIR / 'ocr_cache'
+# Deals parsed from each distinct PDF, keyed by its SHA-256
+PDF_PARSE_CACHE_DIR = PDF_STORAGE_DIR / 'parsed_cache'
+
+for _dir in [USER_PROFILES_DIR, NORMALIZED_DATA_DIR, PDF_STORAGE_DIR, PARSED_DATA_DIR, ALERTS_DIR, OCR_CACHE_DIR,
+             PDF_PARSE_CACHE_DIR]:
+    _dir.mkdir(parents=True, exist_ok=True)
+
 # File paths
 USER_PROFILE_TEMPLATE = USER_PROFILES_DIR / "user_{user_id}.json"
 DEALS_DATABASE = NORMALIZED_DATA_DIR / "deals.json"
 STORE_LOCATIONS = NORMALIZED_DATA_DIR / "store_locations.json"
+SENT_ALERTS_DB = ALERTS_DIR / "sent_alerts.sqlite3"
+PRICE_HISTORY_DB = NORMALIZED_DATA_DIR / "price_history.sqlite3"
+ACTIVE_REGIONS_FILE = NORMALIZED_DATA_DIR / "active_regions.json"
+
+# Distributed scraping: both must be on storage shared by every worker node
+SCRAPE_QUEUE_DB = Path(os.getenv('SCRAPE_QUEUE_DB', BACKEND_DATA_DIR / "scrape_queue.sqlite3"))
+SNAPSHOT_STORE_DIR = Path(os.getenv('SNAPSHOT_STORE_DIR', NEWSLETTER_DATA_DIR / "job_results"))
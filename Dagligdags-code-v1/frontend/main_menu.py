@@ -1,13 +1,81 @@
 import json
+import threading
+from itertools import islice
 from pathlib import Path
 from simple_term_menu import TerminalMenu
 from config.paths import USER_PROFILES_DIR
 from frontend.onboarding import DagligdagsOnboarding
+from utilities.logger import log_user_action
+
+PAGE_SIZE = 10
+
+class DealFeed:
+    """A user's ranked deals, produced page by page in a background thread.
+
+    Pages are kept between menu actions. When the matcher's snapshot has moved
+    on, ``refresh_if_stale`` starts a new feed in the background and the menu
+    swaps to it once its first page is ready. If ranking fails, the feed ends
+    where it got to and keeps the exception in ``error``.
+    """
+
+    def __init__(self, deal_matcher, userid, page_size=PAGE_SIZE):
+        self.deal_matcher = deal_matcher
+        self.userid = userid
+        self.page_size = page_size
+        self.snapshot_version = deal_matcher.snapshot.version
+        self.pages = []
+        self.exhausted = False
+        self.error = None
+        self._stream = deal_matcher.iter_current_deals(userid)
+        self._cond = threading.Condition()
+        self._wanted = 1
+        self._worker = threading.Thread(target=self._produce, daemon=True)
+        self._worker.start()
+
+    def page(self, index, timeout=None):
+        """Page ``index`` (0-based), or None past the end. Blocks until it is ready."""
+        with self._cond:
+            self._wanted = max(self._wanted, index + 2)  # Keep one page ahead
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: len(self.pages) > index or self.exhausted, timeout)
+            return self.pages[index] if index < len(self.pages) else None
+
+    def first_page_ready(self):
+        with self._cond:
+            return bool(self.pages) or self.exhausted
+
+    def is_stale(self):
+        return self.deal_matcher.snapshot.version != self.snapshot_version
+
+    def _produce(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.pages) < self._wanted)
+            try:
+                page = list(islice(self._stream, self.page_size))
+            except Exception as e:
+                with self._cond:
+                    self.error = e
+                    self.exhausted = True
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                if page:
+                    self.pages.append(page)
+                if len(page) < self.page_size:
+                    self.exhausted = True
+                self._cond.notify_all()
+                if self.exhausted:
+                    return
 
 class MainMenu:
-    def __init__(self, userid):
+    def __init__(self, userid, deal_matcher=None, scraping_manager=None):
         self.userid = userid
+        self.deal_matcher = deal_matcher
+        self.scraping_manager = scraping_manager
         self.profile = self.load_profile()
+        self.deal_feed = None
+        self._next_feed = None
         self.menu_options = [
             "Se personlige tilbud",
             "Kartvisning av butikker",
@@ -17,7 +85,7 @@ class MainMenu:
         ]
 
     def load_profile(self):
-        profile_path = Path(USER_PROFILES_DIR) / f"{self.userid}.json"
+        profile_path = Path(USER_PROFILES_DIR) / f"user_{self.userid}.json"
         if profile_path.exists():
             with open(profile_path, "r", encoding="utf-8") as f:
                 return json.load(f)
@@ -43,8 +111,57 @@ class MainMenu:
                 break
 
     def show_deals(self):
-        print("\n[DEMO] Personlige tilbud vises her basert på din profil.\n")
-        input("Trykk Enter for å gå tilbake til menyen.")
+        if self.deal_matcher is None:
+            print("\nTilbud er ikke tilgjengelige akkurat nå.\n")
+            input("Trykk Enter for å gå tilbake til menyen.")
+            return
+        log_user_action(self.userid, 'deals_viewed', {'location': None})
+        feed = self._current_feed()
+        index = 0
+        while True:
+            if index == 0 and not feed.first_page_ready():
+                print("\n🔄 Finner tilbud for deg...")
+            page = feed.page(index)
+            if page is None:
+                if feed.error is not None:
+                    print("\n⚠️  Klarte ikke å hente flere tilbud akkurat nå.")
+                else:
+                    print("\nIngen flere tilbud." if index else "\nFant ingen tilbud som passer profilen din.")
+                if index == 0:
+                    input("Trykk Enter for å gå tilbake til menyen.")
+                    return
+                index -= 1
+                continue
+            self._print_page(page, index)
+            if feed.is_stale():
+                print("ℹ️  Nye tilbud er hentet – listen oppdateres neste gang du åpner den.")
+            choice = input("\n[n] neste side, [f] forrige side, Enter for meny: ").strip().lower()
+            if choice == "n":
+                index += 1
+            elif choice == "f" and index > 0:
+                index -= 1
+            elif choice not in ("n", "f"):
+                return
+
+    def _current_feed(self):
+        """Cached feed for this user, rebuilt in the background after a new scrape."""
+        if self.deal_feed is None or self.deal_feed.error is not None:
+            self.deal_feed = DealFeed(self.deal_matcher, self.userid)
+        elif self.deal_feed.is_stale():
+            if self._next_feed is None or self._next_feed.is_stale():
+                self._next_feed = DealFeed(self.deal_matcher, self.userid)
+            if self._next_feed.first_page_ready():
+                self.deal_feed, self._next_feed = self._next_feed, None
+        return self.deal_feed
+
+    def _print_page(self, page, index):
+        first = index * PAGE_SIZE + 1
+        print(f"\n--- Dine tilbud {first}–{first + len(page) - 1} ---")
+        for number, deal in enumerate(page, start=first):
+            price = deal.get('price')
+            price_text = f"{price:.2f}".replace('.', ',') + " kr" if price is not None else ""
+            print(f"{number:>3}. {deal.get('product', '')} {price_text} – {deal.get('store', '').capitalize()}")
+            print(f"     {deal.get('recommendation_reason', '')}")
 
     def show_map(self):
         print("\n[DEMO] Kart over butikker vises her.\n")
@@ -1,7 +1,7 @@
 import json
 from datetime import datetime
-from pathlib import Path
 from config.paths import USER_PROFILES_DIR
+from backend.processing.profile_store import ProfileFeatureStore, profile_preferences
 from utilities.logger import setup_logger
 
 MVP_QUESTIONS = [
@@ -38,6 +38,12 @@ MVP_QUESTIONS = [
         "type": "choice",
         "options": ["Går", "Bil", "Sykkel", "Levering"],
         "mandatory": True
+    },
+    {
+        "id": "epost",
+        "text": "Vil du få tilbudsvarsler på e-post? Skriv e-postadressen din (Enter for nei)",
+        "type": "text",
+        "mandatory": False
     }
 ]
 
@@ -136,11 +142,15 @@ class DagligdagsOnboarding:
             "createdat": datetime.now().isoformat(),
             "answers": self.answers,
         }
-        profile_path = Path(USER_PROFILES_DIR) / f"{self.userid}.json"
+        store = ProfileFeatureStore(USER_PROFILES_DIR)
+        profile_path = store.profile_path(self.userid)
         try:
             with open(profile_path, "w", encoding="utf-8") as f:
                 json.dump(profile, f, indent=4)
             self.logger.info(f"User profile saved for {self.userid}")
+            # Compiled now so matching never has to interpret the answers
+            store.put(self.userid, profile_preferences(profile), profile_path.stat().st_mtime_ns)
+            store.close()
         except Exception as e:
             self.logger.error(f"Failed to save profile: {str(e)}")
             print("En feil oppstod under lagring av profilen.")
@@ -16,6 +16,7 @@ from frontend.onboarding import DagligdagsOnboarding
 from frontend.main_menu import MainMenu
 from backend.scraping.scraping_manager import ScrapingManager
 from backend.processing.match_algorithm import DealMatcher
+from utilities.email_alert import AlertDispatcher
 from utilities.logger import setup_logger
 
 class DagligdagsApp:
@@ -23,7 +24,13 @@ class DagligdagsApp:
         self.logger = setup_logger("main_app")
         self.current_user = None
         self.scraping_manager = ScrapingManager()
-        self.deal_matcher = DealMatcher()
+        # Shares the scraper's region registry, so a new region's first user triggers its scrape
+        self.deal_matcher = DealMatcher(region_registry=self.scraping_manager.regions)
+        # Fold each store's fresh deals into cached rankings as they are scraped
+        self.scraping_manager.add_rescore_listener(self.deal_matcher.on_store_deals)
+        # Then e-mail each opted-in user a digest of their new top deals
+        self.alerts = AlertDispatcher(profiles=self.deal_matcher.features)
+        self.scraping_manager.add_scrape_listener(lambda stats: self.alerts.send_digests(self.deal_matcher))
     
     def run(self):
         """Main application loop"""
@@ -102,7 +109,7 @@ class DagligdagsApp:
     def _main_app_loop(self):
         """Main application functionality loop"""
         main_menu = MainMenu(self.current_user, self.deal_matcher, self.scraping_manager)
-        main_menu.run()
+        main_menu.show()
 
 if __name__ == "__main__":
     app = DagligdagsApp()
@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+from backend.processing.data_retention import RetentionJob
+from backend.processing.price_history import PriceHistory
+from backend.scraping.pipeline import make_deal_id
+from utilities.compression import ARCHIVE_SUFFIX, open_compressed
+
+def _write_deals(directory, run_id, price):
+    path = directory / f"deals_{run_id}.json"
+    path.write_text(json.dumps({'kiwi': [{'product': 'Lettmelk 1 l', 'price': price}]}), encoding='utf-8')
+    return path
+
+def _job(tmp_path):
+    dirs = {name: tmp_path / name for name in ('parsed', 'normalized', 'pdfs', 'logs', 'profiles')}
+    for directory in dirs.values():
+        directory.mkdir()
+    job = RetentionJob(price_history=PriceHistory(tmp_path / "history.sqlite3"),
+                       parsed_dir=dirs['parsed'], normalized_dir=dirs['normalized'], pdf_dir=dirs['pdfs'],
+                       log_dir=dirs['logs'], profiles_dir=dirs['profiles'])
+    return job, dirs
+
+def test_compacts_snapshots_into_daily_archive_and_price_history(tmp_path):
+    job, dirs = _job(tmp_path)
+    _write_deals(dirs['parsed'], '20250526_080000', 21.9)
+    _write_deals(dirs['parsed'], '20250526_200000', 19.9)
+    newest = _write_deals(dirs['parsed'], '20250527_080000', 18.9)
+
+    stats = job.run(today=date(2025, 5, 27))
+
+    assert stats['deal_snapshots_compacted'] == 2
+    assert [p.name for p in dirs['parsed'].glob('deals_*.json')] == [newest.name]
+    with open_compressed(dirs['parsed'] / 'archive' / f"deals_20250526.ndjson{ARCHIVE_SUFFIX}") as f:
+        assert [json.loads(line)['price'] for line in f] == [21.9, 19.9]
+
+    [day] = job.price_history.history(make_deal_id('kiwi', 'Lettmelk 1 l'))
+    assert (day['min_price'], day['max_price'], day['observations']) == (19.9, 21.9, 2)
+
+    # A week later the raw archive is gone but the aggregates stay
+    job.run(today=date(2025, 6, 3))
+    assert not list((dirs['parsed'] / 'archive').iterdir())
+    assert len(job.price_history.history(make_deal_id('kiwi', 'Lettmelk 1 l'))) == 1
+
+def test_rotates_logs_and_expires_old_profiles(tmp_path):
+    job, dirs = _job(tmp_path)
+    (dirs['logs'] / "main_app_20250526.log").write_text("old line\n")
+    (dirs['logs'] / "main_app_20250527.log").write_text("today\n")
+    stale = dirs['profiles'] / "user_old.json"
+    stale.write_text("{}")
+    old = datetime(2022, 1, 1).timestamp()
+    os.utime(stale, (old, old))
+    (dirs['profiles'] / "user_new.json").write_text("{}")
+    (dirs['profiles'] / "scoring_plans").mkdir()
+    (dirs['profiles'] / "scoring_plans" / "user_old.json").write_text("{}")
+
+    stats = job.run(today=date(2025, 5, 27))
+
+    assert stats['logs_rotated'] == 1 and stats['profiles_expired'] == 1
+    assert sorted(p.name for p in dirs['logs'].glob('*.log')) == ["main_app_20250527.log"]
+    assert gzip.decompress((dirs['logs'] / 'archive' / "main_app_20250526.log.gz").read_bytes()) == b"old line\n"
+    assert [p.name for p in dirs['profiles'].glob('*.json')] == ["user_new.json"]
+    assert not list((dirs['profiles'] / "scoring_plans").iterdir())
+
+def test_profiles_of_active_users_are_kept_however_old_the_file(tmp_path):
+    job, dirs = _job(tmp_path)
+    for user in ('active', 'gone'):
+        profile = dirs['profiles'] / f"user_{user}.json"
+        profile.write_text(json.dumps({'userid': user, 'createdat': '2022-01-01T12:00:00'}))
+        old = datetime(2022, 1, 1).timestamp()
+        os.utime(profile, (old, old))
+    entry = {'timestamp': '2025-05-26T18:30:00', 'user_id': 'active', 'action': 'deals_viewed', 'details': {}}
+    (dirs['logs'] / "user_analytics_20250526.log").write_text(
+        f"2025-05-26 18:30:00,000 - user_analytics - INFO - {json.dumps(entry)}\n")
+
+    stats = job.run(today=date(2025, 5, 27))
+
+    assert stats['profiles_seen'] == 1 and stats['profiles_expired'] == 1
+    assert [p.name for p in dirs['profiles'].glob('*.json')] == ["user_active.json"]
+    assert json.loads((dirs['profiles'] / "user_active.json").read_text())['last_seen'] == '2025-05-26'
+
+    # The log is rotated away, but the recorded date keeps the profile for two years
+    assert job.run(today=date(2027, 5, 1))['profiles_expired'] == 0
+    assert job.run(today=date(2027, 6, 1))['profiles_expired'] == 1
@@ -0,0 +1,47 @@
+import json
+import pytest
+from backend.api.deals_api import create_app
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.scraping.pipeline import normalize_store_deals
+
+@pytest.fixture
+def client_and_matcher(tmp_path):
+    (tmp_path / "user_anna.json").write_text(json.dumps({'preferred_stores': ['kiwi']}), encoding='utf-8')
+    deals = normalize_store_deals('kiwi', [Deal(product='Melk 1 l', price=19.9), Deal(product='Egg 12 stk', price=42.0)])
+    matcher = DealMatcher(DealSnapshot(deals), profiles_dir=tmp_path)
+    return create_app(matcher).test_client(), matcher
+
+def test_deals_are_served_with_etag_and_revalidated(client_and_matcher):
+    client, matcher = client_and_matcher
+    first = client.get('/users/anna/deals')
+    assert first.status_code == 200
+    assert [d['product'] for d in first.get_json()] == ['Melk 1 l', 'Egg 12 stk']
+
+    etag = first.headers['ETag']
+    assert client.get('/users/anna/deals', headers={'If-None-Match': etag}).status_code == 304
+
+    # A new snapshot version invalidates the cached response
+    matcher.on_store_deals('kiwi', normalize_store_deals('kiwi', [Deal(product='Ost', price=59.0)]))
+    fresh = client.get('/users/anna/deals', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert [d['product'] for d in fresh.get_json()] == ['Ost']
+
+def test_basket_and_unknown_user(client_and_matcher):
+    client, _ = client_and_matcher
+    basket = client.get('/users/anna/basket?items=melk,egg').get_json()
+    assert basket['stores'] == ['kiwi'] and basket['coverage'] == 1.0
+    assert client.get('/users/nobody/deals').status_code == 404
+    assert client.get('/users/anna/basket').status_code == 400
+
+def test_similar_deals(client_and_matcher):
+    client, _ = client_and_matcher
+    similar = client.get('/users/anna/similar?q=lettmelk').get_json()
+    assert [d['product'] for d in similar] == ['Melk 1 l'] and 0 < similar[0]['similarity'] < 1
+    assert client.get('/users/anna/similar').status_code == 400
+
+def test_unknown_routes_and_methods_keep_their_status(client_and_matcher):
+    client, _ = client_and_matcher
+    assert client.get('/nope').status_code == 404
+    assert client.post('/health').status_code == 405
@@ -0,0 +1,61 @@
+import multiprocessing
+import time
+from backend.processing.deal import Deal
+from backend.scraping.distributed_scrape import ScrapeCoordinator, ScrapeWorker, SnapshotStore
+from backend.scraping.job_queue import JobQueue
+from utilities.record_stream import RecordWriter, read_records
+
+JOB_SECONDS = 0.25  # Stands in for downloading one avis; long enough that process start-up does not dominate
+
+def _fake_scrape(job):
+    time.sleep(JOB_SECONDS)
+    first = job.page_start or 1
+    return [Deal(store=job.store, product=f"Vare side {page}", price=10.0 + page)
+            for page in range(first, (job.page_end or 1) + 1)]
+
+def _worker_process(db_path, store_dir, worker_id):
+    ScrapeWorker(JobQueue(db_path), SnapshotStore(store_dir), _fake_scrape, worker_id).run()
+
+def test_batch_is_shared_between_worker_processes(tmp_path):
+    db_path, store_dir = tmp_path / "queue.sqlite3", tmp_path / "results"
+    coordinator = ScrapeCoordinator(JobQueue(db_path), SnapshotStore(store_dir))
+    batch = coordinator.submit([f"store{i}" for i in range(16)])
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_worker_process, args=(db_path, store_dir, f"w{i}")) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert coordinator.wait(batch, timeout=1) == {'pending': 0, 'leased': 0, 'done': 16, 'failed': 0}
+    workers = coordinator.queue.batch_workers(batch)
+    # Every job was done once, and by more than one process
+    assert sum(workers.values()) == 16 and len(workers) > 1 and set(workers) <= {'w0', 'w1', 'w2', 'w3'}
+
+def test_expired_lease_is_reclaimed_and_failures_retry(tmp_path):
+    queue = JobQueue(tmp_path / "queue.sqlite3", lease_seconds=0.05, max_attempts=2, retry_backoff=0)
+    store = SnapshotStore(tmp_path / "results")
+    coordinator = ScrapeCoordinator(queue, store)
+    batch = coordinator.submit(['kiwi', 'rema'], pages={'kiwi': [(1, 2), (3, 4)]})
+
+    # A worker claims a kiwi job and dies without finishing it
+    abandoned = queue.claim('crashed-worker')
+    time.sleep(0.1)
+
+    def flaky(job):
+        if job.store == 'rema':
+            raise ConnectionError("rema.no timed out")
+        return _fake_scrape(job)
+    ScrapeWorker(queue, store, flaky, 'survivor').run()
+
+    assert queue.batch_status(batch) == {'pending': 0, 'leased': 0, 'done': 2, 'failed': 1}
+    assert not queue.complete(abandoned, 'crashed-worker', 'late result')
+    assert queue.batch_workers(batch) == {'survivor': 2}
+    [(failed_job, error)] = queue.batch_errors(batch)
+    assert (failed_job.store, failed_job.attempts, error) == ('rema', 2, "rema.no timed out")
+
+    path = tmp_path / "deals_merged.ndjson"
+    with RecordWriter(path) as writer:
+        merged = coordinator.merge(batch, writer)
+    assert sorted(deal.product for deal in merged['kiwi']) == [f"Vare side {p}" for p in range(1, 5)]
+    assert len({record['deal_id'] for record in read_records(path)}) == 4
@@ -0,0 +1,101 @@
+import socket
+import threading
+import pytest
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.processing.regions import RegionRegistry
+from backend.scraping.pipeline import normalize_store_deals
+from frontend import onboarding
+from utilities.email_alert import AlertDispatcher, SMTPConnectionPool, SentAlertLedger
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+N_USERS = 300
+
+
+class _CountingHandler:
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages.append(envelope)
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server():
+    handler = _CountingHandler()
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def _matches(user_index, price=19.9):
+    return [{'deal_id': f"deal-{user_index % 7}-{n}", 'product': f"Vare {n}", 'price': price,
+             'store': 'kiwi', 'recommendation_reason': 'good value'} for n in range(5)]
+
+
+def _dispatcher(controller, tmp_path):
+    pool = SMTPConnectionPool(host=controller.hostname, port=controller.port, size=4)
+    return AlertDispatcher(pool=pool, ledger=SentAlertLedger(tmp_path / "sent.sqlite3"),
+                           resolve_email=lambda user_id: f"{user_id}@example.no")
+
+
+def test_digests_are_batched_and_deduplicated(smtp_server, tmp_path):
+    controller, handler = smtp_server
+    dispatcher = _dispatcher(controller, tmp_path)
+
+    for i in range(N_USERS):
+        dispatcher.collect(f"user{i}", _matches(i))
+    stats = dispatcher.dispatch()
+    print(f"\n{stats['sent']} digests in {stats['seconds']:.2f}s = {stats['messages_per_second']:.0f} messages/sec")
+    assert stats['sent'] == N_USERS == len(handler.messages)
+
+    # Same deals again: nothing new to say
+    for i in range(N_USERS):
+        dispatcher.collect(f"user{i}", _matches(i))
+    assert dispatcher.dispatch()['skipped'] == N_USERS
+
+    # A price change is a new deal version
+    dispatcher.collect("user0", _matches(0, price=14.9))
+    assert dispatcher.dispatch()['sent'] == 1
+    dispatcher.close()
+    assert len(handler.messages) == N_USERS + 1
+
+
+def test_one_digest_per_user(smtp_server, tmp_path):
+    controller, handler = smtp_server
+    dispatcher = _dispatcher(controller, tmp_path)
+    dispatcher.collect("user1", _matches(1)[:2])
+    dispatcher.collect("user1", _matches(1)[2:])
+    dispatcher.dispatch()
+    dispatcher.close()
+    assert len(handler.messages) == 1
+    assert "5 nye tilbud" in handler.messages[0].content.decode('utf-8')
+
+
+def test_onboarded_users_with_an_address_get_a_digest(smtp_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(onboarding, 'USER_PROFILES_DIR', tmp_path)
+    for userid, address in (("20250601120000", "kari@example.no"), ("20250601120001", None)):
+        user = onboarding.DagligdagsOnboarding()
+        user.userid = userid
+        user.answers = {'prisfokus': 4, 'butikker': ['Kiwi'], 'matrestriksjoner': [], 'postnummer': '0150',
+                        'transport': 'Går', 'epost': address}
+        user.save_user_profile()
+    deals = normalize_store_deals('kiwi', [{'product': 'Melk', 'price': 19.9}, {'product': 'Egg', 'price': 39.9}])
+    matcher = DealMatcher(DealSnapshot(deals), profiles_dir=tmp_path,
+                          region_registry=RegionRegistry(tmp_path / "regions.json"))
+
+    controller, handler = smtp_server
+    dispatcher = AlertDispatcher(pool=SMTPConnectionPool(host=controller.hostname, port=controller.port, size=2),
+                                 ledger=SentAlertLedger(tmp_path / "sent.sqlite3"), profiles=matcher.features)
+    assert dispatcher.send_digests(matcher)['sent'] == 1
+    assert dispatcher.send_digests(matcher)['skipped'] == 1  # Nothing new since the last digest
+    dispatcher.close()
+    assert [message.rcpt_tos for message in handler.messages] == [["kari@example.no"]]
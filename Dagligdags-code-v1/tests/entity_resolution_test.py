@@ -0,0 +1,35 @@
+from backend.processing.deal import Deal
+from backend.processing.entity_resolution import EntityResolver, normalize_product_name
+
+def test_normalize_splits_brand_and_pack_size():
+    assert normalize_product_name("TINE Lettmelk 1,0% 1 l") == ('lettmelk 1 0', 'tine', '1000ml')
+    assert normalize_product_name("Coca-Cola 6x0,33 l")[2] == '1980ml'
+    assert normalize_product_name("Bananer pr kg") == ('banan', None, '')
+
+def test_resolver_matches_across_stores_and_persists(tmp_path):
+    map_file = tmp_path / "entities.json"
+    resolver = EntityResolver(map_file)
+    deals = [
+        Deal(store='rema', product="TINE Lettmelk 1,0% 1 l"),
+        Deal(store='kiwi', product="Tine lettmelk 1,0 % 1L"),
+        Deal(store='coop', product="Gilde Kjøttdeig 400 g"),
+        Deal(store='oda', product="Tine lettmelk 1,0% 1,75 l"),
+    ]
+    resolver.resolve(deals)
+    milk, milk_kiwi, mince, big_milk = (deal.canonical_id for deal in deals)
+
+    assert milk == milk_kiwi
+    assert len({milk, mince, big_milk}) == 3  # Different products and pack sizes stay apart
+
+    resolver.save()
+    later = [Deal(store='meny', product="Lettmelk 1,0% Tine 1 L")]
+    EntityResolver(map_file).resolve(later)
+    assert later[0].canonical_id == milk
+
+def test_existing_entity_missed_by_blocking_is_not_counted_as_new(tmp_path):
+    resolver = EntityResolver(tmp_path / "entities.json")
+    milk, created = resolver._match_or_create("TINE Lettmelk 1,0% 1 l")
+    assert created
+    resolver._buckets.clear()  # As if no LSH band had collided
+    assert resolver._match_or_create("Tine Lettmelk 1,0 % 1 l") == (milk, False)
+    assert len(resolver.entities) == 1
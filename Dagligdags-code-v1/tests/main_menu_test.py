@@ -0,0 +1,41 @@
+import threading
+from types import SimpleNamespace
+from frontend.main_menu import DealFeed
+
+class _Matcher:
+    """Stands in for DealMatcher: a stream of ranked deals that records how far it was read."""
+
+    def __init__(self, n_deals, fail_after=None):
+        self.snapshot = SimpleNamespace(version=1)
+        self.n_deals = n_deals
+        self.fail_after = fail_after
+        self.produced = 0
+
+    def iter_current_deals(self, userid):
+        for i in range(self.n_deals):
+            if i == self.fail_after:
+                raise RuntimeError("ranking failed")
+            self.produced += 1
+            yield {'deal_id': str(i), 'product': f"Vare {i}"}
+
+def test_pages_are_produced_lazily_one_page_ahead():
+    matcher = _Matcher(100)
+    feed = DealFeed(matcher, 'anna', page_size=10)
+    assert [deal['deal_id'] for deal in feed.page(0, timeout=5)] == [str(i) for i in range(10)]
+    assert feed.page(1, timeout=5)[0]['deal_id'] == '10'
+    feed._worker.join(timeout=0.2)
+    assert matcher.produced <= 30 and not feed.exhausted  # Read up to one page past page 1
+
+def test_feed_ends_with_a_short_last_page():
+    feed = DealFeed(_Matcher(15), 'anna', page_size=10)
+    assert len(feed.page(1, timeout=5)) == 5
+    assert feed.page(2, timeout=5) is None and feed.exhausted and feed.error is None
+
+def test_producer_errors_end_the_feed_instead_of_blocking():
+    feed = DealFeed(_Matcher(100, fail_after=12), 'anna', page_size=10)
+    assert len(feed.page(0, timeout=5)) == 10
+    done = threading.Event()
+    result = []
+    threading.Thread(target=lambda: (result.append(feed.page(1)), done.set()), daemon=True).start()
+    assert done.wait(5)  # page() without a timeout returns once the producer has failed
+    assert result == [None] and feed.exhausted and isinstance(feed.error, RuntimeError)
@@ -0,0 +1,139 @@
+import json
+import os
+import random
+import pytest
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import PLANS_DIR, DealMatcher, _InterestIndex
+from backend.processing.scoring_plan import ScoringPlan, render_reasons
+from backend.scraping.pipeline import normalize_store_deals
+
+STORES = ['coop', 'rema', 'kiwi', 'meny', 'oda']
+CATEGORIES = ['meat', 'dairy', 'vegetables', 'bakery']
+
+PROFILES = {
+    'vegetarian': {'diet': ['vegetarian'], 'preferred_stores': ['kiwi'], 'organic_preference': 5},
+    'member': {'loyalty_memberships': ['coop_medlem'], 'price_sensitivity': 5, 'pantry_type': 'high_protein'},
+    'vegan': {'diet': ['vegan'], 'cuisine_preferences': ['thai'], 'sustainability_importance': 4},
+}
+
+def _store_deals(rng, store, n):
+    deals = [{
+        'product': f"{store} vare {rng.randrange(3 * n)}",
+        'price': round(rng.uniform(5, 150), 2),
+        'product_category': rng.choice(CATEGORIES),
+        'organic': rng.random() < 0.2,
+        'cuisine_type': rng.choice(['', '', 'thai', 'italian']),
+        'protein_content': rng.randrange(0, 35),
+        'sustainability_score': rng.randrange(0, 11),
+    } for _ in range(n)]
+    return normalize_store_deals(store, deals)
+
+@pytest.fixture
+def matcher(monkeypatch):
+    rng = random.Random(7)
+    snapshot = DealSnapshot([deal for store in STORES for deal in _store_deals(rng, store, 80)])
+    matcher = DealMatcher(snapshot)
+    monkeypatch.setattr(matcher, '_load_user_profile', lambda user_id: PROFILES.get(user_id, {}))
+    return matcher
+
+def _ranking(deals):
+    return [(round(d['match_score'], 9), d['deal_id']) for d in deals]
+
+def test_delta_rescoring_matches_full_recompute(matcher):
+    rng = random.Random(11)
+    for user_id in PROFILES:
+        matcher.find_current_deals(user_id)
+
+    for _ in range(12):
+        store = rng.choice(STORES)
+        matcher.on_store_deals(store, _store_deals(rng, store, rng.randrange(20, 120)))
+
+        for user_id, profile in PROFILES.items():
+            cached = matcher.find_current_deals(user_id)
+            full = matcher.find_personalized_deals(user_id, matcher.snapshot.values())
+            assert sorted(_ranking(cached), reverse=True)[:40] == sorted(_ranking(full), reverse=True)[:40]
+
+def test_interest_index_follows_cache_changes(matcher):
+    rng = random.Random(5)
+    for user_id in PROFILES:
+        matcher.find_current_deals(user_id)
+    for _ in range(8):
+        store = rng.choice(STORES)
+        matcher.on_store_deals(store, _store_deals(rng, store, rng.randrange(20, 120)))
+        for user_id in rng.sample(list(PROFILES), 2):
+            matcher.find_current_deals(user_id)
+
+        fresh = _InterestIndex()
+        for user_id, cache in matcher._topk.items():
+            fresh.put(user_id, cache)
+        assert matcher._interest._keys  # Kept from earlier deltas, not rebuilt per delta
+        for key in matcher._interest._keys:
+            for bound in (-1.0, 0.0, 2.5, 5.0, 10.0):
+                assert matcher._interest.users(key, bound) == fresh.users(key, bound)
+
+def test_profile_change_forces_full_rescore(matcher, monkeypatch):
+    first = matcher.find_current_deals('member')
+    changed = {**PROFILES['member'], 'preferred_stores': ['oda']}
+    monkeypatch.setattr(matcher, '_load_user_profile', lambda user_id: changed)
+    second = matcher.find_current_deals('member')
+    assert _ranking(first) != _ranking(second)
+    assert matcher._topk['member'].plan.store_bonus('oda') > 0
+
+def test_scoring_plan_round_trips_and_skips_inactive_rules():
+    profile = {**PROFILES['vegan'], 'allergies': ['gluten'], 'loyalty_memberships': ['ae_rema']}
+    plan = ScoringPlan.compile(profile)
+    names = [name for name, _ in plan.specs]
+    assert 'organic' not in names and 'price_sensitive' not in names
+    restored = ScoringPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    deal = {'product': 'Tofu', 'price': 30.0, 'store': 'rema', 'cuisine_type': 'Thai',
+            'product_category': 'dairy', 'allergens': ['gluten'], 'sustainability_score': 8}
+    deal = Deal.from_dict(deal)
+    assert restored.evaluate(deal) == plan.evaluate(deal)
+    assert render_reasons(plan.evaluate(deal)[1], deal) == "perfect for Thai cooking"
+
+def test_compiled_plans_are_stored_beside_the_untouched_profile(tmp_path, monkeypatch):
+    # An unknown store keeps the profile out of the feature store, so its plan is worth storing
+    profile = tmp_path / "user_anna.json"
+    profile.write_text(json.dumps({'preferred_stores': ['lidl'], 'organic_preference': 5}, indent=4), encoding='utf-8')
+    os.utime(profile, ns=(0, 10 ** 18))
+    before = (profile.read_bytes(), profile.stat().st_mtime_ns)
+    DealMatcher(DealSnapshot([]), profiles_dir=tmp_path).find_current_deals('anna')
+    assert (profile.read_bytes(), profile.stat().st_mtime_ns) == before
+    assert json.loads((tmp_path / PLANS_DIR / "user_anna.json").read_text())['fingerprint']
+
+    monkeypatch.setattr(ScoringPlan, 'compile', lambda profile: pytest.fail("stored plan was not reused"))
+    DealMatcher(DealSnapshot([]), profiles_dir=tmp_path).find_current_deals('anna')
+
+def test_reasons_are_a_mask_rendered_once_per_combination():
+    plan = ScoringPlan.compile({'organic_preference': 5, 'price_sensitivity': 5, 'cuisine_preferences': ['thai']})
+    first = Deal(product='Kokosmelk', price=20.0, organic=True, discount_percentage=30.2, cuisine_type='Thai')
+    second = Deal(product='Risnudler', price=25.0, organic=True, discount_percentage=29.8, cuisine_type='Thai')
+    mask = plan.evaluate(first)[1]
+    assert isinstance(mask, int) and mask == plan.evaluate(second)[1]
+    text = render_reasons(mask, first)
+    assert text == "matches your organic preference, 30% discount, perfect for Thai cooking"
+    assert render_reasons(mask, second) is text
+    assert render_reasons(plan.evaluate(Deal(product='Salt', price=10.0))[1], first) == "good value"
+
+def test_users_with_the_same_plan_share_one_ranking(monkeypatch):
+    rng = random.Random(5)
+    locations = {store: (59.9 + rng.uniform(-0.1, 0.1), 10.7 + rng.uniform(-0.1, 0.1)) for store in STORES}
+    deals = [deal for store in STORES for deal in _store_deals(rng, store, 200)]
+    for deal in deals:
+        deal.store_location = locations[deal.store]
+    matcher = DealMatcher(DealSnapshot(deals))
+    # Different answers, same rules: organic 4 and 5 both pass the >= 4 threshold
+    profiles = {f"u{i}": {'organic_preference': 4 + i % 2, 'preferred_stores': ['kiwi'], 'transport_mode': 'cycling'}
+                for i in range(30)}
+    profiles['vegan'] = PROFILES['vegan']
+    monkeypatch.setattr(matcher, '_load_user_profile', lambda user_id: profiles[user_id])
+    user_locations = {f"u{i}": (59.9 + rng.uniform(-0.1, 0.1), 10.7) for i in range(0, 30, 3)}
+
+    results, summary = matcher.find_current_deals_batch(profiles, user_locations)
+    assert summary['users'] == 31 and summary['cohorts'] == 2 and summary['cohort_sizes'] == {1: 1, 30: 1}
+    assert summary['deals_scored'] < summary['deals_scored_unshared'] / 10
+    for user_id in profiles:
+        full = matcher.find_personalized_deals(user_id, matcher.snapshot.values(), user_locations.get(user_id))
+        # Equal scores may tie at the cut-off, so compare the scores
+        assert [score for score, _ in _ranking(results[user_id])] == [score for score, _ in _ranking(full)]
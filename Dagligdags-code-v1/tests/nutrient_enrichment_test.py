@@ -0,0 +1,68 @@
+import json
+import os
+from backend.processing.deal import Deal
+from backend.processing.nutrient_enrichment import NutrientEnricher
+from backend.processing.scoring_plan import ScoringPlan
+
+FOOD_DB = {
+    'norwegian_foods': [
+        {'name': 'kylling', 'norwegian_name': 'kylling', 'category': 'meat', 'protein_per_100g': 31,
+         'sustainability_score': 6, 'local_availability': True},
+        {'name': 'melk', 'norwegian_name': 'melk', 'category': 'dairy', 'protein_per_100g': 3.4,
+         'local_availability': True},
+    ],
+    'international_foods': [
+        {'english_name': 'avocado', 'nutrients': {'protein_g': 2.0}, 'source': 'usda'},
+    ],
+}
+
+def test_enrich_batch_and_reuse_cached_lookups(tmp_path):
+    db_file = tmp_path / "food_db_20250101_000000.json"
+    db_file.write_text(json.dumps(FOOD_DB), encoding='utf-8')
+    cache_file = tmp_path / "lookup_cache.json"
+
+    deals = [Deal(product="Kyllingfilet 400 g"), Deal(product="Tine Lettmelk 1 l"),
+             Deal(product="Avocados 2 stk"), Deal(product="Sjokolade", protein_content=7)]
+    enricher = NutrientEnricher(db_file, cache_file)
+    enricher.enrich(deals)
+    enricher.save()
+
+    chicken, milk, avocado, chocolate = deals
+    assert (chicken.protein_content, chicken.sustainability_score) == (31, 6)
+    assert chicken.product_category == 'meat'
+    assert not chicken.local  # Sold in Norway is not the same as locally produced
+    assert milk.protein_content == 3.4 and milk.sustainability_score is None
+    assert avocado.protein_content == 2.0  # Fuzzy match on the English name
+    assert chocolate.protein_content == 7 and not chocolate.local
+
+    cached = NutrientEnricher(db_file, cache_file)
+    assert cached._cache == enricher._cache
+    assert cached.enrich([Deal(product="Kyllingfilet 400 g")])[0].protein_content == 31
+
+def test_unknown_sustainability_scores_neutral():
+    plan = ScoringPlan.compile({'sustainability_importance': 5})
+    unknown = Deal(product='Sjokolade')
+    average = Deal(product='Sjokolade', sustainability_score=5)
+    green = Deal(product='Sjokolade', sustainability_score=8)
+    assert plan.evaluate(unknown) == plan.evaluate(average)
+    assert plan.evaluate(green)[0] > plan.evaluate(unknown)[0]
+    assert 'sustainability_score' not in unknown.to_dict()
+
+
+def test_refresh_switches_to_a_newer_food_db(tmp_path):
+    old_db = tmp_path / "food_db_20250101_000000.json"
+    old_db.write_text(json.dumps(FOOD_DB), encoding='utf-8')
+    cache_file = tmp_path / "lookup_cache.json"
+    enricher = NutrientEnricher(old_db, cache_file)
+    assert not enricher.refresh()
+    assert enricher.enrich([Deal(product="Kyllingfilet 400 g")])[0].protein_content == 31
+
+    newer = {'norwegian_foods': [{'name': 'kylling', 'category': 'meat', 'protein_per_100g': 24}]}
+    new_db = tmp_path / "food_db_20250102_000000.json"
+    new_db.write_text(json.dumps(newer), encoding='utf-8')
+    os.utime(new_db, (old_db.stat().st_mtime + 60, old_db.stat().st_mtime + 60))
+    assert enricher.refresh() and enricher.food_db_file == new_db
+    assert enricher.enrich([Deal(product="Kyllingfilet 400 g")])[0].protein_content == 24
+    assert json.loads(cache_file.read_text(encoding='utf-8'))['food_db'] == old_db.name  # Saved before switching
+    enricher.save()
+    assert json.loads(cache_file.read_text(encoding='utf-8'))['food_db'] == new_db.name
@@ -0,0 +1,93 @@
+import pypdfium2
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from backend.scraping import newsletter_scraper
+from backend.scraping.newsletter_scraper import NewsletterScraper
+from backend.scraping.ocr import OCR_VERSION, PageOcr, ocr_available, page_digest, render_pages
+from utilities.spill_buffer import SpillBuffer
+
+def _text_pdf(path, lines):
+    """A one-page PDF with a real text layer."""
+    content = "BT /F1 14 Tf 72 720 Td 18 TL " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R"
+        " /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+def _scanned_avis(tmp_path):
+    """Page 1 has a text layer, page 2 is only an image."""
+    _text_pdf(tmp_path / "text.pdf", ["Kyllingfilet 400 g 89,90 kr", "Lettmelk 1 l 19,90 kr"])
+    image = Image.new('L', (1240, 1754), 255)
+    ImageDraw.Draw(image).text((100, 100), "Laks 129,00 kr", fill=0, font=ImageFont.load_default(size=48))
+    image.save(tmp_path / "scan.pdf", resolution=150)
+    pdf = pypdfium2.PdfDocument(tmp_path / "text.pdf")
+    pdf.import_pages(pypdfium2.PdfDocument(tmp_path / "scan.pdf"))
+    pdf.save(tmp_path / "avis.pdf")
+    return str(tmp_path / "avis.pdf")
+
+def test_only_image_pages_are_ocrd_and_cached_text_is_reused(tmp_path):
+    path = _scanned_avis(tmp_path)
+    scraper = NewsletterScraper()
+    scraper.ocr = PageOcr(tmp_path / "cache")
+
+    # A re-published avis: page 2 was OCR'd before, under the same image hash
+    [(_, pixels, size)] = render_pages(path, [2])
+    scraper.ocr._store(page_digest(pixels, size), "Laks 129,00 kr\n")
+
+    deals = scraper._parse_pdf(path)
+    assert [(deal.product, deal.price) for deal in deals] == [
+        ('Kyllingfilet 400 g', 89.9), ('Lettmelk 1 l', 19.9), ('Laks', 129.0)]
+    assert scraper.ocr.stats == {'pages': 1, 'cache_hits': 1, 'recognized': 0}
+
+def test_avis_with_pages_left_unread_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(newsletter_scraper, 'PDF_PARSE_CACHE_DIR', tmp_path / "parsed_cache")
+    monkeypatch.setattr('backend.scraping.ocr.ocr_available', lambda: False)
+    path = _scanned_avis(tmp_path)
+    scraper = NewsletterScraper()
+    scraper.ocr = PageOcr(tmp_path / "cache")
+
+    def parse():
+        buffer = SpillBuffer()
+        with open(path, 'rb') as f:
+            buffer.write(f.read())
+        return scraper.parse_store_payload({'store': 'rema', 'kind': 'pdf', 'pdf': buffer})
+
+    # Without Tesseract the scanned page is skipped, so the next scrape must read the avis again
+    assert [deal.product for deal in parse()] == ['Kyllingfilet 400 g', 'Lettmelk 1 l']
+    assert not (tmp_path / "parsed_cache").exists()
+    assert scraper.ocr.stats['pages'] == 1
+
+    # Once the page has text, the whole avis is cached under the parser and OCR versions
+    [(_, pixels, size)] = render_pages(path, [2])
+    scraper.ocr._store(page_digest(pixels, size), "Laks 129,00 kr\n")
+    assert [deal.product for deal in parse()] == ['Kyllingfilet 400 g', 'Lettmelk 1 l', 'Laks']
+    [cached] = (tmp_path / "parsed_cache").iterdir()
+    assert f"_v{newsletter_scraper.PARSER_VERSION}.{OCR_VERSION}" in cached.name
+    assert [deal.product for deal in parse()] == ['Kyllingfilet 400 g', 'Lettmelk 1 l', 'Laks']
+    assert scraper.ocr.stats['pages'] == 2
+
+@pytest.mark.skipif(not ocr_available(), reason="tesseract is not installed")
+def test_tesseract_reads_a_scanned_page(tmp_path):
+    path = _scanned_avis(tmp_path)
+    ocr = PageOcr(tmp_path / "cache", workers=2)
+    try:
+        first = ocr.recognize(path, [2])
+        second = ocr.recognize(path, [2])
+    finally:
+        ocr.close()
+    assert "129,00" in first[2] and second == first
+    assert ocr.stats == {'pages': 2, 'cache_hits': 1, 'recognized': 1}
@@ -0,0 +1,45 @@
+import time
+from backend.scraping.pipeline import PipelineSource, ScrapePipeline, normalize_store_deals
+
+def _source(name, delay, deals):
+    def fetch():
+        time.sleep(delay)
+        return deals
+    return PipelineSource(name=name, fetch=fetch, parse=lambda raw: list(raw))
+
+def test_pipeline_streams_each_store_downstream():
+    persisted, rescored = {}, []
+    sources = [
+        _source('kiwi', 0.0, [{'product': 'Melk', 'price': 19.9}]),
+        _source('coop', 0.3, [{'product': 'Ost', 'price': 89.0}]),
+    ]
+    pipeline = ScrapePipeline(
+        sources,
+        persist=lambda source, deals: persisted.setdefault(source.name, deals),
+        rescore=lambda source, deals: rescored.append((source.name, time.perf_counter())),
+    )
+    started = time.perf_counter()
+    stats = pipeline.run()
+
+    assert set(persisted) == {'kiwi', 'coop'}
+    assert persisted['kiwi'][0].store == 'kiwi'
+    assert stats['coop']['records'] == 1
+    # The fast store reaches rescoring before the slow one has been fetched
+    assert rescored[0][0] == 'kiwi'
+    assert rescored[0][1] - started < 0.25
+
+def test_pipeline_isolates_failing_source():
+    def broken():
+        raise RuntimeError("timeout")
+    sources = [
+        PipelineSource(name='meny', fetch=broken, parse=list),
+        _source('oda', 0.0, [{'product': 'Egg', 'price': 39.0}]),
+    ]
+    persisted = {}
+    stats = ScrapePipeline(sources, persist=lambda s, d: persisted.update({s.name: d})).run()
+    assert 'fetch' in stats['meny']['error']
+    assert list(persisted) == ['oda']
+
+def test_duplicate_products_get_distinct_ids():
+    deals = normalize_store_deals('rema', [{'product': 'Kyllingfilet'}, {'product': 'kyllingfilet '}])
+    assert deals[0].deal_id != deals[1].deal_id
@@ -0,0 +1,82 @@
+import json
+import os
+import pytest
+from backend.processing import match_algorithm
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.processing.profile_store import (RECORD_SIZE, ProfileFeatureStore, decode_record, encode_profile,
+                                              profile_preferences)
+from backend.processing.regions import RegionRegistry
+from backend.processing.scoring_plan import ScoringPlan
+from backend.scraping.pipeline import normalize_store_deals
+from frontend import onboarding
+from frontend.onboarding import DagligdagsOnboarding
+
+PROFILES = [
+    {'diet': ['vegetarian'], 'preferred_stores': ['kiwi'], 'organic_preference': 5},
+    {'loyalty_memberships': ['Coop_Medlem'], 'price_sensitivity': 5, 'pantry_type': 'high_protein', 'max_distance': 2.5},
+    {'diet': ['vegan'], 'cuisine_preferences': ['Thai'], 'sustainability_importance': 4, 'transport_mode': 'cycling'},
+    {'answers': {'allergies': ['lactose'], 'diet': ['none'], 'postnummer': '5003', 'package_preference': 'bulk'}},
+    {},
+]
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_records_compile_to_the_same_plan(profile):
+    preferences = profile_preferences(profile)
+    record = encode_profile("user_1", preferences, 42)
+    assert len(record) == RECORD_SIZE
+    version, decoded = decode_record(record)
+    assert version == 42
+    assert ScoringPlan.compile(decoded).specs == ScoringPlan.compile(preferences).specs
+    assert decoded.get('max_distance') == preferences.get('max_distance')
+
+def test_profiles_outside_the_vocabularies_keep_their_json():
+    assert encode_profile("u", {'allergies': ['rabarbra']}, 1) is None
+    assert encode_profile("u", {'organic_preference': 4.5}, 1) is None
+    assert encode_profile("u" * 40, {}, 1) is None
+
+def test_onboarding_answers_are_compiled_and_read_without_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(onboarding, 'USER_PROFILES_DIR', tmp_path)
+    user = DagligdagsOnboarding()
+    user.userid = "20250601120000"
+    user.answers = {'prisfokus': 5, 'butikker': ['Rema 1000', 'Oda'], 'matrestriksjoner': ['Vegan', 'Glutenfri'],
+                    'postnummer': '7030', 'transport': 'Levering'}
+    user.save_user_profile()
+
+    deals = normalize_store_deals('rema', [{'product': 'Tofu', 'price': 30.0, 'allergens': ['soy']},
+                                           {'product': 'Brød', 'price': 25.0, 'allergens': ['gluten']}])
+    matcher = DealMatcher(DealSnapshot(deals), profiles_dir=tmp_path,
+                          region_registry=RegionRegistry(tmp_path / "regions.json"))
+    monkeypatch.setattr(match_algorithm.json, 'load', lambda f: pytest.fail("profile JSON was parsed"))
+    preferences = matcher._load_user_profile(user.userid)
+    assert preferences['preferred_stores'] == ['rema', 'oda'] and preferences['transport_mode'] == 'delivery'
+    assert preferences['region'] == 'midt-norge' and preferences['allergies'] == ['gluten']
+    assert [deal['product'] for deal in matcher.find_current_deals(user.userid)] == ['Tofu']
+
+def test_edited_profiles_are_recompiled_and_compaction_drops_stale_records(tmp_path):
+    path = tmp_path / "user_anna.json"
+    path.write_text(json.dumps({'preferred_stores': ['kiwi']}), encoding='utf-8')
+    matcher = DealMatcher(DealSnapshot([]), profiles_dir=tmp_path)
+    assert matcher._load_user_profile("anna")['preferred_stores'] == ['kiwi']  # Compiled on first read
+
+    path.write_text(json.dumps({'preferred_stores': ['meny']}), encoding='utf-8')
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1))
+    assert matcher._load_user_profile("anna")['preferred_stores'] == ['meny']
+    (tmp_path / "user_bo.json").write_text(json.dumps({'organic_preference': 5}), encoding='utf-8')
+    matcher._load_user_profile("bo")
+    (tmp_path / "user_bo.json").unlink()
+
+    store = ProfileFeatureStore(tmp_path)
+    assert store.compact() == 2  # anna's first record, and bo's
+    assert (tmp_path / "profile_features.bin").stat().st_size == RECORD_SIZE
+    assert store.get("anna", path.stat().st_mtime_ns)['preferred_stores'] == ['meny']
+    assert matcher._load_user_profile("anna")['preferred_stores'] == ['meny']  # Other handles see the new file
+
+def test_empty_profiles_are_not_compiled(tmp_path):
+    path = tmp_path / "user_cleo.json"
+    path.write_text("{}", encoding='utf-8')
+    matcher = DealMatcher(DealSnapshot([]), profiles_dir=tmp_path)
+    assert matcher._load_user_profile("cleo") == {}
+    assert matcher._load_user_profile("cleo") == {}  # Still read from the JSON, not a record
+    assert not ProfileFeatureStore(tmp_path).put("cleo", {}, path.stat().st_mtime_ns)
+    assert not (tmp_path / "profile_features.bin").exists()
@@ -0,0 +1,62 @@
+import json
+import time
+from datetime import date, timedelta
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.price_history import PriceHistory
+from backend.processing.purchase_planner import PlanItem, PurchasePlanner
+from backend.scraping.pipeline import normalize_store_deals
+
+TODAY = date(2025, 6, 4)  # Wednesday of the week starting 2025-06-02
+WEEK0 = date(2025, 6, 2)
+
+def _history(tmp_path, weeks=12):
+    """Kiwi runs kaffe at 60 kr every third week (last in week -2), 90 kr otherwise; Rema is always 85 kr."""
+    history = PriceHistory(tmp_path / "history.sqlite3")
+    for week in range(-weeks, 0):
+        day = (WEEK0 + timedelta(weeks=week, days=3)).isoformat()
+        kiwi = 60.0 if (week + 2) % 3 == 0 else 90.0
+        deals = normalize_store_deals('kiwi', [{'product': 'Kaffe filtermalt', 'price': kiwi},
+                                               {'product': 'Lettmelk 1 l', 'price': 20.0}])
+        deals += normalize_store_deals('rema', [{'product': 'Kaffe filtermalt', 'price': 85.0}])
+        history.record(f"deals_{day}.json", day, deals)
+    return history
+
+def test_staples_are_stocked_up_in_forecast_promotion_weeks(tmp_path):
+    planner = PurchasePlanner(_history(tmp_path), today=TODAY)
+    assert planner.forecast.prices('kaffe')['kiwi'] == [90.0, 60.0, 90.0, 90.0]
+
+    plan = planner.plan([PlanItem('kaffe', per_week=1, max_stock=3), PlanItem('melk', per_week=2)])
+    kaffe = [(p['week'], p['store'], p['quantity']) for p in plan['purchases'] if p['item'] == 'kaffe']
+    assert kaffe == [('2025-06-02', 'rema', 1), ('2025-06-09', 'kiwi', 3)]
+    assert plan['total_cost'] == 85 + 180 + 4 * 2 * 20
+    assert plan['baseline_cost'] == 85 + 60 + 85 + 85 + 4 * 2 * 20
+    assert plan['savings'] == 50.0 and plan['unpriced'] == []
+
+def test_store_limits_stock_at_home_and_published_deals(tmp_path):
+    this_week = normalize_store_deals('rema', [{'product': 'Kaffe filtermalt', 'price': 50.0}])
+    for deal in this_week:
+        deal.valid_from, deal.valid_to = '2025-06-02', '2025-06-08'
+    planner = PurchasePlanner(_history(tmp_path), DealSnapshot(this_week), today=TODAY)
+    assert planner.forecast.prices('kaffe')['rema'] == [50.0, 85.0, 85.0, 85.0]
+
+    plan = planner.plan([PlanItem('kaffe', per_week=1, max_stock=3, stock=1), PlanItem('sjokolade')],
+                        stores=['rema'])
+    assert [(p['week'], p['quantity'], p['unit_price']) for p in plan['purchases']] == [('2025-06-02', 3, 50.0)]
+    assert plan['unpriced'] == ['sjokolade']
+
+def test_households_are_planned_in_one_batch_within_budget(tmp_path):
+    profiles = tmp_path / "profiles"
+    profiles.mkdir()
+    for i in range(50):
+        profile = {'staple_foods': ['kaffe, melk'], 'household_size': 1 + i % 4}
+        if i % 2:
+            profile['preferred_stores'] = ['kiwi']
+        (profiles / f"user_{i}.json").write_text(json.dumps(profile), encoding='utf-8')
+    planner = PurchasePlanner(_history(tmp_path, weeks=26), today=TODAY)
+
+    started = time.perf_counter()
+    plans = planner.plan_users(profiles)
+    assert (time.perf_counter() - started) / len(plans) < 0.1
+    assert len(plans) == 50
+    assert {p['store'] for p in plans['1']['purchases']} == {'kiwi'}
+    assert plans['3']['savings'] > plans['0']['savings'] > 0
@@ -0,0 +1,29 @@
+import pytest
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from utilities.compression import zstandard
+from utilities.record_stream import RecordWriter, read_records
+
+@pytest.mark.parametrize('suffix', ['.ndjson', '.ndjson.gz'] + (['.ndjson.zst'] if zstandard else []))
+def test_writer_renames_into_place_and_streams_back(tmp_path, suffix):
+    path = tmp_path / f"deals_20250526_120000{suffix}"
+    with RecordWriter(path) as writer:
+        writer.write({'deal_id': 'a', 'store': 'kiwi', 'product': 'Melk', 'price': 19.9})
+        # Nothing visible under the final name until the writer commits
+        assert not path.exists()
+        writer.write({'deal_id': 'b', 'store': 'rema', 'product': 'Brød', 'price': 29.0})
+
+    assert [r['deal_id'] for r in read_records(path)] == ['a', 'b']
+    assert writer.bytes_written == path.stat().st_size
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+    snapshot = DealSnapshot.load(path)
+    assert sorted(deal.product for deal in snapshot.values()) == ['Brød', 'Melk']
+
+def test_writer_discards_temp_file_on_error(tmp_path):
+    path = tmp_path / "food_db_20250526_120000.ndjson.gz"
+    with pytest.raises(RuntimeError):
+        with RecordWriter(path, default=Deal.to_dict) as writer:
+            writer.write({'deal': Deal(product='Egg')})
+            raise RuntimeError("scrape failed")
+    assert list(tmp_path.iterdir()) == []
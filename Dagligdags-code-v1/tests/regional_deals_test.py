@@ -0,0 +1,94 @@
+import random
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher, _RegionView
+from backend.processing.regions import RegionRegistry, profile_region, region_for_postcode
+from backend.scraping.pipeline import make_deal_id, normalize_store_deals
+
+PROFILES = {
+    'bergen': {'answers': {'postnummer': '5003'}, 'preferred_stores': ['coop'], 'price_sensitivity': 5},
+    'oslo': {'postnummer': '0150', 'preferred_stores': ['coop'], 'price_sensitivity': 5},
+}
+
+
+def _deals(rng, store, label, n, region=''):
+    return normalize_store_deals(store, [{
+        'product': f"{label} vare {i}",
+        'price': round(rng.uniform(5, 150), 2),
+        'discount_percentage': rng.randrange(0, 50),
+        'product_category': rng.choice(['meat', 'dairy']),
+    } for i in range(n)], region)
+
+
+def _matcher(tmp_path, monkeypatch):
+    rng = random.Random(3)
+    snapshot = DealSnapshot(_deals(rng, 'coop', 'nasjonal', 150) + _deals(rng, 'kiwi', 'kiwi', 150)
+                            + _deals(rng, 'coop', 'vestland', 150, 'vestlandet'))
+    registry = RegionRegistry(tmp_path / "regions.json")
+    matcher = DealMatcher(snapshot, region_registry=registry)
+    monkeypatch.setattr(matcher, '_load_user_profile', lambda user_id: PROFILES.get(user_id, {}))
+    return matcher, rng
+
+
+def test_postcodes_map_to_regions():
+    assert region_for_postcode('0150') == 'oslo'
+    assert region_for_postcode(5003) == 'vestlandet'
+    assert region_for_postcode('4010') == 'vestlandet'
+    assert region_for_postcode('9008') == 'nord-norge'
+    assert region_for_postcode('12') == ''
+    assert profile_region(PROFILES['bergen']) == 'vestlandet'
+    assert profile_region({}) == ''
+    assert make_deal_id('coop', 'Melk') != make_deal_id('coop', 'Melk', 'vestlandet')
+
+
+def test_regional_variant_replaces_national_avis(tmp_path, monkeypatch):
+    matcher, _ = _matcher(tmp_path, monkeypatch)
+    new_regions = []
+    matcher.regions.add_listener(new_regions.append)
+
+    bergen = {deal['product'].split()[0] for deal in matcher.iter_current_deals('bergen')}
+    oslo = {deal['product'].split()[0] for deal in matcher.iter_current_deals('oslo')}
+    assert bergen == {'vestland', 'kiwi'}
+    assert oslo == {'nasjonal', 'kiwi'}
+
+    matcher.find_current_deals('bergen')
+    assert new_regions == ['vestlandet', 'oslo']  # Once each, on the region's first user
+    assert RegionRegistry(tmp_path / "regions.json").regions() == ['oslo', 'vestlandet']
+
+
+def test_regional_updates_match_full_recompute(tmp_path, monkeypatch):
+    matcher, rng = _matcher(tmp_path, monkeypatch)
+    for user_id in PROFILES:
+        matcher.find_current_deals(user_id)
+
+    # A fresh vestlandet avis, a new region for rema, then the coop variant is withdrawn
+    updates = [('coop', 'vestland2', 'vestlandet'), ('kiwi', 'kiwi2', ''),
+               ('rema', 'rema', 'vestlandet'), ('coop', 'tom', 'vestlandet')]
+    for store, label, region in updates:
+        deals = [] if label == 'tom' else _deals(rng, store, label, 120, region)
+        matcher.on_store_deals(store, deals, region)
+        for user_id, profile in PROFILES.items():
+            visible = matcher.snapshot.deals_for_region(profile_region(profile))
+            cached = [(round(d['match_score'], 9), d['deal_id']) for d in matcher.find_current_deals(user_id)]
+            full = [(round(d['match_score'], 9), d['deal_id'])
+                    for d in matcher.find_personalized_deals(user_id, visible)]
+            assert sorted(cached, reverse=True)[:40] == sorted(full, reverse=True)[:40]
+
+    # With its variant withdrawn, coop's national avis applies in vestlandet again
+    stores = {(deal['store'], deal.get('region', '')) for deal in matcher.iter_current_deals('bergen')}
+    assert ('coop', '') in stores and ('rema', 'vestlandet') in stores
+
+
+def test_region_views_are_patched_in_place(tmp_path, monkeypatch):
+    matcher, rng = _matcher(tmp_path, monkeypatch)
+    views = {region: matcher._region_view(region) for region in ('oslo', 'vestlandet')}
+    kiwi = _deals(rng, 'kiwi', 'kiwi', 150)
+    for deal in kiwi[:100]:
+        deal.price = round(deal.price * 0.8, 2)  # Changed deals move within the order
+    matcher.on_store_deals('kiwi', kiwi[:100] + _deals(rng, 'kiwi', 'ny kiwi', 20))
+    matcher.on_store_deals('coop', _deals(rng, 'coop', 'vestland', 140, 'vestlandet'), 'vestlandet')
+
+    for region, view in views.items():
+        assert matcher._region_view(region) is view and view.version == matcher.snapshot.version
+        fresh = _RegionView(region, view.version, matcher.snapshot.deals_for_region(region))
+        assert [deal.deal_id for deal in view.deals] == [deal.deal_id for deal in fresh.deals]
+        assert view.bounds == fresh.bounds and sorted(view.stores) == sorted(fresh.stores)
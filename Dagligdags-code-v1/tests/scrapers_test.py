@@ -1,7 +1,27 @@
 import pytest
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.scraping import newsletter_scraper
 from backend.scraping.newsletter_scraper import NewsletterScraper
 
 def test_coop_scraping():
     scraper = NewsletterScraper()
     deals = scraper.scrape_store('coop')
     assert len(deals) > 0, "Coop scraping should return deals"
+
+def test_saved_results_load_back_as_every_scraped_deal(tmp_path, monkeypatch):
+    monkeypatch.setattr(newsletter_scraper, 'PARSED_DATA_DIR', tmp_path)
+    monkeypatch.setattr(newsletter_scraper, 'STORE_URLS', {'kiwi': '', 'rema': ''})
+    scraper = NewsletterScraper()
+    monkeypatch.setattr(scraper, 'scrape_store', lambda store_name: [
+        Deal(product='Lettmelk 1 l', price=19.9), Deal(product='Egg 12 stk', price=42.0),
+        Deal(product='Egg 12 stk', price=39.0)])
+
+    results = scraper.scrape_all_stores()
+
+    [output] = tmp_path.iterdir()
+    snapshot = DealSnapshot.load(output)
+    assert len(snapshot) == 6
+    assert {deal.store for deal in snapshot.values()} == {'kiwi', 'rema'}
+    assert sorted(deal.deal_id for deal in results['kiwi']) == sorted(
+        deal.deal_id for deal in snapshot.values() if deal.store == 'kiwi')
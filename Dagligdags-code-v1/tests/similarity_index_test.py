@@ -0,0 +1,70 @@
+import json
+import random
+import time
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.processing.regions import RegionRegistry
+from backend.processing.similarity_index import SimilarityIndex
+from backend.scraping.pipeline import normalize_store_deals
+
+PRODUCTS = {
+    'kiwi': ['Havremelk 1 l', 'Lettmelk 1 l', 'Kyllingfilet 400 g', 'Sjokolade melk 200 g'],
+    'rema': ['Havredrikk 1 l', 'Kyllingkjøttdeig 400 g', 'Rugbrød'],
+    'meny': ['Økologisk havremelk barista', 'Grovbrød'],
+}
+
+def _snapshot():
+    deals = []
+    for store, products in PRODUCTS.items():
+        deals += normalize_store_deals(store, [{'product': product, 'price': 30.0} for product in products])
+    return DealSnapshot(deals)
+
+def test_nearest_products_across_stores():
+    index = SimilarityIndex(_snapshot().values())
+    hits = [(deal.store, deal.product) for _, deal in index.similar('havremelk', k=3)]
+    assert hits[:2] == [('kiwi', 'Havremelk 1 l'), ('meny', 'Økologisk havremelk barista')]
+    assert [deal.product for _, deal in index.similar('kylling', k=5)][:2] == ['Kyllingfilet 400 g',
+                                                                             'Kyllingkjøttdeig 400 g']
+    assert index.similar('vaskemiddel') == []
+    scores = [score for score, _ in index.similar('melk', k=10)]
+    assert scores == sorted(scores, reverse=True) and all(0.3 <= score <= 1 for score in scores)
+
+def test_snapshot_deltas_update_the_index_in_place(tmp_path):
+    (tmp_path / "user_anna.json").write_text(json.dumps({'preferred_stores': ['kiwi']}), encoding='utf-8')
+    matcher = DealMatcher(_snapshot(), profiles_dir=tmp_path, region_registry=RegionRegistry(tmp_path / "regions.json"))
+    index = matcher.similarity_index()
+    assert [d['product'] for d in matcher.find_similar_deals('anna', 'havredrikk', k=1)] == ['Havredrikk 1 l']
+
+    matcher.on_store_deals('rema', normalize_store_deals('rema', [Deal(product='Havre drikk sjokolade', price=25.0)]))
+    assert matcher.similarity_index() is index and index.version == matcher.snapshot.version
+    assert 'Havredrikk 1 l' not in [d['product'] for d in matcher.find_similar_deals('anna', 'havredrikk')]
+    assert matcher.find_similar_deals('anna', 'havredrikk')[0]['product'] == 'Havre drikk sjokolade'
+
+def test_basket_offers_similar_deals_for_items_no_store_has(tmp_path):
+    (tmp_path / "user_anna.json").write_text('{}', encoding='utf-8')
+    snapshot = _snapshot()
+    matcher = DealMatcher(snapshot, profiles_dir=tmp_path, region_registry=RegionRegistry(tmp_path / "regions.json"))
+    basket = matcher.optimize_shopping_basket('anna', ['havremelk', 'grovbrød', 'vaskemiddel'], snapshot.values())
+    assert basket['stores'] == ['meny'] and basket['coverage'] == 2 / 3
+
+    basket = matcher.optimize_shopping_basket('anna', ['havre drikk', 'lettmelk'], snapshot.values())
+    assert basket['stores'] == ['kiwi', 'rema'] and basket['coverage'] == 1.0
+    [substitute] = [item for item in basket['items'] if 'similarity' in item]
+    assert substitute['item'] == 'havre drikk' and substitute['deal'].product == 'Havredrikk 1 l'
+
+def test_queries_take_milliseconds_on_a_full_catalog():
+    rng = random.Random(7)
+    kinds = ['havre', 'kylling', 'grov', 'lett', 'sjokolade', 'gul', 'laks', 'eple', 'rug', 'kjøtt', 'fiske',
+             'jordbær', 'vanilje', 'kokos', 'mandel', 'hvit', 'sur', 'røkt', 'skinke', 'tomat']
+    foods = ['melk', 'filet', 'brød', 'ost', 'yoghurt', 'pålegg', 'deig', 'juice', 'is', 'kake', 'drikk',
+             'smør', 'suppe', 'pizza', 'boller', 'saus', 'salat', 'pølse', 'gryn', 'kjeks']
+    brands = ['Tine', 'Q', 'Prior', 'Gilde', 'Mills', 'Stabburet', 'First Price', 'Eldorado', 'Synnøve', 'Freia']
+    deals = [Deal(deal_id=str(i), store=f"store{i % 12}", price=10.0,
+                  product=f"{rng.choice(brands)} {rng.choice(kinds)}{rng.choice(foods)} {rng.randint(1, 900)} g")
+             for i in range(20000)]
+    index = SimilarityIndex(deals)
+    started = time.perf_counter()
+    for query in ['havremelk', 'kyllingfilet', 'grovbrød', 'gulost', 'sjokolademelk']:
+        assert index.similar(query)
+    assert (time.perf_counter() - started) / 5 < 0.05
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import threading
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pdfplumber
+import pytest
+import requests
+from backend.scraping import newsletter_scraper
+from backend.scraping.newsletter_scraper import NewsletterScraper
+from utilities.spill_buffer import SpillBuffer
+from ocr_test import _text_pdf
+
+@pytest.fixture
+def avis_bytes(tmp_path):
+    _text_pdf(tmp_path / "avis.pdf", ["Kyllingfilet 400 g 89,90 kr", "Lettmelk 1 l 19,90 kr"])
+    return (tmp_path / "avis.pdf").read_bytes()
+
+@pytest.mark.parametrize('memory_limit', [1 << 20, 256])
+def test_buffer_hashes_while_writing_and_leaves_no_files(avis_bytes, tmp_path, monkeypatch, memory_limit):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / "spill"))
+    os.mkdir(tmp_path / "spill")
+    buffer = SpillBuffer(memory_limit)
+    for i in range(0, len(avis_bytes), 100):
+        buffer.write(avis_bytes[i:i + 100])
+    assert buffer.spilled == (memory_limit < len(avis_bytes))
+    assert buffer.hexdigest() == hashlib.sha256(avis_bytes).hexdigest()
+    assert os.listdir(tmp_path / "spill") == []  # The spill file is unlinked from the start
+
+    first, second = buffer.reader(), buffer.reader()
+    assert first.read(8) == b"%PDF-1.4" and second.read() == avis_bytes
+    with pdfplumber.open(buffer.reader()) as pdf:
+        assert "Kyllingfilet" in pdf.pages[0].extract_text()
+    buffer.close()
+
+def test_download_streams_into_memory_and_identical_pdfs_skip_parsing(avis_bytes, tmp_path, monkeypatch):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(avis_bytes)))
+            self.end_headers()
+            self.wfile.write(avis_bytes)
+        def log_message(self, *args):
+            pass
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/avis.pdf"
+    monkeypatch.setattr(newsletter_scraper, 'PDF_PARSE_CACHE_DIR', tmp_path / "parsed_cache")
+
+    scraper = NewsletterScraper()
+    # The first attempt fails certificate checks; the retry must still deliver the body
+    real_get = scraper.session.get
+    def get(url, verify=True, **kwargs):
+        if verify:
+            raise requests.exceptions.SSLError("certificate verify failed")
+        return real_get(url, verify=verify, **kwargs)
+    monkeypatch.setattr(scraper.session, 'get', get)
+    scraper.verify_ssl = True
+
+    parsed = []
+    read_pages = scraper._read_pages
+    monkeypatch.setattr(scraper, '_read_pages', lambda *args: parsed.append(1) or read_pages(*args))
+    try:
+        runs = [scraper.parse_store_payload({'store': 'rema', 'kind': 'pdf', 'pdf': scraper._download_pdf(url)})
+                for _ in range(2)]
+    finally:
+        server.shutdown()
+    assert [(deal.product, deal.price) for deal in runs[0]] == [('Kyllingfilet 400 g', 89.9), ('Lettmelk 1 l', 19.9)]
+    assert [deal.to_dict() | {'scraped_at': ''} for deal in runs[1]] == \
+           [deal.to_dict() | {'scraped_at': ''} for deal in runs[0]]
+    assert len(parsed) == 1
@@ -0,0 +1,86 @@
+import json
+import logging
+import pytest
+from backend.api.deals_api import create_app
+from backend.api.traffic_replay import (HttpTarget, InProcessTarget, ReplayEvent, amplify, local_api, read_events,
+                                        replay)
+from backend.processing.deal import Deal
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.processing.regions import RegionRegistry
+from backend.scraping.pipeline import normalize_store_deals
+
+@pytest.fixture
+def matcher(tmp_path):
+    for user in ('anna', 'bo'):
+        (tmp_path / f"user_{user}.json").write_text(json.dumps({'preferred_stores': ['kiwi']}), encoding='utf-8')
+    deals = normalize_store_deals('kiwi', [Deal(product='Melk 1 l', price=19.9), Deal(product='Havremelk', price=32.0),
+                                           Deal(product='Egg 12 stk', price=42.0)])
+    return DealMatcher(DealSnapshot(deals), profiles_dir=tmp_path, region_registry=RegionRegistry(tmp_path / "r.json"))
+
+def _log_line(timestamp, user_id, action, details):
+    entry = {'timestamp': timestamp, 'user_id': user_id, 'action': action, 'details': details}
+    return f"{timestamp[:10]} {timestamp[11:19]},000 - user_analytics - INFO - {json.dumps(entry)}\n"
+
+EVENTS = [
+    ReplayEvent(0.0, 'anna', 'deals_viewed', {'location': None}),
+    ReplayEvent(0.05, 'bo', 'basket_requested', {'items': ['melk', 'egg']}),
+    ReplayEvent(0.1, 'anna', 'similar_searched', {'query': 'havremelk'}),
+    ReplayEvent(0.2, 'bo', 'deals_viewed', {'location': [59.91, 10.75]}),
+]
+
+def test_logs_are_read_into_timed_requests(tmp_path):
+    log = tmp_path / "user_analytics_20250602.log"
+    log.write_text(
+        _log_line('2025-06-02T10:00:05.500000', 'bo', 'basket_requested', {'items': ['melk']})
+        + _log_line('2025-06-02T10:00:00.000000', 'anna', 'deals_viewed', {'location': None})
+        + _log_line('2025-06-02T10:00:01.000000', 'anna', 'onboarding_completed', {'diet': ['vegan']})
+        + "2025-06-02 10:00:02,000 - user_analytics - INFO - {not json\n", encoding='utf-8')
+    events, skipped = read_events([log])
+    assert [(e.offset, e.user_id, e.action) for e in events] == [(0.0, 'anna', 'deals_viewed'),
+                                                                 (5.5, 'bo', 'basket_requested')]
+    assert skipped == 2
+
+    copies = amplify(events, 3)
+    assert len(copies) == 6 and all(0 <= e.offset <= 5.5 for e in copies)
+    assert [e.offset for e in copies] == sorted(e.offset for e in copies)
+
+def test_in_process_replay_keeps_the_logged_pace(matcher):
+    report = replay(EVENTS, InProcessTarget(matcher), speedup=2.0, concurrency=2)
+    assert report.requests == 4 and report.errors == 0
+    assert report.wall_seconds >= 0.1  # Last event at 0.2 s, compressed 2x
+    p = report.percentiles()
+    assert 0 < p['p50'] <= p['p95'] <= p['p99']
+    assert report.to_dict()['by_action']['deals_viewed']['requests'] == 2
+
+def test_http_replay_through_a_local_api(matcher):
+    events = EVENTS + [ReplayEvent(0.2, 'nobody', 'deals_viewed', {})]
+    with local_api(matcher) as url:
+        target = HttpTarget(url)
+        assert target.path(events[1]) == "/users/bo/basket?items=melk%2Cegg"
+        report = replay(events, target, speedup=0, concurrency=4)
+    assert report.requests == 5 and report.errors == 1  # The unknown user's 404
+    assert report.throughput > 0
+
+def test_api_requests_are_logged_for_replay(matcher, tmp_path):
+    log = tmp_path / "user_analytics_today.log"
+    handler = logging.FileHandler(log, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    analytics = logging.getLogger("user_analytics")
+    analytics.addHandler(handler)
+    try:
+        client = create_app(matcher).test_client()
+        client.get('/users/anna/deals?lat=59.9&lon=10.7')
+        client.get('/users/bo/basket?items=melk,egg')
+        client.get('/users/anna/similar?q=havremelk')
+    finally:
+        analytics.removeHandler(handler)
+        handler.close()
+
+    events, skipped = read_events([log])
+    assert skipped == 0
+    assert [(e.user_id, e.action, e.details) for e in events] == [
+        ('anna', 'deals_viewed', {'location': [59.9, 10.7]}),
+        ('bo', 'basket_requested', {'items': ['melk', 'egg']}),
+        ('anna', 'similar_searched', {'query': 'havremelk'}),
+    ]
@@ -0,0 +1,26 @@
+import math
+from backend.processing.deal import Deal
+from backend.processing.scoring_plan import base_price_score
+from backend.processing.unit_pricing import apply_unit_prices, parse_quantity
+
+def test_parse_quantity_units_and_multipacks():
+    assert parse_quantity("Kjøttdeig 400 g").amount == 0.4
+    cola = parse_quantity("Coca-Cola 6x0,33 l")
+    assert (round(cola.amount, 2), cola.unit, cola.count) == (1.98, 'l', 6)
+    bananas = parse_quantity("Bananer pr kg")
+    assert bananas.per_unit and bananas.unit == 'kg' and math.isnan(bananas.amount)
+    assert parse_quantity("Sjokolade") is None
+
+def test_apply_unit_prices_fills_columns_and_ranks_by_value():
+    small = Deal(product="Kaffe 250 g", price=49.9)
+    large = Deal(product="Kaffe 1 kg", price=149.0)
+    bananas = Deal(product="Bananer pr kg", price=24.9)
+    unpriced = Deal(product="Sjokolade", price=20.0)
+    apply_unit_prices([small, large, bananas, unpriced])
+
+    assert (small.unit_price, small.price_unit, small.package_size) == (199.6, 'kg', 'small')
+    assert (large.unit_price, large.quantity) == (149.0, 1.0)
+    assert bananas.unit_price == 24.9 and bananas.quantity is None
+    assert unpriced.unit_price is None and unpriced.price_unit == ''
+    # The cheaper pack is the worse value per kilo
+    assert base_price_score(large) > base_price_score(small)
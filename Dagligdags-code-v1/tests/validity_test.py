@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+import pypdfium2
+import pytest
+from backend.processing.deal_snapshot import DealSnapshot
+from backend.processing.match_algorithm import DealMatcher
+from backend.processing.regions import RegionRegistry
+from backend.processing.validity_index import ValidityIndex
+from backend.scraping.newsletter_scraper import NewsletterScraper
+from backend.scraping.pipeline import normalize_store_deals
+from backend.scraping.validity import parse_validity
+from ocr_test import _text_pdf
+
+@pytest.mark.parametrize('text, window', [
+    ("Tilbudene gjelder uke 23", ('2025-06-02', '2025-06-08')),
+    ("Gjelder fra mandag 2. juni til lørdag 7. juni 2025", ('2025-06-02', '2025-06-07')),
+    ("Gjelder 30. mai - 5. juni", ('2025-05-30', '2025-06-05')),
+    ("Gyldig 29.12 - 04.01", ('2024-12-29', '2025-01-04')),
+    ("Prisene gjelder t.o.m. 8. juni", ('', '2025-06-08')),
+    ("Uke 23-24", ('2025-06-02', '2025-06-15')),
+    ("Lettmelk 1 l 19,90 kr  1/2 kg 2.50 - 3.50 kr", None),
+])
+def test_validity_periods_are_read_from_avis_text(text, window):
+    assert parse_validity(text, date(2025, 6, 4)) == window
+
+def test_index_answers_day_queries_and_pops_only_ended_windows():
+    index = ValidityIndex()
+    index.add('a', ('2025-06-02', '2025-06-08'))
+    index.add('b', ('2025-06-02', '2025-06-08'))
+    index.add('c', ('2025-06-09', '2025-06-15'))
+    index.add('d', ('', ''))
+    assert sorted(index.valid_on('2025-06-07')) == ['a', 'b', 'd']
+    assert sorted(index.valid_on('2025-06-09')) == ['c', 'd']
+    index.discard('a', ('2025-06-02', '2025-06-08'))
+    assert index.pop_expired('2025-06-08') == []
+    assert index.pop_expired('2025-06-09') == ['b']
+    assert index.windows() == [('', ''), ('2025-06-09', '2025-06-15')] and len(index) == 2
+
+def _deals(store, products, window):
+    deals = normalize_store_deals(store, [{'product': product, 'price': 20.0} for product in products])
+    for deal in deals:
+        deal.valid_from, deal.valid_to = window
+    return deals
+
+def test_matcher_and_basket_see_only_valid_deals(tmp_path):
+    this_week = _deals('kiwi', ['Melk', 'Egg'], ('2025-06-02', '2025-06-08'))
+    next_week = _deals('rema', ['Melk lett', 'Brød'], ('2025-06-09', '2025-06-15'))
+    today = [date(2025, 6, 7)]
+    matcher = DealMatcher(DealSnapshot(this_week + next_week), profiles_dir=tmp_path,
+                          region_registry=RegionRegistry(tmp_path / "regions.json"), clock=lambda: today[0])
+    (tmp_path / "user_anna.json").write_text('{"price_sensitivity": 4}', encoding='utf-8')
+    assert sorted(deal.product for deal in matcher.snapshot.valid_on('2025-06-14')) == ['Brød', 'Melk lett']
+
+    assert sorted(d['product'] for d in matcher.find_current_deals('anna')) == ['Egg', 'Melk']
+    basket = matcher.optimize_shopping_basket('anna', ['melk'], matcher.snapshot.values())
+    assert basket['stores'] == ['kiwi']
+    version = matcher.snapshot.version
+
+    today[0] = date(2025, 6, 9)  # Sunday passes: last week's avis expires, the new one starts
+    assert sorted(d['product'] for d in matcher.find_current_deals('anna')) == ['Brød', 'Melk lett']
+    assert len(matcher.snapshot) == 2 and matcher.snapshot.version == version + 1
+    assert matcher.optimize_shopping_basket('anna', ['melk'], this_week + next_week)['stores'] == ['rema']
+
+def test_scraped_deals_carry_the_avis_validity(tmp_path):
+    _text_pdf(tmp_path / "avis.pdf", ["Tilbudene gjelder uke 23", "Kyllingfilet 400 g 89,90 kr"])
+    [deal] = NewsletterScraper()._parse_pdf(str(tmp_path / "avis.pdf"))
+    assert deal.product == 'Kyllingfilet 400 g'
+    start, end = date.fromisoformat(deal.valid_from), date.fromisoformat(deal.valid_to)
+    assert start.isocalendar()[1:] == (23, 1) and end - start == timedelta(days=6)
+
+def test_page_range_jobs_get_the_validity_printed_on_the_front_page(tmp_path):
+    _text_pdf(tmp_path / "front.pdf", ["Tilbudene gjelder uke 23", "Kyllingfilet 400 g 89,90 kr"])
+    _text_pdf(tmp_path / "inside.pdf", ["Lettmelk 1 l 19,90 kr", "Norvegia 1 kg 129,00 kr"])
+    pdf = pypdfium2.PdfDocument(tmp_path / "front.pdf")
+    for _ in range(2):
+        pdf.import_pages(pypdfium2.PdfDocument(tmp_path / "inside.pdf"))
+    pdf.save(tmp_path / "avis.pdf")
+    path = str(tmp_path / "avis.pdf")
+
+    scraper = NewsletterScraper()
+    [front] = scraper._parse_pdf(path, (1, 1))
+    inside = scraper._parse_pdf(path, (2, 3))
+    assert [deal.product for deal in inside] == ['Lettmelk 1 l', 'Norvegia 1 kg'] * 2
+    assert {(deal.valid_from, deal.valid_to) for deal in inside} == {(front.valid_from, front.valid_to)}
+    assert front.valid_from and list(scraper._avis_validity.values()) == [(front.valid_from, front.valid_to)]
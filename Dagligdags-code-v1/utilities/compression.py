@@ -0,0 +1,38 @@
+import gzip
+import io
+from pathlib import Path
+from typing import IO
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to gzip archives
+    zstandard = None
+
+# Preferred suffix for new archives
+ARCHIVE_SUFFIX = '.zst' if zstandard is not None else '.gz'
+
+
+def open_compressed(path: Path, mode: str = 'rt') -> IO:
+    """Open a plain, .gz or .zst file by suffix, in text or binary mode.
+
+    Append mode adds a new gzip member / zstd frame, which readers see as a
+    continuation of the same stream.
+    """
+    path = Path(path)
+    text = 't' in mode
+    raw_mode = mode.replace('t', '').replace('b', '') + 'b'
+
+    if path.suffix == '.gz':
+        stream = gzip.open(path, raw_mode, compresslevel=6)
+    elif path.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is not installed, cannot open {path.name}")
+        raw = open(path, raw_mode)
+        if 'r' in raw_mode:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    else:
+        stream = open(path, raw_mode)
+
+    return io.TextIOWrapper(stream, encoding='utf-8') if text else stream
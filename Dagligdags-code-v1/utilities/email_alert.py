@@ -0,0 +1,270 @@
+import hashlib
+import json
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, Iterable, List, Optional
+from config.environment import Config
+from config.paths import SENT_ALERTS_DB
+from backend.processing.profile_store import ProfileFeatureStore, profile_preferences
+from utilities.logger import setup_logger
+
+MAX_DEALS_PER_DIGEST = 10
+
+# Digest templates, compiled once per process by ``_template``
+TEMPLATES = {
+    'subject': "Dagligdags: $count nye tilbud for deg",
+    'body': (
+        "Hei!\n\n"
+        "Vi har funnet $count nye tilbud som passer profilen din:\n\n"
+        "$items\n\n"
+        "Hilsen Dagligdags 🛒\n"
+        "Du får denne e-posten fordi du har slått på tilbudsvarsler."
+    ),
+    'item': "• $product – $price kr hos $store ($reason)",
+}
+
+
+@lru_cache(maxsize=None)
+def _template(name: str) -> Template:
+    return Template(TEMPLATES[name])
+
+
+def deal_version(deal: Dict) -> str:
+    """Identifies one version of an offer; a price change is a new version."""
+    key = json.dumps([deal.get('deal_id'), deal.get('price'), deal.get('discount_percentage')])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+class DigestRenderer:
+    """Renders one e-mail per user from the cached digest templates."""
+
+    def __init__(self, sender: str = Config.ALERT_SENDER, max_deals: int = MAX_DEALS_PER_DIGEST):
+        self.sender = sender
+        self.max_deals = max_deals
+
+    def render(self, recipient: str, deals: List[Dict]) -> EmailMessage:
+        shown = deals[:self.max_deals]
+        item = _template('item')
+        items = "\n".join(item.safe_substitute(
+            product=deal.get('product', ''),
+            price=_format_price(deal.get('price')),
+            store=deal.get('store', '').capitalize(),
+            reason=deal.get('recommendation_reason', 'good value'),
+        ) for deal in shown)
+
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        message['Subject'] = _template('subject').substitute(count=len(deals))
+        message.set_content(_template('body').substitute(count=len(deals), items=items))
+        return message
+
+
+class SentAlertLedger:
+    """Remembers which (user, deal, version) alerts were already sent."""
+
+    def __init__(self, db_path=SENT_ALERTS_DB):
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent_alerts ("
+                " user_id TEXT, deal_id TEXT, version TEXT, sent_at TEXT,"
+                " PRIMARY KEY (user_id, deal_id, version))"
+            )
+
+    def unsent(self, user_id: str, deals: List[Dict]) -> List[Dict]:
+        """Drop deals whose current version this user has already been alerted about."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT deal_id, version FROM sent_alerts WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        sent = set(rows)
+        return [deal for deal in deals if (deal.get('deal_id'), deal_version(deal)) not in sent]
+
+    def mark_sent(self, user_id: str, deals: List[Dict]) -> None:
+        sent_at = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sent_alerts VALUES (?, ?, ?, ?)",
+                [(user_id, deal.get('deal_id'), deal_version(deal), sent_at) for deal in deals],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SMTPConnectionPool:
+    """A fixed number of persistent SMTP connections shared by sender threads.
+
+    Connections are opened lazily, reused across messages and reopened if the
+    server drops them. The pool size is also the concurrency cap.
+    """
+
+    def __init__(self, host: str = Config.SMTP_HOST, port: int = Config.SMTP_PORT,
+                 size: int = Config.ALERT_MAX_CONNECTIONS, user: str = Config.SMTP_USER,
+                 password: str = Config.SMTP_PASSWORD, starttls: bool = Config.SMTP_STARTTLS,
+                 timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)
+
+    def send(self, message: EmailMessage) -> None:
+        connection = self._idle.get()
+        try:
+            if connection is None:
+                connection = self._connect()
+            try:
+                connection.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                connection = self._connect()
+                connection.send_message(message)
+        except Exception:
+            _quit(connection)
+            connection = None
+            raise
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            _quit(self._idle.get())
+        for _ in range(self.size):
+            self._idle.put(None)
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.user:
+            connection.login(self.user, self.password)
+        return connection
+
+
+def _quit(connection: Optional[smtplib.SMTP]) -> None:
+    if connection is None:
+        return
+    try:
+        connection.quit()
+    except smtplib.SMTPException:
+        connection.close()
+    except OSError:
+        pass
+
+
+def _format_price(price) -> str:
+    # Norwegian decimal comma
+    return f"{price:.2f}".replace('.', Config.DECIMAL_SEPARATOR) if price is not None else "?"
+
+
+class AlertDispatcher:
+    """Collects matches per user after a scrape and sends one digest each."""
+
+    def __init__(self, pool: Optional[SMTPConnectionPool] = None, ledger: Optional[SentAlertLedger] = None,
+                 renderer: Optional[DigestRenderer] = None,
+                 resolve_email: Optional[Callable[[str], Optional[str]]] = None,
+                 profiles: Optional[ProfileFeatureStore] = None):
+        self.logger = setup_logger("email_alert")
+        self.pool = pool or SMTPConnectionPool()
+        self.ledger = ledger or SentAlertLedger()
+        self.renderer = renderer or DigestRenderer()
+        self.profiles = profiles or ProfileFeatureStore()
+        self.resolve_email = resolve_email or (lambda user_id: profile_email(self.profiles.profile_path(user_id)))
+        self._pending: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def collect(self, user_id: str, matches: Iterable[Dict]) -> None:
+        """Queue a user's matches (dicts as returned by DealMatcher) for the next digest."""
+        with self._lock:
+            self._pending.setdefault(user_id, []).extend(matches)
+
+    def collect_from_matcher(self, matcher, user_ids: Iterable[str]) -> Dict:
+        """Collect the current top deals for each user from a DealMatcher; returns its batch summary."""
+        results, summary = matcher.find_current_deals_batch(user_ids)
+        for user_id, matches in results.items():
+            self.collect(user_id, matches)
+        return summary
+
+    def send_digests(self, matcher) -> Dict:
+        """Digest the current top deals of every user who opted in; run after each daily scrape."""
+        user_ids = [path.stem[len("user_"):] for path in sorted(self.profiles.profiles_dir.glob("user_*.json"))]
+        user_ids = [user_id for user_id in user_ids if self.resolve_email(user_id)]
+        if user_ids:
+            self.collect_from_matcher(matcher, user_ids)
+        return self.dispatch()
+
+    def dispatch(self) -> Dict:
+        """Send every pending digest and return delivery stats."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            for outcome in executor.map(self._send_digest, pending.items()):
+                stats[outcome] += 1
+        elapsed = time.perf_counter() - started
+
+        stats['seconds'] = elapsed
+        stats['messages_per_second'] = stats['sent'] / elapsed if elapsed > 0 else 0.0
+        self.logger.info(f"📧 Alerts: {stats['sent']} sent, {stats['skipped']} skipped, "
+                         f"{stats['failed']} failed ({stats['messages_per_second']:.1f} msg/s)")
+        return stats
+
+    def close(self) -> None:
+        self.pool.close()
+        self.ledger.close()
+
+    def _send_digest(self, item) -> str:
+        user_id, matches = item
+        deals = self.ledger.unsent(user_id, _unique(matches))
+        recipient = self.resolve_email(user_id)
+        if not deals or not recipient:
+            return 'skipped'
+        try:
+            self.pool.send(self.renderer.render(recipient, deals))
+        except Exception as e:
+            self.logger.error(f"Failed to send alert to user {user_id}: {str(e)}")
+            return 'failed'
+        self.ledger.mark_sent(user_id, deals)
+        return 'sent'
+
+
+def _unique(matches: List[Dict]) -> List[Dict]:
+    """Keep the first (best) match per deal, in order."""
+    seen = set()
+    unique = []
+    for deal in matches:
+        if deal.get('deal_id') not in seen:
+            seen.add(deal.get('deal_id'))
+            unique.append(deal)
+    return unique
+
+
+def profile_email(profile_path: Path) -> Optional[str]:
+    """E-mail address from a saved profile, if its user opted in to deal alerts."""
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            preferences = profile_preferences(json.load(f))
+    except (OSError, ValueError, AttributeError):
+        return None
+    email = str(preferences.get('email') or '').strip()
+    if not preferences.get('deal_notifications', False) or '@' not in email:
+        return None
+    return email
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from config.environment import Config
+from utilities.compression import zstandard, open_compressed
+
+# Suffixes per Config.OUTPUT_COMPRESSION value
+_SUFFIXES = {'zst': '.ndjson.zst', 'gz': '.ndjson.gz', 'none': '.ndjson'}
+
+
+def output_suffix(compression: str = Config.OUTPUT_COMPRESSION) -> str:
+    """File suffix for new record files; zstd falls back to gzip when not installed."""
+    if compression == 'zst' and zstandard is None:
+        compression = 'gz'
+    return _SUFFIXES.get(compression, '.ndjson')
+
+
+def is_record_file(path: Path) -> bool:
+    return '.ndjson' in Path(path).suffixes
+
+
+class RecordWriter:
+    """Streams records as NDJSON into a temp file beside ``path``.
+
+    The temp file lives in the destination directory, so ``commit`` is an
+    atomic same-filesystem rename: readers see either no file or a complete
+    one. Compression follows the suffix of ``path`` (.zst, .gz or none).
+    Leaving the ``with`` block commits, or discards the file on an exception.
+    """
+
+    def __init__(self, path: Path, default: Optional[Callable] = None):
+        self.path = Path(path)
+        self.default = default
+        self.records = 0
+        self.bytes_written = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.",
+                                        suffix=''.join(self.path.suffixes[-1:]))
+        os.close(fd)
+        self._tmp_path = Path(tmp_name)
+        self._file = open_compressed(self._tmp_path, 'wt')
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=self.default)
+        started = time.perf_counter()
+        with self._lock:
+            self._file.write(line)
+            self._file.write('\n')
+            self.records += 1
+            self.seconds += time.perf_counter() - started
+
+    def write_many(self, records: Iterable[Dict]) -> None:
+        for record in records:
+            self.write(record)
+
+    def commit(self) -> Path:
+        """Flush, fsync and rename the temp file into place."""
+        started = time.perf_counter()
+        with self._lock:
+            self._file.close()
+            with open(self._tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(self._tmp_path, self.path)
+            self.seconds += time.perf_counter() - started
+            self.bytes_written = self.path.stat().st_size
+        return self.path
+
+    def abort(self) -> None:
+        with self._lock:
+            self._file.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+def read_records(path: Path) -> Iterator[Dict]:
+    """Yield the records of an NDJSON file one at a time, decompressing on the fly."""
+    with open_compressed(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
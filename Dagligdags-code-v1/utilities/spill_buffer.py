@@ -0,0 +1,111 @@
+import hashlib
+import io
+import mmap
+import tempfile
+from typing import Optional
+
+# Downloads up to this size stay in memory; larger ones spill to an anonymous file
+DEFAULT_MEMORY_LIMIT = 16 * 1024 * 1024
+
+
+class SpillBuffer:
+    """Write-once byte buffer for a download, hashed as it is written.
+
+    Bytes are kept in memory up to ``memory_limit``, then moved to an
+    unlinked temporary file that is read back through ``mmap``, so nothing is
+    left behind on disk even if the process dies. ``reader()`` hands out
+    independent zero-copy file objects that pdfplumber and pypdfium2 can both
+    read from.
+    """
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+        self._view: Optional[memoryview] = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes) -> int:
+        if self._view is not None:
+            raise ValueError("SpillBuffer is read-only once a reader was opened")
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self.memory_limit:
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._memory.getbuffer())
+            self._memory = None
+        (self._file or self._memory).write(chunk)
+        return len(chunk)
+
+    def hexdigest(self) -> str:
+        """SHA-256 of everything written so far."""
+        return self._sha256.hexdigest()
+
+    def reader(self) -> io.RawIOBase:
+        """A new seekable binary reader over the whole buffer."""
+        if self._view is None:
+            if self._file is not None:
+                self._file.flush()
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+            else:
+                self._view = self._memory.getbuffer()
+        return _ViewReader(self._view)
+
+    def close(self) -> None:
+        """Release the memory or temporary file; readers must be done by now."""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._memory = None
+
+    def __enter__(self) -> 'SpillBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class _ViewReader(io.RawIOBase):
+    """Seekable reader over a memoryview; reads copy straight into the caller's buffer."""
+
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        n = len(chunk)
+        buffer[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos